@@ -4,40 +4,269 @@ from exif import Image
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QGraphicsScene, QGraphicsView, 
     QGraphicsPixmapItem, QFileDialog, QVBoxLayout, QWidget, 
-    QPushButton, QHBoxLayout, QListWidget, QListWidgetItem, QMessageBox,
-    QLabel, QShortcut, QDialog, QScrollArea, QDialogButtonBox, QCheckBox, QGridLayout, QListView, QProgressBar
+    QPushButton, QHBoxLayout, QMessageBox,
+    QLabel, QShortcut, QDialog, QScrollArea, QDialogButtonBox, QListView, QProgressBar,
+    QCheckBox, QComboBox, QSpinBox, QLineEdit
 )
-from PyQt5.QtGui import QPixmap, QImage
-from PyQt5.QtCore import Qt, QSize, QThread, pyqtSignal
+from PyQt5.QtGui import QPixmap, QImage, QCursor, QKeySequence
+from PyQt5.QtCore import Qt, QRectF, QSize, QThread, QObject, QTimer, pyqtSignal
 from fractions import Fraction
 import warnings
+import numpy as np
 from datetime import datetime
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google_photos_auth import get_credentials
+from google_photos_auth import get_session
+from photos_uploader import PhotosUploader
+from upload_ledger import UploadLedger
 from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import queue
+import threading
+import time
+from thumbnail_cache import ThumbnailCache
+from image_decode import decode_thumbnail, encode_image
+from exif_reader import read_exif_segment, read_summary
+from thumbnail_model import ThumbnailModel, ThumbnailDelegate, PathRole
+from thumbnail_store import ThumbnailStore
+from prefetch import DecodedImageCache, ImagePrefetcher
+import trash
+from pairing import PairingIndex, iter_directory, iter_paths
+import instrumentation
+from focus import FocusScoreCache, FocusScorer
+from bursts import best_frame, group_bursts, image_dhash
+from tiled_view import TileLoader, tile_rect, visible_tiles
+from folder_watch import FolderWatcher
+from metadata_table import FilterError, MetadataTable, parse_filter
+
+THUMBNAIL_SIZE = 100
+DELETE_HISTORY_SIZE = 10
+# Above this many frames shown or hidden at once the carousel is rebuilt in
+# one go instead of row by row
+BULK_VIEW_CHANGE = 200
+FILTER_HELP = (
+    "Show only matching photos. Fields: iso, shutter, aperture, focus, date, camera, make, lens.\n"
+    "Examples: iso>6400   shutter>1/60 (slower than 1/60)   aperture<=2.8\n"
+    "date>=2024-05-01   camera=\"EOS R5\"   lens!=35mm"
+)
 
 class ImageLoader(QThread):
-    image_loaded = pyqtSignal(str, QPixmap)
+    # Streams a folder: files are enumerated with os.scandir and decoded as they
+    # are found, and finished thumbnails are handed to the GUI in batches (at
+    # most one signal per BATCH_INTERVAL) in whatever order they complete.
+    images_loaded = pyqtSignal(object)
     progress_update = pyqtSignal(int)
+    index_ready = pyqtSignal(object)
+
+    BATCH_INTERVAL = 0.05
+    LOOKUP_CHUNK = 256
 
-    def __init__(self, directory):
+    def __init__(self, directory, cache=None, recursive=False, max_workers=8, paths=None):
+        # With paths, only those files are loaded (the folder watcher's delta)
+        # instead of scanning the directory.
         super().__init__()
         self.directory = directory
+        self.cache = cache
+        self.recursive = recursive
+        self.max_workers = max_workers
+        self.paths = paths
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        index = PairingIndex()
+        results = queue.Queue()
+        self.submitted = 0
+        self.completed = 0
+        self.batch = []
+        self.last_emit = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        with instrumentation.span("scan", directory=self.directory, recursive=self.recursive) as scan_span:
+            try:
+                pending = []
+                entries = iter_paths(self.paths) if self.paths is not None else iter_directory(self.directory, self.recursive)
+                for entry in entries:
+                    if self.cancelled.is_set():
+                        return
+                    try:
+                        index.add_entry(entry)
+                    except OSError:
+                        continue
+                    if index.is_jpeg(entry.path):
+                        pending.append(entry.path)
+                    if len(pending) >= self.LOOKUP_CHUNK:
+                        self.submit(executor, index, pending, results)
+                        pending = []
+                        self.drain(results, block=False)
+                self.submit(executor, index, pending, results)
+                self.index_ready.emit(index)
+                while self.completed < self.submitted and not self.cancelled.is_set():
+                    self.drain(results, block=True)
+                self.flush()
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+                if self.cache is not None:
+                    self.cache.flush()
+                scan_span.set(images=self.completed, cancelled=self.cancelled.is_set())
+
+    def submit(self, executor, index, paths, results):
+        # Cache lookups go in chunks so a warm folder costs one query per chunk
+        # rather than one per file.
+        if not paths:
+            return
+        stats = {path: index.stats.get(path, (0, 0)) for path in paths}
+        cached = {}
+        if self.cache is not None:
+            cached = self.cache.get_many([(path, *stats[path]) for path in paths], THUMBNAIL_SIZE)
+            instrumentation.cache_lookup("thumbnail_cache", len(cached), len(paths) - len(cached))
+        for path in paths:
+            future = executor.submit(self.load_image, path, stats[path], cached.get(path))
+            future.add_done_callback(results.put)
+            self.submitted += 1
+        instrumentation.gauge("loader.pending", self.submitted - self.completed)
+
+    def drain(self, results, block):
+        deadline = self.last_emit + self.BATCH_INTERVAL
+        while True:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and timeout > 0:
+                    future = results.get(timeout=timeout)
+                else:
+                    future = results.get_nowait()
+            except queue.Empty:
+                break
+            self.completed += 1
+            try:
+                self.batch.append(future.result())
+            except Exception as e:
+                print(f"Error loading image: {e}")
+            if self.completed >= self.submitted:
+                break
+        instrumentation.gauge("loader.pending", self.submitted - self.completed)
+        if time.monotonic() >= deadline:
+            self.flush()
+
+    def flush(self):
+        self.last_emit = time.monotonic()
+        if self.batch and not self.cancelled.is_set():
+            self.images_loaded.emit(self.batch)
+            self.progress_update.emit(int(self.completed / max(self.submitted, 1) * 100))
+        self.batch = []
+
+    def load_image(self, image_path, stat=None, cached_data=None):
+        # The Exif summary tags are read here, in bulk during the scan, so the
+        # side panel never has to open the file while navigating.
+        if cached_data is not None:
+            thumbnail = QImage()
+            with instrumentation.span("thumbnail.load_cached", path=image_path):
+                loaded = thumbnail.loadFromData(cached_data, "JPG")
+            if loaded:
+                return image_path, thumbnail, read_summary(image_path), image_dhash(thumbnail)
+        with instrumentation.span("thumbnail.decode", path=image_path):
+            try:
+                header = read_exif_segment(image_path)
+            except OSError:
+                header = None
+            thumbnail = decode_thumbnail(image_path, THUMBNAIL_SIZE, header)
+        if self.cache is not None and stat is not None and not thumbnail.isNull():
+            self.cache.put(image_path, THUMBNAIL_SIZE, stat[0], stat[1], encode_image(thumbnail))
+        metadata = read_summary(image_path, header) if header else {}
+        return image_path, thumbnail, metadata, image_dhash(thumbnail)
+
+class DeleteBatch:
+    def __init__(self, items):
+        # items are (path, selected) as they were in the carousel (thumbnails
+        # and metadata stay in their stores until the batch is purged) and
+        # files is every file on disk they pull with them; staged is filled
+        # in by the worker once those files have moved.
+        self.batch_id = trash.new_batch_id()
+        self.items = items
+        self.files = []
+        self.staged = []
+
+    @property
+    def paths(self):
+        return [item[0] for item in self.items]
+
+class FileOperationWorker(QObject):
+    # Runs file operations one at a time, in submission order, off the GUI
+    # thread. Ordering matters: an undo or purge always sees the finished stage.
+    operation_failed = pyqtSignal(str, object)
+    operation_finished = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.outstanding = 0
+        self.operation_finished.connect(lambda callback: callback())
+
+    def submit(self, description, fn, *args, on_finished=None):
+        # on_finished runs on the GUI thread once fn has completed.
+        self.outstanding += 1
+        instrumentation.gauge("file_worker.queue", self.outstanding)
+        future = self.executor.submit(self.run_operation, description, fn, *args)
+        future.add_done_callback(lambda f: self.on_done(description, f, on_finished))
+        return future
+
+    def run_operation(self, description, fn, *args):
+        with instrumentation.span("file_op", operation=description):
+            return fn(*args)
+
+    def on_done(self, description, future, on_finished):
+        self.outstanding -= 1
+        instrumentation.gauge("file_worker.queue", self.outstanding)
+        try:
+            errors = future.result()
+        except Exception as e:
+            errors = [("", str(e))]
+        if errors:
+            self.operation_failed.emit(description, errors)
+        if on_finished is not None:
+            self.operation_finished.emit(on_finished)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+class UploadWorker(QThread):
+    file_progress = pyqtSignal(str, int, int)
+    file_finished = pyqtSignal(str, bool, str)
+    upload_failed = pyqtSignal(str)
+
+    def __init__(self, paths, max_workers=4):
+        super().__init__()
+        self.paths = paths
+        self.max_workers = max_workers
+        self.uploader = None
+        self.results = []
 
     def run(self):
-        images = [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.lower().endswith('.jpg')]
-        total_images = len(images)
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            for idx, result in enumerate(executor.map(self.load_image, images)):
-                image_path, thumbnail = result
-                self.image_loaded.emit(image_path, thumbnail)
-                progress = int((idx + 1) / total_images * 100)
-                self.progress_update.emit(progress)
-
-    def load_image(self, image_path):
-        thumbnail = QPixmap(image_path).scaled(100, 100, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        return image_path, thumbnail
+        try:
+            session = get_session()
+        except Exception as e:
+            self.upload_failed.emit(f"Failed to authenticate: {e}")
+            return
+        try:
+            ledger = UploadLedger()
+        except Exception as e:
+            print(f"Upload ledger unavailable: {e}")
+            ledger = None
+        self.uploader = PhotosUploader(
+            session,
+            max_workers=self.max_workers,
+            on_progress=self.file_progress.emit,
+            on_item_done=lambda item: self.file_finished.emit(item.path, item.succeeded, item.error or ""),
+            ledger=ledger,
+        )
+        try:
+            self.results = self.uploader.upload(self.paths)
+        finally:
+            if ledger is not None:
+                ledger.close()
+
+    def cancel(self):
+        if self.uploader is not None:
+            self.uploader.cancel()
 
 class ExifDialog(QDialog):
     def __init__(self, exif_data, parent=None):
@@ -87,11 +316,11 @@ class ImageCuller(QMainWindow):
         controls_layout.addWidget(self.next_button)
 
         self.zoom_in_button = QPushButton("Zoom In")
-        self.zoom_in_button.clicked.connect(lambda: self.view.scale(1.25, 1.25))
+        self.zoom_in_button.clicked.connect(lambda: self.zoom(1.25))
         controls_layout.addWidget(self.zoom_in_button)
 
         self.zoom_out_button = QPushButton("Zoom Out")
-        self.zoom_out_button.clicked.connect(lambda: self.view.scale(0.8, 0.8))
+        self.zoom_out_button.clicked.connect(lambda: self.zoom(0.8))
         controls_layout.addWidget(self.zoom_out_button)
 
         self.rotate_left_button = QPushButton("Rotate Left")
@@ -110,23 +339,46 @@ class ImageCuller(QMainWindow):
         self.delete_selected_button.clicked.connect(self.delete_selected_images)
         controls_layout.addWidget(self.delete_selected_button)
 
+        self.undo_delete_button = QPushButton("Undo Delete")
+        self.undo_delete_button.clicked.connect(self.undo_delete)
+        self.undo_delete_button.setEnabled(False)
+        controls_layout.addWidget(self.undo_delete_button)
+
         self.select_all_button = QPushButton("Select All")
         self.select_all_button.clicked.connect(self.select_all_images)
         controls_layout.addWidget(self.select_all_button)
 
+        self.select_softest_button = QPushButton("Select Softest")
+        self.select_softest_button.clicked.connect(self.select_softest_images)
+        controls_layout.addWidget(self.select_softest_button)
+
+        self.softest_percent = QSpinBox()
+        self.softest_percent.setRange(1, 100)
+        self.softest_percent.setValue(20)
+        self.softest_percent.setSuffix("%")
+        self.softest_percent.setToolTip("Share of the folder to select, softest first")
+        controls_layout.addWidget(self.softest_percent)
+
         layout.addLayout(controls_layout)
 
-        self.thumbnail_list = QListWidget()
-        self.thumbnail_list.setViewMode(QListWidget.IconMode)
-        self.thumbnail_list.setIconSize(QSize(100, 100))
+        self.thumbnail_store = ThumbnailStore(THUMBNAIL_SIZE)
+        self.thumbnail_model = ThumbnailModel(self.thumbnail_store, self.sort_key, self)
+        self.thumbnail_delegate = ThumbnailDelegate(THUMBNAIL_SIZE, self)
+        self.thumbnail_list = QListView()
+        self.thumbnail_list.setModel(self.thumbnail_model)
+        self.thumbnail_list.setItemDelegate(self.thumbnail_delegate)
+        self.thumbnail_list.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
         self.thumbnail_list.setSpacing(10)
-        self.thumbnail_list.setMovement(QListWidget.Static)
-        self.thumbnail_list.setResizeMode(QListWidget.Adjust)
+        self.thumbnail_list.setMovement(QListView.Static)
         self.thumbnail_list.setFlow(QListView.LeftToRight)
         self.thumbnail_list.setWrapping(False)
-        self.thumbnail_list.setSelectionMode(QListWidget.NoSelection)
+        self.thumbnail_list.setUniformItemSizes(True)  # Lets the view skip per-item size queries
+        self.thumbnail_list.setLayoutMode(QListView.Batched)
+        self.thumbnail_list.setHorizontalScrollMode(QListView.ScrollPerPixel)
+        self.thumbnail_list.setSelectionMode(QListView.NoSelection)
         self.thumbnail_list.setMaximumHeight(120)  # Adjust the height of the thumbnail list
-        self.thumbnail_list.itemClicked.connect(lambda item: self.on_thumbnail_click(item))
+        self.thumbnail_list.clicked.connect(self.on_thumbnail_click)
+        self.thumbnail_list.doubleClicked.connect(self.toggle_burst)
 
         thumbnail_container = QHBoxLayout()
         thumbnail_container.addWidget(self.thumbnail_list)
@@ -161,6 +413,42 @@ class ImageCuller(QMainWindow):
         self.open_button.clicked.connect(self.open_directory)
         button_layout.addWidget(self.open_button)
 
+        self.recursive_checkbox = QCheckBox("Include Subfolders")
+        button_layout.addWidget(self.recursive_checkbox)
+
+        self.watch_checkbox = QCheckBox("Watch Folder")
+        self.watch_checkbox.setToolTip("Pick up photos added to or removed from the folder while it is open, e.g. when shooting tethered")
+        self.watch_checkbox.toggled.connect(self.toggle_folder_watch)
+        button_layout.addWidget(self.watch_checkbox)
+
+        self.sort_combo = QComboBox()
+        self.sort_combo.addItem("Sort by Name", "name")
+        self.sort_combo.addItem("Sort by Capture Time", "capture_time")
+        self.sort_combo.addItem("Sort by Focus (Softest First)", "focus")
+        self.sort_combo.addItem("Sort by ISO", "iso")
+        self.sort_combo.addItem("Sort by Shutter Speed", "exposure_time")
+        self.sort_combo.addItem("Sort by Aperture", "f_number")
+        self.sort_combo.currentIndexChanged.connect(self.change_sort_order)
+        button_layout.addWidget(self.sort_combo)
+
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter, e.g. iso>6400 shutter>1/60")
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.setToolTip(FILTER_HELP)
+        self.filter_edit.textChanged.connect(lambda: self.filter_timer.start())
+        button_layout.addWidget(self.filter_edit)
+
+        self.group_bursts_checkbox = QCheckBox("Group Bursts")
+        self.group_bursts_checkbox.setChecked(True)
+        self.group_bursts_checkbox.setToolTip("Stack near-identical frames shot in quick succession; double-click a stack to expand it")
+        self.group_bursts_checkbox.toggled.connect(self.refresh_stacks)
+        button_layout.addWidget(self.group_bursts_checkbox)
+
+        self.select_burst_rejects_button = QPushButton("Select Burst Rejects")
+        self.select_burst_rejects_button.setToolTip("Select every frame of each burst except its sharpest")
+        self.select_burst_rejects_button.clicked.connect(self.select_burst_rejects)
+        button_layout.addWidget(self.select_burst_rejects_button)
+
         self.upload_button = QPushButton("Upload Selected to Google Photos")
         self.upload_button.clicked.connect(self.upload_selected_images)
         button_layout.addWidget(self.upload_button)
@@ -176,12 +464,89 @@ class ImageCuller(QMainWindow):
         container.setLayout(main_layout)
         self.setCentralWidget(container)
 
-        self.images = []
         self.current_image_index = -1
         self.current_image_exif = {}
+        self.metadata = MetadataTable()
+        self.filter_conditions = []
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(250)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        self.frame_hashes = {}
+        self.bursts = []
+        self.burst_of = {}
+        self.expanded_bursts = set()
+        self.pairing_index = PairingIndex()
+        self.loader_thread = None
+        self.retired_loaders = []
+        self.ingest_loaders = []
+        self.current_directory = None
+        self.auto_selected_path = None
+        self.full_exif_cache = {}
+        self.current_original_size = QSize()
+        self.tile_items = {}
+
+        self.upload_thread = None
+        self.delete_history = deque()
+        self.file_worker = FileOperationWorker(self)
+        self.file_worker.operation_failed.connect(self.on_file_operation_failed)
+
+        self.image_cache = DecodedImageCache()
+        self.prefetcher = ImagePrefetcher(self.image_cache, self.display_bound(), parent=self)
+
+        self.tile_cache = DecodedImageCache(max_bytes=256 * 1024 * 1024)
+        self.tile_loader = TileLoader(self.tile_cache, self)
+        self.tile_loader.tiles_ready.connect(self.schedule_tile_update)
+        self.tile_timer = QTimer(self)
+        self.tile_timer.setSingleShot(True)
+        self.tile_timer.setInterval(30)
+        self.tile_timer.timeout.connect(self.update_tiles)
+
+        self.folder_watcher = FolderWatcher(self)
+        self.folder_watcher.files_changed.connect(self.on_folder_changed)
+        self.view.horizontalScrollBar().valueChanged.connect(self.schedule_tile_update)
+        self.view.verticalScrollBar().valueChanged.connect(self.schedule_tile_update)
+
+        try:
+            self.thumbnail_cache = ThumbnailCache()
+        except Exception as e:
+            print(f"Thumbnail cache unavailable: {e}")
+            self.thumbnail_cache = None
+
+        self.focus_scores = {}
+        try:
+            focus_cache = FocusScoreCache()
+        except Exception as e:
+            print(f"Focus score cache unavailable: {e}")
+            focus_cache = None
+        self.focus_scorer = FocusScorer(focus_cache, parent=self)
+        self.focus_scorer.scores_ready.connect(self.add_focus_scores)
+        self.focus_scorer.progress.connect(self.update_focus_progress)
+        self.focus_scorer.scoring_finished.connect(self.focus_scoring_finished)
 
         self.set_shortcuts()
 
+    def closeEvent(self, event):
+        self.folder_watcher.shutdown()
+        for loader in [self.loader_thread] + self.ingest_loaders:
+            if loader is not None and loader.isRunning():
+                loader.cancel()
+                loader.wait()
+        if self.upload_thread is not None and self.upload_thread.isRunning():
+            self.upload_thread.cancel()
+            self.upload_thread.wait()
+        self.prefetcher.shutdown()
+        self.tile_loader.shutdown()
+        self.focus_scorer.shutdown()
+        self.purge_delete_history()
+        self.file_worker.shutdown()
+        self.thumbnail_store.clear()
+        super().closeEvent(event)
+
+    @property
+    def images(self):
+        return self.thumbnail_model.paths
+
     def set_shortcuts(self):
         self.shortcut_next = QShortcut(Qt.Key_Right, self)
         self.shortcut_next.activated.connect(self.next_image)
@@ -190,102 +555,411 @@ class ImageCuller(QMainWindow):
         self.shortcut_prev.activated.connect(self.prev_image)
 
         self.shortcut_zoom_in = QShortcut(Qt.Key_Plus, self)
-        self.shortcut_zoom_in.activated.connect(lambda: self.view.scale(1.25, 1.25))
+        self.shortcut_zoom_in.activated.connect(lambda: self.zoom(1.25))
 
         self.shortcut_zoom_out = QShortcut(Qt.Key_Minus, self)
-        self.shortcut_zoom_out.activated.connect(lambda: self.view.scale(0.8, 0.8))
+        self.shortcut_zoom_out.activated.connect(lambda: self.zoom(0.8))
 
         self.shortcut_select = QShortcut(Qt.Key_Space, self)
         self.shortcut_select.activated.connect(self.toggle_select_current_image)
 
+        self.shortcut_undo = QShortcut(QKeySequence.Undo, self)
+        self.shortcut_undo.activated.connect(self.undo_delete)
+
     def open_directory(self):
         directory = QFileDialog.getExistingDirectory(self, "Select Directory")
         if directory:
-            # Clear previous images and reset
-            self.images.clear()
-            self.current_image_index = -1
-            self.thumbnail_list.clear()
-            self.pixmap_item.setPixmap(QPixmap())
-            self.loading_label.setVisible(True)
-            self.progress_bar.setVisible(True)
-            
-            self.loader_thread = ImageLoader(directory)
-            self.loader_thread.image_loaded.connect(self.add_thumbnail)
-            self.loader_thread.progress_update.connect(self.update_progress)
-            self.loader_thread.finished.connect(self.loading_finished)
-            self.loader_thread.start()
-
-    def add_thumbnail(self, image_path, thumbnail):
-        item_widget = QWidget()
-        item_layout = QGridLayout()
-        item_layout.setContentsMargins(0, 0, 0, 0)
-        item_layout.setSpacing(0)
-
-        icon_label = QLabel()
-        icon_label.setPixmap(thumbnail)
-        icon_label.mousePressEvent = lambda event, img_path=image_path: self.on_thumbnail_click_path(img_path)
-        item_layout.addWidget(icon_label, 0, 0)
-
-        checkbox = QCheckBox()
-        checkbox.setStyleSheet("QCheckBox::indicator { width: 20px; height: 20px; }")
-        item_layout.addWidget(checkbox, 0, 1, Qt.AlignTop | Qt.AlignRight)
-
-        item_widget.setLayout(item_layout)
-
-        item = QListWidgetItem(self.thumbnail_list)
-        item.setSizeHint(item_widget.sizeHint())
-        self.thumbnail_list.setItemWidget(item, item_widget)
-        item.setData(Qt.UserRole, image_path)
-
-        self.images.append(image_path)
+            self.load_directory(directory)
+
+    def load_directory(self, directory):
+        # A folder that is still loading is abandoned; its late batches are
+        # ignored by the slots below because they check the sender.
+        self.folder_watcher.stop()
+        for loader in [self.loader_thread] + self.ingest_loaders:
+            if loader is not None and loader.isRunning():
+                loader.cancel()
+                self.retired_loaders.append(loader)
+        self.ingest_loaders = []
+        self.current_directory = directory
+
+        # Clear previous images and reset
+        self.current_image_index = -1
+        self.purge_delete_history()
+        self.file_worker.submit("Empty trash", trash.purge_directory, directory)
+        self.thumbnail_model.clear()
+        self.prefetcher.reset()
+        self.tile_loader.reset()
+        self.tile_cache.clear()
+        self.focus_scorer.cancel()
+        self.focus_scores.clear()
+        self.frame_hashes.clear()
+        self.bursts = []
+        self.burst_of = {}
+        self.expanded_bursts = set()
+        self.metadata.clear()
+        self.full_exif_cache.clear()
+        self.pairing_index = None
+        self.pixmap_item.setPixmap(QPixmap())
+        self.loading_label.setText("Please wait while images are loaded...")
+        self.loading_label.setVisible(True)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+
+        self.loader_thread = ImageLoader(directory, self.thumbnail_cache, recursive=self.recursive_checkbox.isChecked())
+        self.loader_thread.index_ready.connect(self.set_pairing_index)
+        self.loader_thread.images_loaded.connect(self.add_thumbnails)
+        self.loader_thread.progress_update.connect(self.update_progress)
+        self.loader_thread.finished.connect(self.loading_finished)
+        self.loader_thread.start()
+
+    def set_pairing_index(self, index):
+        if self.sender() is self.loader_thread:
+            self.pairing_index = index
+            if self.watch_checkbox.isChecked():
+                self.start_folder_watch()
+
+    def add_thumbnails(self, batch):
+        sender = self.sender()
+        if sender is not self.loader_thread and sender not in self.ingest_loaders:
+            return
+        current_path = self.current_path()
+        for image_path, _, metadata, dhash in batch:
+            self.metadata.add(image_path, metadata)
+            self.frame_hashes[image_path] = dhash
+        self.thumbnail_model.insert_sorted([(image_path, thumbnail) for image_path, thumbnail, _, _ in batch])
+        if current_path is not None:
+            self.current_image_index = self.thumbnail_model.row_of(current_path)
+        elif self.images:
+            # Show something as soon as the first batch lands
+            self.current_image_index = 0
+            self.auto_selected_path = self.images[0]
+            self.display_current_image()
 
     def update_progress(self, value):
-        self.progress_bar.setValue(value)
+        if self.sender() is self.loader_thread:
+            self.progress_bar.setValue(value)
 
     def loading_finished(self):
+        sender = self.sender()
+        if sender is not self.loader_thread:
+            # A cancelled loader has wound down and can be released now
+            if sender in self.retired_loaders:
+                self.retired_loaders.remove(sender)
+            return
         self.loading_label.setVisible(False)
         self.progress_bar.setVisible(False)
+        self.find_bursts()
+        self.start_focus_scoring()
+        if self.current_image_index >= 0:
+            # Frames that sort earlier may have arrived after the one we showed
+            # first; move to the real first frame unless the user has moved on.
+            if self.current_path() == self.auto_selected_path and self.current_image_index != 0:
+                self.current_image_index = 0
+                self.display_current_image()
+            return
         if self.images:
             self.current_image_index = 0
             self.display_current_image()
         else:
             self.pixmap_item.setPixmap(QPixmap())
 
+    def start_focus_scoring(self):
+        # Runs after the scan so it never competes with thumbnail decoding.
+        paths = self.thumbnail_model.all_paths()
+        if self.pairing_index is None or not paths:
+            return
+        stats = self.pairing_index.stats
+        self.loading_label.setText("Checking focus...")
+        self.focus_scorer.score([(path, *stats.get(path, (0, 0))) for path in paths])
+
+    def add_focus_scores(self, scores):
+        self.focus_scores.update(scores)
+        self.metadata.set_focus(scores)
+        if self.current_path() in scores:
+            self.load_exif_data(self.current_path())
+
+    def update_focus_progress(self, done, total):
+        if done < total:
+            self.loading_label.setVisible(True)
+            self.progress_bar.setVisible(True)
+            self.progress_bar.setValue(int(done / max(total, 1) * 100))
+
+    def focus_scoring_finished(self):
+        self.loading_label.setVisible(False)
+        self.progress_bar.setVisible(False)
+        if self.sort_combo.currentData() == "focus":
+            self.change_sort_order()
+        # The sharpest frame of each burst may have changed
+        self.refresh_stacks()
+
+    def find_bursts(self):
+        frames = []
+        for path in self.thumbnail_model.all_paths():
+            timestamp = self.metadata.value(path, "capture_time")
+            frames.append((path, None if np.isnan(timestamp) else timestamp, self.frame_hashes.get(path)))
+        self.bursts = group_bursts(frames)
+        self.burst_of = {path: index for index, burst in enumerate(self.bursts) for path in burst}
+        self.refresh_stacks()
+
+    def refresh_stacks(self):
+        # Works out which frames should be folded away (frames the filter
+        # rejects, and every burst member but the sharpest unless the burst is
+        # expanded or grouping is off) and applies only the difference, so it
+        # is safe to call after any change.
+        model = self.thumbnail_model
+        current_path = self.current_path()
+        all_paths = model.all_paths()
+        hide = set()
+        if self.filter_conditions:
+            matches = self.metadata.matches(all_paths, self.filter_conditions)
+            hide.update(path for path, keep in zip(all_paths, matches) if not keep)
+        model.set_filtered(hide)
+        stack_sizes = {}
+        if self.group_bursts_checkbox.isChecked():
+            for burst in self.bursts:
+                members = [path for path in burst if model.contains(path) and path not in hide]
+                if len(members) < 2 or burst[0] in self.expanded_bursts:
+                    continue
+                best = best_frame(members, self.focus_scores)
+                stack_sizes[best] = len(members)
+                hide.update(path for path in members if path != best)
+        show = [path for path in model.hidden if path not in hide]
+        newly_hidden = [path for path in hide if path in model.rows]
+        if len(show) + len(newly_hidden) > BULK_VIEW_CHANGE:
+            visible = [path for path in all_paths if path not in hide]
+            model.set_order(self.metadata.order(visible, self.sort_combo.currentData()),
+                            hidden=[path for path in all_paths if path in hide])
+        else:
+            model.show_paths(show)
+            model.hide_paths(newly_hidden)
+        model.set_stack_sizes(stack_sizes)
+        if self.filter_conditions:
+            self.filter_edit.setToolTip(f"Showing {len(model.paths)} of {len(all_paths)} photos\n\n{FILTER_HELP}")
+        if current_path in model.hidden and current_path in self.burst_of:
+            # Folded into its stack: stay on the stack if it is still shown
+            burst = self.bursts[self.burst_of[current_path]]
+            current_path = next((path for path in burst if path in stack_sizes), current_path)
+        if current_path is not None:
+            self.restore_position(current_path)
+
+    def apply_filter(self):
+        try:
+            conditions = parse_filter(self.filter_edit.text())
+        except FilterError as e:
+            self.filter_edit.setStyleSheet("color: red")
+            self.filter_edit.setToolTip(str(e))
+            return
+        self.filter_edit.setStyleSheet("")
+        self.filter_edit.setToolTip(FILTER_HELP)
+        if conditions == self.filter_conditions:
+            return
+        self.filter_conditions = conditions
+        with instrumentation.span("filter", conditions=len(conditions)):
+            self.refresh_stacks()
+
+    def toggle_burst(self, index):
+        burst_index = self.burst_of.get(index.data(PathRole))
+        if burst_index is None:
+            return
+        # Stacks are remembered by their first frame so an expanded stack stays
+        # expanded when the bursts are recomputed after new files arrive.
+        first = self.bursts[burst_index][0]
+        if first in self.expanded_bursts:
+            self.expanded_bursts.discard(first)
+        else:
+            self.expanded_bursts.add(first)
+        self.refresh_stacks()
+
+    def select_burst_rejects(self):
+        model = self.thumbnail_model
+        for burst in self.bursts:
+            members = [path for path in burst if model.contains(path)]
+            if len(members) < 2:
+                continue
+            best = best_frame(members, self.focus_scores)
+            for path in members:
+                model.set_selected(path, path != best)
+
+    def toggle_folder_watch(self, checked):
+        if not checked:
+            self.folder_watcher.stop()
+        elif self.pairing_index is not None and self.current_directory is not None:
+            self.start_folder_watch()
+
+    def start_folder_watch(self):
+        known = [path for group in self.pairing_index.groups.values() for path in group.files]
+        self.folder_watcher.start(self.current_directory, self.recursive_checkbox.isChecked(), known)
+
+    def on_folder_changed(self, added, removed):
+        # Files this window deleted or restored itself are already up to date
+        # in the pairing index and are skipped.
+        if self.pairing_index is None:
+            return
+        index = self.pairing_index
+        current_path = self.current_path()
+        gone = []
+        for path in removed:
+            if not index.contains(path):
+                continue
+            if index.is_jpeg(path):
+                gone.append(path)
+            index.remove(path)
+        if gone:
+            self.thumbnail_model.remove_paths(gone)
+            for path in gone:
+                self.prefetcher.discard(path)
+                self.metadata.remove(path)
+            self.restore_position(current_path)
+            self.refresh_stacks()
+        new = [path for path in added if index.accepts(path) and not index.contains(path)]
+        if new:
+            self.ingest_paths(new)
+
+    def ingest_paths(self, paths):
+        # New files go through the normal thumbnail pipeline; only the delta is
+        # loaded and merged into what is already on screen.
+        loader = ImageLoader(self.current_directory, self.thumbnail_cache, paths=paths)
+        loader.index_ready.connect(self.merge_pairing_index)
+        loader.images_loaded.connect(self.add_thumbnails)
+        loader.finished.connect(self.ingest_finished)
+        self.ingest_loaders.append(loader)
+        loader.start()
+
+    def merge_pairing_index(self, index):
+        if self.sender() in self.ingest_loaders and self.pairing_index is not None:
+            self.pairing_index.merge(index)
+
+    def ingest_finished(self):
+        sender = self.sender()
+        if sender in self.retired_loaders:
+            self.retired_loaders.remove(sender)
+        if sender not in self.ingest_loaders:
+            return
+        self.ingest_loaders.remove(sender)
+        if not self.ingest_loaders:
+            self.find_bursts()
+        stats = self.pairing_index.stats
+        self.focus_scorer.add([(path, *stats.get(path, (0, 0))) for path in sender.paths
+                               if self.thumbnail_model.contains(path)])
+
+    def current_path(self):
+        if 0 <= self.current_image_index < len(self.images):
+            return self.images[self.current_image_index]
+        return None
+
+    def sort_key(self, path):
+        # Must give the same order as MetadataTable.order: by the column, frames
+        # without a value (or not yet focus scored) last, then by name
+        name_key = (os.path.dirname(path), os.path.basename(path).lower())
+        column = self.sort_combo.currentData()
+        if column == "name":
+            return (0.0,) + name_key
+        value = self.metadata.value(path, column)
+        return (float("inf") if np.isnan(value) else value,) + name_key
+
+    def change_sort_order(self):
+        current_path = self.current_path()
+        model = self.thumbnail_model
+        with instrumentation.span("sort", column=self.sort_combo.currentData(), images=len(model.paths)):
+            model.set_order(self.metadata.order(model.paths, self.sort_combo.currentData()))
+        if current_path is not None:
+            self.current_image_index = self.thumbnail_model.row_of(current_path)
+            self.thumbnail_list.scrollTo(self.thumbnail_model.index(self.current_image_index))
+
     def display_current_image(self):
         if 0 <= self.current_image_index < len(self.images):
             self.display_image(self.images[self.current_image_index])
         else:
             self.pixmap_item.setPixmap(QPixmap())
 
+    def display_bound(self):
+        # Decode for the screen, not the sensor; zooming past this swaps in the
+        # full-resolution tiles under the viewport (see update_tiles).
+        screen = QApplication.primaryScreen()
+        size = screen.size() * screen.devicePixelRatio()
+        return QSize(max(size.width(), 1024), max(size.height(), 1024))
+
     def display_image(self, image_path):
-        image = QImage(image_path)
-        pixmap = QPixmap.fromImage(image)
-        self.pixmap_item.setPixmap(pixmap)
-        self.pixmap_item.setTransformationMode(Qt.SmoothTransformation)
-        self.view.fitInView(self.pixmap_item, Qt.KeepAspectRatio)
-        self.load_exif_data(image_path)
-        self.exif_link.setVisible(True)
+        with instrumentation.span("display", path=image_path, prefetched=image_path in self.image_cache):
+            image, original_size = self.prefetcher.load(image_path)
+            self.clear_tiles()
+            self.tile_loader.reset()
+            pixmap = QPixmap.fromImage(image)
+            self.pixmap_item.setPixmap(pixmap)
+            self.pixmap_item.setTransformationMode(Qt.SmoothTransformation)
+            # Keep scene units in full-resolution pixels so zoom and rotation
+            # behave the same for the preview and the full-resolution tiles.
+            self.pixmap_item.setScale(original_size.width() / image.width() if image.width() else 1.0)
+            self.current_original_size = original_size
+            self.view.fitInView(self.pixmap_item, Qt.KeepAspectRatio)
+            self.load_exif_data(image_path)
+            self.exif_link.setVisible(True)
+            self.prefetcher.request(self.images, self.current_image_index)
+
+    def zoom(self, factor):
+        self.view.scale(factor, factor)
+        self.schedule_tile_update()
+
+    def schedule_tile_update(self, *args):
+        self.tile_timer.start()
+
+    def update_tiles(self):
+        # Once the preview is magnified on screen, overlay the full-resolution
+        # tiles under the viewport. Tiles are children of the preview item, so
+        # they follow its rotation; their 1/scale undoes the preview's scale.
+        image_path = self.current_path()
+        scale = self.pixmap_item.scale()
+        if image_path is None or scale <= 1.0 or self.view.transform().m11() * scale <= 1.0:
+            self.clear_tiles()
+            return
+        viewport = self.view.mapToScene(self.view.viewport().rect())
+        visible = self.pixmap_item.mapFromScene(viewport).boundingRect()
+        region = QRectF(visible.x() * scale, visible.y() * scale, visible.width() * scale, visible.height() * scale)
+        tiles = visible_tiles(region, self.current_original_size)
+        wanted = set(tiles)
+        for tile in [tile for tile in self.tile_items if tile not in wanted]:
+            self.scene.removeItem(self.tile_items.pop(tile))
+        missing = []
+        for tile in tiles:
+            if tile in self.tile_items:
+                continue
+            image = self.tile_loader.cached(image_path, tile)
+            if image is None:
+                missing.append(tile)
+                continue
+            rect = tile_rect(tile, self.current_original_size)
+            item = QGraphicsPixmapItem(QPixmap.fromImage(image), self.pixmap_item)
+            item.setTransformationMode(Qt.SmoothTransformation)
+            item.setScale(1 / scale)
+            item.setPos(rect.x() / scale, rect.y() / scale)
+            self.tile_items[tile] = item
+        instrumentation.gauge("display.tiles_missing", len(missing))
+        self.tile_loader.request(image_path, self.current_original_size, missing)
+
+    def clear_tiles(self):
+        for item in self.tile_items.values():
+            self.scene.removeItem(item)
+        self.tile_items = {}
 
     def load_exif_data(self, image_path):
-        try:
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore", RuntimeWarning)
-                with open(image_path, 'rb') as img_file:
-                    img = Image(img_file)
-
-            exif_data = {
-                "Camera": img.get("model", "Unknown"),
-                "Lens": f"{img.get('lens_model', 'Unknown')} {img.get('lens_make', '')}".strip(),
-                "Aperture": f"f/{img.get('f_number', 'Unknown')}",
-                "ISO": img.get("photographic_sensitivity", "Unknown"),
-                "Shutter Speed": self.format_shutter_speed(img.get('exposure_time', 'Unknown')),
-                "Date": self.format_datetime(img.get("datetime_original", "Unknown"))
-            }
-
-            self.current_image_exif = exif_data
-            self.update_exif_label()
-        except Exception as e:
-            print(f"Error reading EXIF data: {e}")
+        tags = self.metadata.tags(image_path)
+        if tags is None:
+            tags = read_summary(image_path)
+            self.metadata.add(image_path, tags)
+
+        exif_data = {
+            "Camera": tags.get("model", "Unknown"),
+            "Lens": f"{tags.get('lens_model', 'Unknown')} {tags.get('lens_make', '')}".strip(),
+            "Aperture": f"f/{tags.get('f_number', 'Unknown')}",
+            "ISO": tags.get("photographic_sensitivity", "Unknown"),
+            "Shutter Speed": self.format_shutter_speed(tags.get('exposure_time', 'Unknown')),
+            "Date": self.format_datetime(tags.get("datetime_original", "Unknown"))
+        }
+        if image_path in self.focus_scores:
+            exif_data["Focus"] = f"{self.focus_scores[image_path]:.0f}"
+
+        self.current_image_exif = exif_data
+        self.update_exif_label()
 
     def format_shutter_speed(self, shutter_speed):
         try:
@@ -307,24 +981,36 @@ class ImageCuller(QMainWindow):
     def show_full_exif(self):
         if self.current_image_exif:
             try:
-                with open(self.images[self.current_image_index], 'rb') as img_file:
-                    img = Image(img_file)
-                exif_data = {tag: img.get(tag) for tag in img.list_all() if img.get(tag) is not None}
+                image_path = self.images[self.current_image_index]
+                exif_data = self.full_exif_cache.get(image_path)
+                if exif_data is None:
+                    with warnings.catch_warnings(), instrumentation.span("exif.full", path=image_path):
+                        warnings.simplefilter("ignore", RuntimeWarning)
+                        with open(image_path, 'rb') as img_file:
+                            img = Image(img_file)
+                        exif_data = {tag: img.get(tag) for tag in img.list_all() if img.get(tag) is not None}
+                    self.full_exif_cache[image_path] = exif_data
                 exif_dialog = ExifDialog(exif_data, self)
                 exif_dialog.exec_()
             except Exception as e:
                 print(f"Error showing full EXIF data: {e}")
 
+    def on_thumbnail_click(self, index):
+        # The delegate already toggled the checkbox; don't also navigate.
+        pos = self.thumbnail_list.viewport().mapFromGlobal(QCursor.pos())
+        if self.thumbnail_delegate.checkbox_rect(self.thumbnail_list.visualRect(index)).contains(pos):
+            return
+        self.on_thumbnail_click_path(index.data(PathRole))
+
     def on_thumbnail_click_path(self, image_path):
-        self.current_image_index = self.images.index(image_path)
-        self.display_current_image()
+        row = self.thumbnail_model.row_of(image_path)
+        if row >= 0:
+            self.current_image_index = row
+            self.display_current_image()
 
     def toggle_select_current_image(self):
         if 0 <= self.current_image_index < len(self.images):
-            current_item = self.thumbnail_list.item(self.current_image_index)
-            checkbox = self.thumbnail_list.itemWidget(current_item).findChild(QCheckBox)
-            if checkbox:
-                checkbox.setChecked(not checkbox.isChecked())
+            self.thumbnail_model.toggle_selected(self.images[self.current_image_index])
 
     def next_image(self):
         if self.current_image_index < len(self.images) - 1:
@@ -347,127 +1033,184 @@ class ImageCuller(QMainWindow):
             reply = QMessageBox.question(self, 'Delete Image', f"Are you sure you want to delete {os.path.basename(jpg_path)}?",
                                          QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
             if reply == QMessageBox.Yes:
-                self.images.pop(self.current_image_index)
-                self.delete_raw_pairs(jpg_path)
-                try:
-                    os.remove(jpg_path)
-                    self.display_current_image()
-                except FileNotFoundError:
-                    print(f"File not found: {jpg_path}")
-                    self.display_current_image()
-            self.load_images(os.path.dirname(jpg_path))
-
-    def delete_raw_pairs(self, image_path):
-        raw_extensions = ['.RAF', '.NEF', '.CR2', '.ARW', '.ORF', '.RW2', '.PEF']
-        base_name = os.path.splitext(image_path)[0]
-        for ext in raw_extensions:
-            raw_path = base_name + ext
-            if os.path.exists(raw_path):
-                os.remove(raw_path)
+                self.delete_paths([jpg_path])
 
     def delete_selected_images(self):
-        selected_items = [self.thumbnail_list.item(i) for i in range(self.thumbnail_list.count())]
-        items_to_delete = [item for item in selected_items if self.thumbnail_list.itemWidget(item).findChild(QCheckBox).isChecked()]
+        items_to_delete = self.thumbnail_model.selected_paths()
 
         if not items_to_delete:
             return
 
-        reply = QMessageBox.question(self, 'Delete Selected Images', "Are you sure you want to delete the selected images?",
+        reply = QMessageBox.question(self, 'Delete Selected Images', f"Are you sure you want to delete the {len(items_to_delete)} selected images?",
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
-            for item in items_to_delete:
-                image_path = item.data(Qt.UserRole)
-                self.images.remove(image_path)
-                self.delete_raw_pairs(image_path)
-                try:
-                    os.remove(image_path)
-                except FileNotFoundError:
-                    print(f"File not found: {image_path}")
-            self.load_images(os.path.dirname(image_path))
+            self.delete_paths(items_to_delete)
+
+    def delete_paths(self, paths):
+        # The carousel updates immediately; the files (and their RAW pairs) are
+        # moved into the staging trash on the file worker and only unlinked when
+        # the batch falls out of the undo history.
+        if self.pairing_index is None:
+            QMessageBox.information(self, 'Delete Images', "Still scanning the folder, try again in a moment.")
+            return
+        model = self.thumbnail_model
+        current_path = self.current_path()
+        batch = DeleteBatch([
+            (path, model.is_selected(path))
+            for path in paths if model.contains(path)
+        ])
+        if not batch.items:
+            return
+        with instrumentation.span("delete", images=len(batch.items)):
+            model.remove_paths(batch.paths, keep_thumbnails=True)
+            for path in batch.paths:
+                self.prefetcher.discard(path)
+                files = self.pairing_index.files(path)
+                batch.files.extend(files)
+                for file_path in files:
+                    self.pairing_index.remove(file_path)
+            self.file_worker.submit("Delete", self.stage_batch, batch)
+            self.delete_history.append(batch)
+            while len(self.delete_history) > DELETE_HISTORY_SIZE:
+                self.purge_batch(self.delete_history.popleft())
+            self.undo_delete_button.setEnabled(True)
+            self.restore_position(current_path)
+            self.refresh_stacks()
+
+    def stage_batch(self, batch):
+        batch.staged, errors = trash.stage_files(batch.files, batch.batch_id)
+        return errors
+
+    def undo_delete(self):
+        if not self.delete_history:
+            return
+        batch = self.delete_history.pop()
+        current_path = self.current_path()
+        self.file_worker.submit("Undo delete", lambda: trash.restore_files(batch.staged),
+                                on_finished=lambda: self.on_batch_restored(batch))
+        for file_path in batch.files:
+            self.pairing_index.add(file_path)
+        self.thumbnail_model.insert_sorted([(path, None) for path, _ in batch.items])
+        for path, selected in batch.items:
+            if selected:
+                self.thumbnail_model.set_selected(path, True)
+        self.undo_delete_button.setEnabled(bool(self.delete_history))
+        self.restore_position(current_path or batch.items[0][0])
+        self.refresh_stacks()
+
+    def on_batch_restored(self, batch):
+        # The carousel showed the frames again before the files were back; redraw
+        # the current one if it was part of the batch.
+        if 0 <= self.current_image_index < len(self.images) and self.images[self.current_image_index] in set(batch.paths):
+            self.prefetcher.discard(self.images[self.current_image_index])
+            self.display_current_image()
+
+    def purge_batch(self, batch):
+        self.file_worker.submit("Empty trash", lambda: trash.purge_files(batch.staged))
+        self.thumbnail_model.release_thumbnails(batch.paths)
+        for path in batch.paths:
+            if not self.thumbnail_model.contains(path):
+                self.metadata.remove(path)
+
+    def purge_delete_history(self):
+        while self.delete_history:
+            self.purge_batch(self.delete_history.popleft())
+        self.undo_delete_button.setEnabled(False)
+
+    def restore_position(self, current_path):
+        # Keep showing the same frame if it survived; otherwise stay at the same
+        # position, which is now the frame after the deleted one.
+        row = self.thumbnail_model.row_of(current_path) if current_path else -1
+        if row >= 0:
+            if row != self.current_image_index:
+                self.current_image_index = row
+                self.display_current_image()
+            return
+        self.current_image_index = min(max(self.current_image_index, 0), len(self.images) - 1)
+        self.display_current_image()
+
+    def on_file_operation_failed(self, description, errors):
+        for path, error in errors:
+            print(f"{description} failed for {path}: {error}")
+
+    def select_softest_images(self):
+        paths = self.thumbnail_model.all_paths()
+        scored = [path for path in paths if path in self.focus_scores]
+        if not scored:
+            QMessageBox.information(self, 'Select Softest', "Focus scores are still being computed, try again in a moment.")
+            return
+        scored.sort(key=lambda path: self.focus_scores[path])
+        count = max(1, round(len(paths) * self.softest_percent.value() / 100))
+        for path in scored[:count]:
+            self.thumbnail_model.set_selected(path, True)
 
     def select_all_images(self):
-        for i in range(self.thumbnail_list.count()):
-            item = self.thumbnail_list.item(i)
-            checkbox = self.thumbnail_list.itemWidget(item).findChild(QCheckBox)
-            if checkbox:
-                checkbox.setChecked(True)
+        # Every frame the filter lets through, burst members folded into a
+        # stack included
+        paths = self.thumbnail_model.all_paths()
+        if self.filter_conditions:
+            paths = self.metadata.filter(paths, self.filter_conditions)
+        self.thumbnail_model.select_all(paths)
 
     def upload_selected_images(self):
-        selected_items = [self.thumbnail_list.item(i) for i in range(self.thumbnail_list.count())]
-        items_to_upload = [item for item in selected_items if self.thumbnail_list.itemWidget(item).findChild(QCheckBox).isChecked()]
+        items_to_upload = self.thumbnail_model.selected_paths()
 
         if not items_to_upload:
             QMessageBox.information(self, 'Upload Images', "No images selected for upload.")
             return
-
-        creds = get_credentials()
-        try:
-            service = build('photoslibrary', 'v1', credentials=creds, discoveryServiceUrl='https://photoslibrary.googleapis.com/$discovery/rest?version=v1')
-        except Exception as e:
-            QMessageBox.critical(self, 'Google Photos API Error', f"Failed to build service: {e}")
+        if self.upload_thread is not None and self.upload_thread.isRunning():
+            QMessageBox.information(self, 'Upload Images', "An upload is already in progress.")
+            return
+        if self.pairing_index is None:
+            QMessageBox.information(self, 'Upload Images', "Still scanning the folder, try again in a moment.")
             return
 
-        for item in items_to_upload:
-            image_path = item.data(Qt.UserRole)
-            upload_token = self.upload_image_bytes(service, image_path)
-            if upload_token:
-                self.create_media_item(service, upload_token, os.path.basename(image_path))
-
-                # Upload associated RAW pairs
-                raw_extensions = ['.RAF', '.NEF', '.CR2', '.ARW', '.ORF', '.RW2', '.PEF']
-                base_name = os.path.splitext(image_path)[0]
-                for ext in raw_extensions:
-                    raw_path = base_name + ext
-                    if os.path.exists(raw_path):
-                        raw_upload_token = self.upload_image_bytes(service, raw_path)
-                        if raw_upload_token:
-                            self.create_media_item(service, raw_upload_token, os.path.basename(raw_path))
-
-        QMessageBox.information(self, 'Upload Images', "Selected images and their RAW pairs have been uploaded to Google Photos.")
-
-    def upload_image_bytes(self, service, image_path):
-        try:
-            with open(image_path, 'rb') as image_file:
-                image_data = image_file.read()
-
-            headers = {
-                'Content-type': 'application/octet-stream',
-                'X-Goog-Upload-Content-Type': 'image/jpeg' if image_path.lower().endswith('.jpg') else 'image/raw',
-                'X-Goog-Upload-Protocol': 'raw',
-            }
-
-            upload_response = service._http.request(
-                uri='https://photoslibrary.googleapis.com/v1/uploads',
-                method='POST',
-                body=image_data,
-                headers=headers
-            )
-
-            upload_token = upload_response[1].decode('utf-8')
-            return upload_token
-
-        except Exception as e:
-            print(f"Error uploading image {image_path}: {e}")
-            return None
-
-    def create_media_item(self, service, upload_token, file_name):
-        try:
-            new_item = {
-                'newMediaItems': [
-                    {
-                        'description': file_name,
-                        'simpleMediaItem': {
-                            'uploadToken': upload_token
-                        }
-                    }
-                ]
-            }
-            service.mediaItems().batchCreate(body=new_item).execute()
-        except Exception as e:
-            print(f"Error creating media item for {file_name}: {e}")
+        # Each JPEG goes up together with its RAW pairs
+        paths = []
+        for image_path in items_to_upload:
+            paths.append(image_path)
+            paths.extend(self.pairing_index.raws(image_path))
+
+        self.upload_sizes = {}
+        self.upload_sent = {}
+        self.upload_button.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.upload_thread = UploadWorker(paths)
+        self.upload_thread.file_progress.connect(self.update_upload_progress)
+        self.upload_thread.file_finished.connect(self.on_upload_file_finished)
+        self.upload_thread.upload_failed.connect(lambda message: QMessageBox.critical(self, 'Google Photos API Error', message))
+        self.upload_thread.finished.connect(self.upload_finished)
+        self.upload_thread.start()
+
+    def update_upload_progress(self, image_path, bytes_sent, total):
+        self.upload_sizes[image_path] = total
+        self.upload_sent[image_path] = bytes_sent
+        total_bytes = sum(self.upload_sizes.values())
+        if total_bytes:
+            self.progress_bar.setValue(int(sum(self.upload_sent.values()) / total_bytes * 100))
+
+    def on_upload_file_finished(self, image_path, succeeded, error):
+        if not succeeded:
+            print(f"Error uploading image {image_path}: {error}")
+
+    def upload_finished(self):
+        self.upload_button.setEnabled(True)
+        self.progress_bar.setVisible(False)
+        results = self.upload_thread.results
+        if not results:
+            return
+        failed = [item for item in results if not item.succeeded]
+        skipped = sum(1 for item in results if item.skipped and item.succeeded)
+        note = f"\n{skipped} were already in Google Photos and were skipped." if skipped else ""
+        if failed:
+            names = "\n".join(item.file_name for item in failed[:20])
+            QMessageBox.warning(self, 'Upload Images', f"{len(results) - len(failed)} of {len(results)} files uploaded.{note} These failed:\n{names}")
+        else:
+            QMessageBox.information(self, 'Upload Images', f"Selected images and their RAW pairs have been uploaded to Google Photos.{note}")
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    app = QApplication(instrumentation.enable_from_args(sys.argv))
     window = ImageCuller()
     window.show()
     sys.exit(app.exec_())
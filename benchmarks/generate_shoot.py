@@ -0,0 +1,194 @@
+import argparse
+import math
+import os
+import random
+import struct
+from datetime import datetime, timedelta
+from PyQt5.QtCore import Qt, QBuffer, QByteArray, QIODevice, QPointF, QRectF
+from PyQt5.QtGui import QColor, QImage, QLinearGradient, QPainter
+
+# Writes a synthetic shoot folder: N JPEGs with camera-like Exif (including an
+# embedded IFD1 thumbnail), fake RAW sidecars and the odd XMP, arranged in
+# bursts of near-identical frames with a share of deliberately soft ones.
+
+CAMERAS = [
+    ("FUJIFILM", "X-T4", "FUJIFILM", "XF16-55mmF2.8 R LM WR", ".RAF"),
+    ("NIKON CORPORATION", "NIKON Z 6_2", "NIKON", "NIKKOR Z 24-70mm f/4 S", ".NEF"),
+    ("SONY", "ILCE-7M4", "SONY", "FE 24-105mm F4 G OSS", ".ARW"),
+    ("Canon", "Canon EOS R6", "Canon", "RF24-105mm F4 L IS USM", ".CR3"),
+]
+EXPOSURE_TIMES = [(1, 4000), (1, 2000), (1, 1000), (1, 500), (1, 250), (1, 125), (1, 60), (1, 30), (1, 15)]
+F_NUMBERS = [(28, 10), (40, 10), (56, 10), (80, 10), (110, 10)]
+ISOS = [100, 200, 400, 800, 1600, 3200, 6400, 12800]
+
+ASCII, SHORT, LONG, RATIONAL = 2, 3, 4, 5
+
+
+def encode_ifd(entries, offset, next_offset):
+    # entries are (tag, type, value); values that don't fit in the entry go in
+    # a data area right after the IFD, which starts at `offset` in the TIFF.
+    entries = sorted(entries)
+    data_offset = offset + 2 + 12 * len(entries) + 4
+    table = struct.pack('<H', len(entries))
+    data = b''
+    for tag, field_type, value in entries:
+        if field_type == ASCII:
+            raw = value.encode('ascii') + b'\x00'
+            count = len(raw)
+        elif field_type == RATIONAL:
+            values = value if isinstance(value, list) else [value]
+            raw = b''.join(struct.pack('<II', *pair) for pair in values)
+            count = len(values)
+        else:
+            values = value if isinstance(value, list) else [value]
+            raw = b''.join(struct.pack('<H' if field_type == SHORT else '<I', v) for v in values)
+            count = len(values)
+        if len(raw) <= 4:
+            table += struct.pack('<HHI', tag, field_type, count) + raw.ljust(4, b'\x00')
+        else:
+            if len(raw) % 2:
+                raw += b'\x00'
+            table += struct.pack('<HHII', tag, field_type, count, data_offset + len(data))
+            data += raw
+    return table + struct.pack('<I', next_offset) + data
+
+
+def build_exif(ifd0, exif_ifd, thumbnail):
+    # Sizes don't depend on offsets, so lay everything out once at offset 0 to
+    # measure and then for real.
+    ifd0 = list(ifd0) + [(0x8769, LONG, 0)]
+    ifd1 = [(0x0103, SHORT, 6), (0x0201, LONG, 0), (0x0202, LONG, len(thumbnail))]
+    ifd0_offset = 8
+    exif_offset = ifd0_offset + len(encode_ifd(ifd0, 0, 0))
+    ifd1_offset = exif_offset + len(encode_ifd(exif_ifd, 0, 0))
+    thumb_offset = ifd1_offset + len(encode_ifd(ifd1, 0, 0))
+    ifd0[-1] = (0x8769, LONG, exif_offset)
+    ifd1[1] = (0x0201, LONG, thumb_offset)
+    tiff = b'II*\x00' + struct.pack('<I', ifd0_offset)
+    tiff += encode_ifd(ifd0, ifd0_offset, ifd1_offset)
+    tiff += encode_ifd(exif_ifd, exif_offset, 0)
+    tiff += encode_ifd(ifd1, ifd1_offset, 0)
+    tiff += thumbnail
+    return b'Exif\x00\x00' + tiff
+
+
+def insert_app1(jpeg, payload):
+    # APP1 goes straight after SOI, ahead of Qt's JFIF APP0.
+    segment = b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload
+    return jpeg[:2] + segment + jpeg[2:]
+
+
+def encode_jpeg(image, quality):
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "JPG", quality)
+    buffer.close()
+    return bytes(data)
+
+
+def render_scene(width, height, seed, shift, soft):
+    # Random shapes over a gradient with a noise overlay, so JPEG sizes and
+    # decode costs look like real photos rather than flat colour. Frames in a
+    # burst share a seed and differ by a small shift.
+    rng = random.Random(seed)
+    scale = 4 if soft else 1
+    image = QImage(width // scale, height // scale, QImage.Format_RGB32)
+    painter = QPainter(image)
+    painter.scale(1 / scale, 1 / scale)
+    gradient = QLinearGradient(QPointF(0, 0), QPointF(width, height))
+    gradient.setColorAt(0, QColor.fromHsv(rng.randrange(360), 120, 200))
+    gradient.setColorAt(1, QColor.fromHsv(rng.randrange(360), 160, 80))
+    painter.fillRect(QRectF(0, 0, width, height), gradient)
+    painter.translate(shift * width / 200, 0)
+    painter.setPen(Qt.NoPen)
+    for _ in range(60):
+        painter.setBrush(QColor.fromHsv(rng.randrange(360), rng.randrange(256), rng.randrange(256)))
+        w = rng.uniform(0.02, 0.3) * width
+        h = rng.uniform(0.02, 0.3) * height
+        painter.drawEllipse(QRectF(rng.uniform(0, width - w), rng.uniform(0, height - h), w, h))
+    painter.resetTransform()
+    noise = QImage(os.urandom(128 * 128 * 4), 128, 128, QImage.Format_RGB32).copy()
+    painter.setOpacity(0.12)
+    for y in range(0, image.height(), 128):
+        for x in range(0, image.width(), 128):
+            painter.drawImage(x, y, noise)
+    painter.end()
+    if soft:
+        image = image.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    return image
+
+
+def generate_shoot(directory, count, megapixels=24.0, raw_fraction=1.0, raw_size=None,
+                   burst_length=5, soft_fraction=0.2, quality=90, seed=1):
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    width = int(math.sqrt(megapixels * 1e6 * 3 / 2))
+    height = width * 2 // 3
+    camera = rng.choice(CAMERAS)
+    timestamp = datetime(2024, 6, 1, 9, 0, 0)
+    paths = []
+    for i in range(count):
+        if i % burst_length == 0:
+            burst_seed = rng.randrange(1 << 30)
+            timestamp += timedelta(seconds=rng.uniform(5, 120))
+            if rng.random() < 0.1:
+                camera = rng.choice(CAMERAS)
+            settings = (rng.choice(EXPOSURE_TIMES), rng.choice(F_NUMBERS), rng.choice(ISOS))
+        else:
+            timestamp += timedelta(milliseconds=rng.choice([67, 100, 125, 200]))
+        soft = rng.random() < soft_fraction
+        image = render_scene(width, height, burst_seed, i % burst_length, soft)
+        thumbnail = encode_jpeg(image.scaled(160, 120, Qt.KeepAspectRatio, Qt.SmoothTransformation), 80)
+
+        make, model, lens_make, lens_model, raw_ext = camera
+        exposure, f_number, iso = settings
+        stamp = timestamp.strftime("%Y:%m:%d %H:%M:%S")
+        ifd0 = [
+            (0x010F, ASCII, make), (0x0110, ASCII, model), (0x0112, SHORT, 1),
+            (0x011A, RATIONAL, (72, 1)), (0x011B, RATIONAL, (72, 1)), (0x0128, SHORT, 2),
+            (0x0131, ASCII, "ShutterSweep benchmark"), (0x0132, ASCII, stamp),
+        ]
+        exif_ifd = [
+            (0x829A, RATIONAL, exposure), (0x829D, RATIONAL, f_number), (0x8827, SHORT, iso),
+            (0x9003, ASCII, stamp), (0x9004, ASCII, stamp),
+            (0x9291, ASCII, f"{timestamp.microsecond // 10000:02d}"),
+            (0x920A, RATIONAL, (rng.choice([16, 24, 35, 50, 70, 105]), 1)),
+            (0xA002, LONG, width), (0xA003, LONG, height),
+            (0xA433, ASCII, lens_make), (0xA434, ASCII, lens_model),
+        ]
+        jpeg = insert_app1(encode_jpeg(image, quality), build_exif(ifd0, exif_ifd, thumbnail))
+
+        base = os.path.join(directory, f"DSC{i + 1:05d}")
+        with open(base + ".JPG", 'wb') as jpeg_file:
+            jpeg_file.write(jpeg)
+        if rng.random() < raw_fraction:
+            # RAW content is never decoded, only moved and uploaded; random bytes
+            # of a plausible size are enough.
+            with open(base + raw_ext, 'wb') as raw_file:
+                raw_file.write(os.urandom(raw_size if raw_size is not None else len(jpeg) * 3))
+        if i % 10 == 0:
+            with open(base + raw_ext + ".xmp", 'w') as xmp_file:
+                xmp_file.write('<x:xmpmeta xmlns:x="adobe:ns:meta/"/>\n')
+        paths.append(base + ".JPG")
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic shoot folder for benchmarks.")
+    parser.add_argument("directory")
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--megapixels", type=float, default=24.0)
+    parser.add_argument("--raw-fraction", type=float, default=1.0)
+    parser.add_argument("--raw-size", type=int, default=None, help="RAW sidecar size in bytes (default: 3x the JPEG)")
+    parser.add_argument("--burst-length", type=int, default=5)
+    parser.add_argument("--soft-fraction", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    paths = generate_shoot(args.directory, args.count, args.megapixels, args.raw_fraction, args.raw_size,
+                           args.burst_length, args.soft_fraction, seed=args.seed)
+    print(f"Wrote {len(paths)} frames to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
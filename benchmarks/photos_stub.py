@@ -0,0 +1,226 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A local stand-in for the two photoslibrary.googleapis.com endpoints the app
+# uses: /v1/uploads (raw and resumable protocols) and mediaItems:batchCreate.
+# It checks the protocol as strictly as the real service does where it matters
+# (offsets, sizes, the 50-item batch limit) and can inject latency and 503s,
+# either at random or scripted per endpoint with fail_next() for tests.
+
+BATCH_CREATE_LIMIT = 50
+CHUNK_GRANULARITY = 256 * 1024
+
+
+class StubState:
+    def __init__(self, failure_rate=0.0, latency=0.0):
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.tokens = {}
+        self.media_items = []
+        self.requests = 0
+        self.connections = 0
+        self.bytes_received = 0
+        self.failures_injected = 0
+        self.scripted = defaultdict(deque)
+        self.batch_sizes = []
+
+    def fail_next(self, endpoint, *statuses):
+        # endpoint is "start", "chunk" or "batch"; the next requests to it get
+        # these statuses (429 comes with Retry-After: 0)
+        with self.lock:
+            self.scripted[endpoint].extend(statuses)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                "bytes_received": self.bytes_received,
+                "media_items": len(self.media_items),
+                "failures_injected": self.failures_injected,
+            }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+
+    def reply(self, code, body=b'', headers=None):
+        self.send_response(code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length', 0) or 0)
+        return self.rfile.read(length) if length else b''
+
+    def do_POST(self):
+        state = self.server.state
+        body = self.read_body()
+        with state.lock:
+            state.requests += 1
+            state.bytes_received += len(body)
+        if state.latency:
+            time.sleep(state.latency)
+        if self.path == '/v1/uploads':
+            return self.handle_upload_start(body)
+        if self.path.startswith('/upload/'):
+            return self.handle_upload_chunk(self.path.rsplit('/', 1)[-1], body)
+        if self.path == '/v1/mediaItems:batchCreate':
+            return self.handle_batch_create(body)
+        self.reply(404)
+
+    def inject_failure(self, endpoint):
+        state = self.server.state
+        with state.lock:
+            status = state.scripted[endpoint].popleft() if state.scripted[endpoint] else None
+            if status is not None:
+                state.failures_injected += 1
+        if status is not None:
+            self.reply(status, b'scripted failure', {'Retry-After': '0'} if status == 429 else None)
+            return True
+        if state.failure_rate and random.random() < state.failure_rate:
+            with state.lock:
+                state.failures_injected += 1
+            self.reply(503, b'injected failure')
+            return True
+        return False
+
+    def new_token(self, size):
+        token = uuid.uuid4().hex
+        with self.server.state.lock:
+            self.server.state.tokens[token] = size
+        return token
+
+    def handle_upload_start(self, body):
+        if self.inject_failure("start"):
+            return
+        protocol = self.headers.get('X-Goog-Upload-Protocol', 'raw')
+        if protocol == 'raw':
+            return self.reply(200, self.new_token(len(body)).encode())
+        if self.headers.get('X-Goog-Upload-Command') != 'start':
+            return self.reply(400, b'expected start command')
+        session_id = uuid.uuid4().hex
+        with self.server.state.lock:
+            self.server.state.sessions[session_id] = {
+                'size': int(self.headers.get('X-Goog-Upload-Raw-Size', 0)),
+                'received': 0,
+            }
+        host, port = self.server.server_address[:2]
+        self.reply(200, headers={
+            'X-Goog-Upload-URL': f"http://{host}:{port}/upload/{session_id}",
+            'X-Goog-Upload-Chunk-Granularity': str(CHUNK_GRANULARITY),
+            'X-Goog-Upload-Status': 'active',
+        })
+
+    def handle_upload_chunk(self, session_id, body):
+        state = self.server.state
+        with state.lock:
+            session = state.sessions.get(session_id)
+        if session is None:
+            return self.reply(404, b'unknown upload session')
+        command = self.headers.get('X-Goog-Upload-Command', '')
+        if command == 'query':
+            status = 'final' if session.get('token') else 'active'
+            return self.reply(200, headers={
+                'X-Goog-Upload-Status': status,
+                'X-Goog-Upload-Size-Received': str(session['received']),
+            })
+        if self.inject_failure("chunk"):
+            return
+        offset = int(self.headers.get('X-Goog-Upload-Offset', -1))
+        if offset != session['received']:
+            return self.reply(400, b'offset mismatch')
+        finalize = 'finalize' in command
+        if not finalize and len(body) % CHUNK_GRANULARITY:
+            return self.reply(400, b'chunk not aligned to granularity')
+        session['received'] += len(body)
+        if finalize:
+            if session['received'] != session['size']:
+                return self.reply(400, b'size mismatch')
+            session['token'] = self.new_token(session['size'])
+            return self.reply(200, session['token'].encode(), {'X-Goog-Upload-Status': 'final'})
+        self.reply(200, headers={'X-Goog-Upload-Status': 'active'})
+
+    def handle_batch_create(self, body):
+        if self.inject_failure("batch"):
+            return
+        try:
+            items = json.loads(body)['newMediaItems']
+        except (ValueError, KeyError):
+            return self.reply(400, b'bad request')
+        with self.server.state.lock:
+            self.server.state.batch_sizes.append(len(items))
+        if len(items) > BATCH_CREATE_LIMIT:
+            return self.reply(400, b'too many media items')
+        state = self.server.state
+        results = []
+        with state.lock:
+            for item in items:
+                token = item.get('simpleMediaItem', {}).get('uploadToken')
+                if token in state.tokens:
+                    media_id = uuid.uuid4().hex
+                    state.media_items.append((media_id, item.get('simpleMediaItem', {}).get('fileName')))
+                    results.append({'uploadToken': token, 'status': {'message': 'Success'},
+                                    'mediaItem': {'id': media_id}})
+                else:
+                    results.append({'uploadToken': token, 'status': {'code': 3, 'message': 'Invalid upload token'}})
+        self.reply(200, json.dumps({'newMediaItemResults': results}).encode(), {'Content-Type': 'application/json'})
+
+
+class PhotosStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, failure_rate=0.0, latency=0.0):
+        super().__init__(('127.0.0.1', port), StubHandler)
+        self.state = StubState(failure_rate, latency)
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local Google Photos API stub.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    args = parser.parse_args()
+    server = PhotosStubServer(args.port, args.failure_rate, args.latency)
+    print(f"Photos API stub listening on {server.url} (set SHUTTERSWEEP_PHOTOS_API to this URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
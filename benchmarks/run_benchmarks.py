@@ -0,0 +1,571 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Headless benchmarks for the hot paths: folder scan (cold and warm cache),
+# thumbnail decode, Exif parsing, image display, delete and upload. Each stage
+# runs in its own process so peak RSS is per stage, and the results are written
+# as JSON that --compare can diff against an earlier run.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+STAGES = ["exif", "thumbnail_decode", "scan_cold", "scan_warm", "display", "focus", "delete", "upload", "upload_resume", "carousel", "metadata"]
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def current_rss_mb():
+    # Resident set right now (peak_rss_mb only ever goes up); Linux only
+    try:
+        with open("/proc/self/statm") as statm:
+            return round(int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def latency_summary(samples):
+    return {
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 0.5) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+    }
+
+
+def shoot_jpegs(shoot):
+    from pairing import build_pairing_index
+    return sorted(build_pairing_index(shoot).jpeg_paths())
+
+
+def get_app():
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication(sys.argv[:1])
+
+
+def wait_until(app, condition, timeout=600):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("benchmark stage timed out")
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def stage_exif(shoot, args):
+    import warnings
+    from exif import Image
+    from exif_reader import read_summary
+    paths = shoot_jpegs(shoot)
+    start = time.perf_counter()
+    for path in paths:
+        read_summary(path)
+    fast = time.perf_counter() - start
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for path in paths:
+            with open(path, 'rb') as image_file:
+                image = Image(image_file)
+            {tag: image.get(tag) for tag in ("model", "lens_model", "f_number", "photographic_sensitivity",
+                                             "exposure_time", "datetime_original")}
+    full = time.perf_counter() - start
+    return {
+        "items": len(paths),
+        "wall_s": round(fast, 4),
+        "throughput_per_s": round(len(paths) / fast, 1) if fast else None,
+        "summary_reader_us_per_image": round(fast / len(paths) * 1e6, 1),
+        "exif_package_us_per_image": round(full / len(paths) * 1e6, 1),
+    }
+
+
+def stage_thumbnail_decode(shoot, args):
+    from PyQt5.QtCore import QSize
+    from PyQt5.QtGui import QImage
+    from image_decode import decode_embedded_thumbnail, decode_scaled, decode_thumbnail
+    get_app()
+    paths = shoot_jpegs(shoot)[:args.sample]
+    timings = {}
+    for name, decode in (
+        ("embedded", lambda path: decode_embedded_thumbnail(path, 100)),
+        ("scaled", lambda path: decode_scaled(path, QSize(100, 100))),
+        ("full", lambda path: QImage(path)),
+        ("engine", lambda path: decode_thumbnail(path, 100)),
+    ):
+        start = time.perf_counter()
+        for path in paths:
+            decode(path)
+        timings[name] = time.perf_counter() - start
+    return {
+        "items": len(paths),
+        "wall_s": round(timings["engine"], 4),
+        "throughput_per_s": round(len(paths) / timings["engine"], 1) if timings["engine"] else None,
+        **{f"{name}_ms_per_image": round(value / len(paths) * 1000, 3) for name, value in timings.items()},
+    }
+
+
+def run_scan(app, shoot, cache, recursive=False):
+    import ShutterSweep
+    loader = ShutterSweep.ImageLoader(shoot, cache, recursive=recursive)
+    first = []
+    loaded = []
+    start = time.perf_counter()
+
+    def on_batch(batch):
+        if not first:
+            first.append(time.perf_counter() - start)
+        loaded.extend(batch)
+
+    loader.images_loaded.connect(on_batch)
+    loader.start()
+    wait_until(app, lambda: loader.isFinished())
+    app.processEvents()
+    wall = time.perf_counter() - start
+    return {
+        "items": len(loaded),
+        "wall_s": round(wall, 4),
+        "throughput_per_s": round(len(loaded) / wall, 1) if wall else None,
+        "time_to_first_thumbnail_ms": round(first[0] * 1000, 2) if first else None,
+    }
+
+
+def stage_scan_cold(shoot, args):
+    from thumbnail_cache import ThumbnailCache
+    app = get_app()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ThumbnailCache(os.path.join(cache_dir, "thumbnails.db"))
+        result = run_scan(app, shoot, cache)
+        cache.close()
+    return result
+
+
+def stage_scan_warm(shoot, args):
+    from thumbnail_cache import ThumbnailCache
+    app = get_app()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ThumbnailCache(os.path.join(cache_dir, "thumbnails.db"))
+        run_scan(app, shoot, cache)
+        result = run_scan(app, shoot, cache)
+        cache.close()
+    return result
+
+
+def open_window(app, shoot):
+    import ShutterSweep
+    window = ShutterSweep.ImageCuller()
+    # Every frame in the carousel, as before burst stacks, so the display and
+    # delete numbers stay comparable across runs
+    window.group_bursts_checkbox.setChecked(False)
+    window.show()
+    window.load_directory(shoot)
+    wait_until(app, lambda: window.loader_thread.isFinished() and not window.loading_label.isVisible())
+    return window
+
+
+def stage_display(shoot, args):
+    app = get_app()
+    window = open_window(app, shoot)
+    steps = min(args.sample, len(window.images) - 1)
+
+    # Cold: nothing cached, every frame decoded on the spot
+    cold = []
+    for index in range(steps):
+        window.prefetcher.reset()
+        window.current_image_index = index
+        start = time.perf_counter()
+        window.display_current_image()
+        cold.append(time.perf_counter() - start)
+        app.processEvents()
+
+    # Held arrow key: next_image at roughly key-repeat rate with the prefetcher running
+    window.prefetcher.reset()
+    window.current_image_index = 0
+    window.display_current_image()
+    warm = []
+    for _ in range(steps):
+        pause_until = time.monotonic() + args.key_repeat
+        while time.monotonic() < pause_until:
+            app.processEvents()
+            time.sleep(0.001)
+        start = time.perf_counter()
+        window.next_image()
+        warm.append(time.perf_counter() - start)
+    window.close()
+    return {
+        "items": steps,
+        "wall_s": round(sum(warm), 4),
+        "throughput_per_s": round(steps / sum(warm), 1) if sum(warm) else None,
+        "cold": latency_summary(cold),
+        "prefetched": latency_summary(warm),
+    }
+
+
+def stage_carousel(shoot, args):
+    # Memory for a very large catalog: the shoot's thumbnails are repeated
+    # under synthetic paths up to --carousel-frames, then the whole carousel is
+    # scrolled through. Resident memory should not grow with the frame count.
+    from PyQt5.QtCore import QSize
+    from PyQt5.QtGui import QImage
+    from PyQt5.QtWidgets import QListView
+    from image_decode import decode_thumbnail
+    from thumbnail_model import ThumbnailModel, ThumbnailDelegate
+    from thumbnail_store import ThumbnailStore
+    from ShutterSweep import THUMBNAIL_SIZE
+    app = get_app()
+    thumbnails = [decode_thumbnail(path, THUMBNAIL_SIZE) for path in shoot_jpegs(shoot)[:args.sample]]
+    thumbnails = [thumbnail for thumbnail in thumbnails if not thumbnail.isNull()] or [QImage()]
+    store = ThumbnailStore(THUMBNAIL_SIZE)
+    model = ThumbnailModel(store)
+    view = QListView()
+    view.setFlow(QListView.LeftToRight)
+    view.setUniformItemSizes(True)
+    view.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    view.setItemDelegate(ThumbnailDelegate(THUMBNAIL_SIZE, view))
+    view.setModel(model)
+    view.resize(1200, THUMBNAIL_SIZE + 40)
+    view.show()
+    before = current_rss_mb()
+    start = time.perf_counter()
+    for first in range(0, args.carousel_frames, 1000):
+        model.insert_sorted([(f"/catalog/{index // 500:04d}/IMG_{index:06d}.JPG", thumbnails[index % len(thumbnails)])
+                             for index in range(first, min(first + 1000, args.carousel_frames))])
+        app.processEvents()
+    loaded = time.perf_counter() - start
+    after_load = current_rss_mb()
+    start = time.perf_counter()
+    for row in range(0, model.rowCount(), 50):
+        view.scrollTo(model.index(row))
+        view.repaint()
+    scrolled = time.perf_counter() - start
+    after_scroll = current_rss_mb()
+    view.close()
+    return {
+        "items": model.rowCount(),
+        "wall_s": round(loaded, 4),
+        "throughput_per_s": round(model.rowCount() / loaded, 1) if loaded else None,
+        "scroll_s": round(scrolled, 4),
+        "rss_before_mb": before,
+        "rss_loaded_mb": after_load,
+        "rss_scrolled_mb": after_scroll,
+        "resident_pixmaps": len(store.pixmaps),
+    }
+
+
+def stage_metadata(shoot, args):
+    # Sort and filter over --carousel-frames rows: the shoot's Exif summaries
+    # repeated under synthetic paths, with capture times spread over several
+    # bodies. Timings include handing the new order to the carousel model.
+    from exif_reader import read_summary
+    from metadata_table import MetadataTable, parse_filter
+    from thumbnail_model import ThumbnailModel
+    from thumbnail_store import ThumbnailStore
+    from ShutterSweep import THUMBNAIL_SIZE
+    get_app()
+    summaries = [read_summary(path) for path in shoot_jpegs(shoot)[:args.sample]] or [{}]
+    table = MetadataTable()
+    paths = []
+    start = time.perf_counter()
+    for index in range(args.carousel_frames):
+        path = f"/catalog/{index % 7:02d}/IMG_{index:06d}.JPG"
+        table.add(path, summaries[index % len(summaries)])
+        paths.append(path)
+    filled = time.perf_counter() - start
+    model = ThumbnailModel(ThumbnailStore(THUMBNAIL_SIZE))
+    model.set_order(paths)
+    timings = {}
+    for column in ("capture_time", "iso", "exposure_time", "name"):
+        start = time.perf_counter()
+        model.set_order(table.order(model.paths, column))
+        timings[f"sort_{column}_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    for text in ("shutter>1/60", "iso>6400", "aperture<=2.8 camera=x"):
+        conditions = parse_filter(text)
+        start = time.perf_counter()
+        shown = table.filter(paths, conditions)
+        model.set_order(table.order(shown, "capture_time"))
+        timings[f"filter {text}"] = {"ms": round((time.perf_counter() - start) * 1000, 2), "shown": len(shown)}
+    sort_total = sum(value for key, value in timings.items() if key.startswith("sort_")) / 1000
+    return {
+        "items": len(paths),
+        "wall_s": round(sort_total, 4),
+        "throughput_per_s": round(len(paths) * 4 / sort_total, 1) if sort_total else None,
+        "fill_ms": round(filled * 1000, 2),
+        **timings,
+    }
+
+
+def stage_focus(shoot, args):
+    from focus import FocusScorer, score_image
+    app = get_app()
+    paths = shoot_jpegs(shoot)
+    start = time.perf_counter()
+    for path in paths[:args.sample]:
+        score_image(path)
+    serial = (time.perf_counter() - start) / min(args.sample, len(paths))
+    scorer = FocusScorer()
+    finished = []
+    scorer.scoring_finished.connect(lambda: finished.append(True))
+    start = time.perf_counter()
+    scorer.score([(path, 0, 0) for path in paths])
+    wait_until(app, lambda: finished)
+    wall = time.perf_counter() - start
+    scorer.shutdown()
+    return {
+        "items": len(paths),
+        "workers": scorer.max_workers,
+        "wall_s": round(wall, 4),
+        "throughput_per_s": round(len(paths) / wall, 1) if wall else None,
+        "serial_ms_per_image": round(serial * 1000, 2),
+    }
+
+
+def link_or_copy_tree(source, target):
+    os.makedirs(target, exist_ok=True)
+    for entry in os.scandir(source):
+        if entry.is_file():
+            destination = os.path.join(target, entry.name)
+            try:
+                os.link(entry.path, destination)
+            except OSError:
+                shutil.copy2(entry.path, destination)
+
+
+def stage_delete(shoot, args):
+    app = get_app()
+    with tempfile.TemporaryDirectory() as scratch:
+        # Hard links keep the scratch copy cheap; deleting them leaves the shoot intact
+        work = os.path.join(scratch, "shoot")
+        link_or_copy_tree(shoot, work)
+        window = open_window(app, work)
+        paths = list(window.images)
+        files_before = len(os.listdir(work))
+        start = time.perf_counter()
+        window.delete_paths(paths)
+        ui = time.perf_counter() - start
+        window.file_worker.executor.submit(lambda: None).result()
+        staged = time.perf_counter() - start
+        start = time.perf_counter()
+        window.purge_delete_history()
+        window.file_worker.executor.submit(lambda: None).result()
+        purged = time.perf_counter() - start
+        files_after = len([name for name in os.listdir(work) if not name.startswith('.')])
+        window.close()
+    return {
+        "items": len(paths),
+        "files_moved": files_before - files_after,
+        "wall_s": round(ui, 4),
+        "throughput_per_s": round(len(paths) / ui, 1) if ui else None,
+        "ui_ms": round(ui * 1000, 2),
+        "staged_ms": round(staged * 1000, 2),
+        "purge_ms": round(purged * 1000, 2),
+    }
+
+
+def stage_upload(shoot, args):
+    import requests
+    from benchmarks.photos_stub import PhotosStubServer
+    from pairing import build_pairing_index
+    from photos_uploader import PhotosUploader
+    index = build_pairing_index(shoot)
+    paths = []
+    for jpeg in sorted(index.jpeg_paths()):
+        paths.append(jpeg)
+        paths.extend(index.raws(jpeg))
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    server = PhotosStubServer(failure_rate=args.failure_rate, latency=args.latency).start()
+    try:
+        uploader = PhotosUploader(requests.Session(), api_base=server.url, max_workers=args.workers, backoff=0.05)
+        start = time.perf_counter()
+        items = uploader.upload(paths)
+        wall = time.perf_counter() - start
+        stats = server.state.stats()
+    finally:
+        server.stop()
+    return {
+        "items": len(items),
+        "succeeded": sum(item.succeeded for item in items),
+        "wall_s": round(wall, 4),
+        "throughput_per_s": round(len(items) / wall, 1) if wall else None,
+        "megabytes_per_s": round(total_bytes / wall / 1e6, 2) if wall else None,
+        "requests": stats["requests"],
+        "connections": stats["connections"],
+        "failures_injected": stats["failures_injected"],
+    }
+
+
+def stage_upload_resume(shoot, args):
+    # Cancels an upload with the ledger halfway through, resumes it, then runs
+    # it a third time. Every file must end up as exactly one media item, the
+    # resumed run must not resend what the stub already has, and the last run
+    # should send nothing at all.
+    import requests
+    from benchmarks.photos_stub import PhotosStubServer
+    from pairing import build_pairing_index
+    from photos_uploader import PhotosUploader
+    from upload_ledger import UploadLedger
+    index = build_pairing_index(shoot)
+    paths = []
+    for jpeg in sorted(index.jpeg_paths()):
+        paths.append(jpeg)
+        paths.extend(index.raws(jpeg))
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    ledger = UploadLedger()
+    server = PhotosStubServer(failure_rate=args.failure_rate, latency=args.latency).start()
+    runs = []
+    try:
+        for run in ("interrupted", "resumed", "repeat"):
+            done = []
+            uploader = PhotosUploader(requests.Session(), api_base=server.url, max_workers=args.workers,
+                                      chunk_size=1024 * 1024, backoff=0.05, ledger=ledger)
+            if run == "interrupted":
+                def on_item_done(item, uploader=uploader, done=done):
+                    done.append(item)
+                    if len(done) >= len(paths) // 2:
+                        uploader.cancel()
+                uploader.on_item_done = on_item_done
+            before = server.state.stats()
+            start = time.perf_counter()
+            items = uploader.upload(paths)
+            wall = time.perf_counter() - start
+            after = server.state.stats()
+            runs.append({
+                "run": run,
+                "wall_s": round(wall, 4),
+                "succeeded": sum(item.succeeded for item in items),
+                "skipped": sum(item.skipped for item in items),
+                "bytes_sent": after["bytes_received"] - before["bytes_received"],
+            })
+        stats = server.state.stats()
+    finally:
+        server.stop()
+        ledger.close()
+    return {
+        "items": len(paths),
+        "wall_s": runs[-1]["wall_s"],
+        "throughput_per_s": round(len(paths) / runs[-1]["wall_s"], 1) if runs[-1]["wall_s"] else None,
+        "media_items": stats["media_items"],
+        "duplicates": stats["media_items"] - len(paths),
+        "total_bytes": total_bytes,
+        "resent_bytes": runs[0]["bytes_sent"] + runs[1]["bytes_sent"] - total_bytes,
+        "runs": runs,
+    }
+
+
+def run_stage(name, shoot, args):
+    result = globals()[f"stage_{name}"](shoot, args)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_all(shoot, args):
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "shoot": shoot,
+            "images": len(shoot_jpegs(shoot)),
+        },
+        "stages": {},
+    }
+    for name in args.stages:
+        command = [sys.executable, "-m", "benchmarks.run_benchmarks", "--stage", name, "--shoot", shoot,
+                   "--sample", str(args.sample), "--workers", str(args.workers),
+                   "--failure-rate", str(args.failure_rate), "--latency", str(args.latency),
+                   "--key-repeat", str(args.key_repeat), "--carousel-frames", str(args.carousel_frames)]
+        env = dict(os.environ)
+        env["SHUTTERSWEEP_CACHE_DIR"] = tempfile.mkdtemp(prefix="shuttersweep-bench-cache-")
+        completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+        shutil.rmtree(env["SHUTTERSWEEP_CACHE_DIR"], ignore_errors=True)
+        if completed.returncode != 0:
+            report["stages"][name] = {"error": completed.stderr.strip().splitlines()[-1:] or ["failed"]}
+        else:
+            report["stages"][name] = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(f"{name:>18}: {json.dumps(report['stages'][name])}", file=sys.stderr)
+    return report
+
+
+def compare(report, baseline):
+    print(f"{'stage':>18} {'metric':>18} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in report["stages"].items():
+        previous = baseline.get("stages", {}).get(name, {})
+        for metric in ("wall_s", "throughput_per_s", "peak_rss_mb"):
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"{name:>18} {metric:>18} {old:>12} {new:>12} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Shutter Sweep hot-path benchmarks headlessly.")
+    parser.add_argument("--shoot", help="Existing shoot folder (default: generate one)")
+    parser.add_argument("--count", type=int, default=200, help="Frames to generate when --shoot is not given")
+    parser.add_argument("--megapixels", type=float, default=24.0)
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--stage", choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument("--sample", type=int, default=50, help="Frames used by the per-image latency stages")
+    parser.add_argument("--workers", type=int, default=4, help="Upload worker count")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Injected 503 rate for the upload stub")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of latency per stub request")
+    parser.add_argument("--carousel-frames", type=int, default=60000, help="Frames loaded by the carousel stage")
+    parser.add_argument("--key-repeat", type=float, default=0.033, help="Seconds between simulated arrow presses")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    args = parser.parse_args()
+
+    if args.stage:
+        print(json.dumps(run_stage(args.stage, args.shoot, args)))
+        return
+
+    generated = None
+    shoot = args.shoot
+    if shoot is None:
+        from benchmarks.generate_shoot import generate_shoot
+        get_app()
+        generated = tempfile.mkdtemp(prefix="shuttersweep-bench-shoot-")
+        print(f"Generating {args.count} x {args.megapixels}MP frames in {generated}", file=sys.stderr)
+        generate_shoot(generated, args.count, args.megapixels)
+        shoot = generated
+    try:
+        report = run_all(shoot, args)
+    finally:
+        if generated:
+            shutil.rmtree(generated, ignore_errors=True)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as report_file:
+            report_file.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(report, json.load(baseline_file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+from datetime import datetime
+import numpy as np
+from PyQt5.QtCore import Qt
+from image_decode import grayscale_array
+
+# Burst grouping: every thumbnail gets a 64-bit difference hash (dHash), and
+# frames are grouped when they are neighbours in capture order, were taken
+# close together and look nearly the same. Only neighbours are compared, so a
+# folder costs one sort plus a vectorised pass, never all pairs.
+
+HASH_SIZE = 8
+MAX_GAP_SECONDS = 2.0
+MAX_DISTANCE = 12
+
+
+def image_dhash(image):
+    # Shrink to 9x8 grayscale and record whether each pixel is brighter than
+    # its right-hand neighbour: 64 bits that survive rescaling, recompression
+    # and small exposure changes.
+    if image.isNull():
+        return None
+    small = image.scaled(HASH_SIZE + 1, HASH_SIZE, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    gray = grayscale_array(small).astype(np.int16)
+    bits = (gray[:, 1:] > gray[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def popcount(values):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.int64)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def hamming_distances(a, b):
+    # Elementwise Hamming distance between two arrays of packed uint64 hashes.
+    return popcount(np.bitwise_xor(a, b))
+
+
+def capture_timestamp(tags):
+    value = tags.get("datetime_original")
+    if not value:
+        return None
+    try:
+        timestamp = datetime.strptime(value.strip(), "%Y:%m:%d %H:%M:%S").timestamp()
+    except ValueError:
+        return None
+    subsec = str(tags.get("subsec_time_original", "")).strip()
+    if subsec.isdigit():
+        timestamp += int(subsec) / 10 ** len(subsec)
+    return timestamp
+
+
+def group_bursts(frames, max_gap=MAX_GAP_SECONDS, max_distance=MAX_DISTANCE):
+    # frames is a list of (path, timestamp or None, dhash or None). Returns
+    # bursts of two or more paths in capture order. Frames without a capture
+    # time are ordered by name (camera numbering) and linked on the hash alone.
+    timed = sorted((timestamp, path, dhash) for path, timestamp, dhash in frames if timestamp is not None)
+    untimed = sorted((path, dhash) for path, timestamp, dhash in frames if timestamp is None)
+    bursts = []
+    if timed:
+        timestamps = np.array([timestamp for timestamp, _, _ in timed], dtype=np.float64)
+        bursts += link_neighbours([path for _, path, _ in timed], [dhash for _, _, dhash in timed],
+                                  np.diff(timestamps) <= max_gap, max_distance)
+    if untimed:
+        bursts += link_neighbours([path for path, _ in untimed], [dhash for _, dhash in untimed],
+                                  np.ones(len(untimed) - 1, dtype=bool), max_distance)
+    return bursts
+
+
+def link_neighbours(paths, hashes, close_in_time, max_distance):
+    known = np.array([dhash is not None for dhash in hashes])
+    packed = np.array([dhash or 0 for dhash in hashes], dtype=np.uint64)
+    linked = close_in_time & known[:-1] & known[1:]
+    linked &= hamming_distances(packed[:-1], packed[1:]) <= max_distance
+    # A burst starts wherever the link to the previous frame is broken
+    starts = np.flatnonzero(~linked) + 1
+    bursts = []
+    for start, end in zip(np.concatenate(([0], starts)), np.concatenate((starts, [len(paths)]))):
+        if end - start >= 2:
+            bursts.append(paths[start:end])
+    return bursts
+
+
+def best_frame(paths, scores):
+    # Sharpest frame by focus score; until scores exist, the first frame.
+    scored = [path for path in paths if path in scores]
+    if not scored:
+        return paths[0]
+    return max(scored, key=lambda path: scores[path])
@@ -0,0 +1,194 @@
+import struct
+import instrumentation
+
+# Bytes per component for each TIFF field type.
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+
+JPEG_INTERCHANGE_FORMAT = 0x0201
+JPEG_INTERCHANGE_FORMAT_LENGTH = 0x0202
+EXIF_IFD_POINTER = 0x8769
+
+# Field name -> (IFD, tag). Names follow the exif package so callers can use
+# either source interchangeably.
+IFD0 = 0
+EXIF_IFD = 1
+SUMMARY_TAGS = {
+    "make": (IFD0, 0x010F),
+    "model": (IFD0, 0x0110),
+    "exposure_time": (EXIF_IFD, 0x829A),
+    "f_number": (EXIF_IFD, 0x829D),
+    "photographic_sensitivity": (EXIF_IFD, 0x8827),
+    "datetime_original": (EXIF_IFD, 0x9003),
+    "subsec_time_original": (EXIF_IFD, 0x9291),
+    "lens_make": (EXIF_IFD, 0xA433),
+    "lens_model": (EXIF_IFD, 0xA434),
+}
+
+# Most cameras put APP1 right after SOI; the embedded thumbnail usually sits
+# inside the first 64KB, which is the whole of APP1 by the spec. The summary
+# tags usually sit in the first few KB, so read_summary starts with 16KB and
+# reads on to the end of APP1 only when the segment is longer (a large
+# MakerNote can push the lens tags further out).
+HEADER_READ_SIZE = 64 * 1024
+SUMMARY_READ_SIZE = 16 * 1024
+
+
+class ExifFormatError(ValueError):
+    pass
+
+
+def read_exif_segment(image_path, max_bytes=HEADER_READ_SIZE, initial_bytes=None):
+    # Reads initial_bytes first and only goes on (up to max_bytes) when the
+    # segment headers or the Exif APP1 segment itself run past them.
+    with open(image_path, 'rb') as image_file:
+        data = image_file.read(min(initial_bytes or max_bytes, max_bytes))
+        while len(data) < max_bytes:
+            start, end = exif_segment_bounds(data)
+            if end is None or end <= len(data):
+                break
+            more = image_file.read(min(end, max_bytes) - len(data))
+            if not more:
+                break
+            data += more
+    return find_exif_segment(data)
+
+
+def find_exif_segment(data):
+    # The TIFF payload of the Exif APP1 segment, or None if there is no Exif block.
+    start, end = exif_segment_bounds(data)
+    return data[start:end] if start is not None else None
+
+
+def exif_segment_bounds(data):
+    # Walks the JPEG marker segments up to the first scan. Returns the (start,
+    # end) of the Exif payload, where end may lie past a partial read;
+    # (None, needed) when the data stops before the next segment header; and
+    # (None, None) when there is no Exif block.
+    if data[:2] != b'\xff\xd8':
+        return None, None
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None, None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == 0xDA or marker == 0xD9:
+            return None, None
+        length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        if marker == 0xE1 and data[pos + 4:pos + 10] == b'Exif\x00\x00':
+            return pos + 10, pos + 2 + length
+        pos += 2 + length
+    return None, pos + 4
+
+
+class TiffReader:
+    def __init__(self, data):
+        if len(data) < 8:
+            raise ExifFormatError("TIFF header truncated")
+        if data[:2] == b'II':
+            self.endian = '<'
+        elif data[:2] == b'MM':
+            self.endian = '>'
+        else:
+            raise ExifFormatError("Bad TIFF byte order")
+        self.data = data
+        if self.unpack('H', 2) != 42:
+            raise ExifFormatError("Bad TIFF magic")
+        self.ifd0_offset = self.unpack('I', 4)
+
+    def unpack(self, fmt, offset):
+        fmt = self.endian + fmt
+        end = offset + struct.calcsize(fmt)
+        if offset < 0 or end > len(self.data):
+            raise ExifFormatError("Offset outside Exif block")
+        values = struct.unpack(fmt, self.data[offset:end])
+        return values[0] if len(values) == 1 else values
+
+    def read_ifd(self, offset):
+        # Returns ({tag: (type, count, value_offset)}, next_ifd_offset) where
+        # value_offset points at the value itself whether inline or not.
+        count = self.unpack('H', offset)
+        entries = {}
+        for i in range(count):
+            entry = offset + 2 + i * 12
+            tag, field_type, value_count = self.unpack('HHI', entry)
+            size = TYPE_SIZES.get(field_type, 1) * value_count
+            value_offset = entry + 8 if size <= 4 else self.unpack('I', entry + 8)
+            entries[tag] = (field_type, value_count, value_offset)
+        next_offset = self.unpack('I', offset + 2 + count * 12)
+        return entries, next_offset
+
+    def value(self, entry):
+        field_type, count, offset = entry
+        if field_type == 2:
+            raw = self.data[offset:offset + count]
+            return raw.split(b'\x00', 1)[0].decode('utf-8', 'replace').strip()
+        if field_type in (5, 10):
+            code = 'I' if field_type == 5 else 'i'
+            values = []
+            for i in range(count):
+                numerator, denominator = self.unpack(code * 2, offset + i * 8)
+                values.append(numerator / denominator if denominator else 0.0)
+        else:
+            code = {1: 'B', 3: 'H', 4: 'I', 6: 'b', 7: 'B', 8: 'h', 9: 'i', 11: 'f', 12: 'd'}.get(field_type)
+            if code is None:
+                return None
+            values = [self.unpack(code, offset + i * struct.calcsize(code)) for i in range(count)]
+        return values[0] if count == 1 else values
+
+
+def embedded_thumbnail(tiff_data):
+    # The JPEG thumbnail lives in IFD1, chained after IFD0.
+    reader = TiffReader(tiff_data)
+    _, ifd1_offset = reader.read_ifd(reader.ifd0_offset)
+    if not ifd1_offset:
+        return None
+    ifd1, _ = reader.read_ifd(ifd1_offset)
+    if JPEG_INTERCHANGE_FORMAT not in ifd1 or JPEG_INTERCHANGE_FORMAT_LENGTH not in ifd1:
+        return None
+    start = reader.value(ifd1[JPEG_INTERCHANGE_FORMAT])
+    length = reader.value(ifd1[JPEG_INTERCHANGE_FORMAT_LENGTH])
+    thumbnail = tiff_data[start:start + length]
+    if len(thumbnail) != length or thumbnail[:2] != b'\xff\xd8':
+        return None
+    return thumbnail
+
+
+def read_tags(tiff_data, fields=SUMMARY_TAGS):
+    # Only the requested IFDs are walked and only the requested tags decoded;
+    # a tag whose value falls outside the data we read is simply left out.
+    reader = TiffReader(tiff_data)
+    ifd0, _ = reader.read_ifd(reader.ifd0_offset)
+    ifds = {IFD0: ifd0}
+    if any(ifd == EXIF_IFD for ifd, _ in fields.values()) and EXIF_IFD_POINTER in ifd0:
+        try:
+            ifds[EXIF_IFD], _ = reader.read_ifd(reader.value(ifd0[EXIF_IFD_POINTER]))
+        except ExifFormatError:
+            pass
+    tags = {}
+    for name, (ifd, tag) in fields.items():
+        entry = ifds.get(ifd, {}).get(tag)
+        if entry is None:
+            continue
+        try:
+            value = reader.value(entry)
+        except ExifFormatError:
+            continue
+        if value is not None and value != "":
+            tags[name] = value
+    return tags
+
+
+def read_summary(image_path, header=None):
+    with instrumentation.span("exif.parse", path=image_path):
+        return _read_summary(image_path, header)
+
+
+def _read_summary(image_path, header):
+    try:
+        tiff_data = header if header is not None else read_exif_segment(image_path, initial_bytes=SUMMARY_READ_SIZE)
+        return read_tags(tiff_data) if tiff_data else {}
+    except (OSError, ExifFormatError):
+        return {}
@@ -0,0 +1,214 @@
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PyQt5.QtCore import QObject, QSize, pyqtSignal
+from image_decode import decode_scaled, grayscale_array
+from thumbnail_cache import default_cache_dir
+import instrumentation
+
+# Sharpness is measured on a reduced decode (the JPEG plugin scales in the DCT
+# domain, so this is cheap) as the variance of the Laplacian, computed per
+# tile. The frame's score is the mean of its sharpest tiles: a sharp subject
+# against a blurred background still scores as sharp, while camera shake or a
+# missed focus leaves every tile soft.
+
+ANALYSIS_SIZE = 768
+TILE_SIZE = 64
+PEAK_TILES = 3
+SCORE_VERSION = 1
+CHUNK_SIZE = 8
+
+
+def load_gray(image_path, size=ANALYSIS_SIZE):
+    image = decode_scaled(image_path, QSize(size, size))
+    if image.isNull():
+        return None
+    return grayscale_array(image).astype(np.float32)
+
+
+def laplacian(gray):
+    return (gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+            - 4 * gray[1:-1, 1:-1])
+
+
+def focus_measures(gray, tile=TILE_SIZE, peak_tiles=PEAK_TILES):
+    # Returns (score, overall): the mean Laplacian variance of the sharpest
+    # tiles, and the variance over the whole frame.
+    response = laplacian(gray)
+    overall = float(response.var())
+    rows, cols = response.shape[0] // tile, response.shape[1] // tile
+    if rows == 0 or cols == 0:
+        return overall, overall
+    tiles = response[:rows * tile, :cols * tile].reshape(rows, tile, cols, tile)
+    tile_variance = tiles.var(axis=(1, 3)).ravel()
+    peak = np.partition(tile_variance, -min(peak_tiles, tile_variance.size))[-peak_tiles:]
+    return float(peak.mean()), overall
+
+
+def score_image(image_path):
+    gray = load_gray(image_path)
+    if gray is None:
+        return None
+    return focus_measures(gray)[0]
+
+
+def score_files(paths):
+    # Runs in the worker processes; a chunk of files per call keeps the
+    # pickling overhead down.
+    results = []
+    for path in paths:
+        try:
+            results.append((path, score_image(path)))
+        except Exception as e:
+            print(f"Error scoring {path}: {e}")
+            results.append((path, None))
+    return results
+
+
+class FocusScoreCache:
+    # Scores keyed by path and validated by size and mtime like the thumbnail
+    # cache. Changing the metric bumps SCORE_VERSION, which invalidates old rows.
+    def __init__(self, db_path=None):
+        if db_path is None:
+            cache_dir = default_cache_dir()
+            os.makedirs(cache_dir, exist_ok=True)
+            db_path = os.path.join(cache_dir, "focus.db")
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS focus_scores ("
+            " path TEXT PRIMARY KEY,"
+            " file_size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " version INTEGER NOT NULL,"
+            " score REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get_many(self, entries):
+        # entries is a list of (path, file_size, mtime_ns)
+        hits = {}
+        with self.lock:
+            cursor = self.conn.cursor()
+            for path, file_size, mtime_ns in entries:
+                row = cursor.execute(
+                    "SELECT file_size, mtime_ns, version, score FROM focus_scores WHERE path = ?", (path,)
+                ).fetchone()
+                if row and row[:3] == (file_size, mtime_ns, SCORE_VERSION):
+                    hits[path] = row[3]
+        return hits
+
+    def put_many(self, rows):
+        # rows is a list of (path, file_size, mtime_ns, score)
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO focus_scores (path, file_size, mtime_ns, version, score)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(path, file_size, mtime_ns, SCORE_VERSION, score) for path, file_size, mtime_ns, score in rows]
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def default_workers():
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+class FocusScorer(QObject):
+    # Scores a folder in a process pool (the metric is CPU-bound NumPy and
+    # decode work, so threads would fight over the GIL). Cached scores are
+    # emitted straight away; the rest arrive in chunks through scores_ready.
+    scores_ready = pyqtSignal(object)
+    progress = pyqtSignal(int, int)
+    scoring_finished = pyqtSignal()
+    # generation, scores, files scored; queued from the executor's thread
+    chunk_scored = pyqtSignal(int, object, int)
+
+    def __init__(self, cache=None, max_workers=None, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.max_workers = max_workers or default_workers()
+        self.executor = None
+        self.futures = []
+        self.generation = 0
+        self.total = 0
+        self.done = 0
+        self.chunk_scored.connect(self.on_chunk_scored)
+
+    def score(self, entries):
+        # entries is a list of (path, file_size, mtime_ns)
+        self.cancel()
+        self.total = 0
+        self.done = 0
+        self.add(entries)
+
+    def add(self, entries):
+        # Scores more files without abandoning the ones already queued.
+        generation = self.generation
+        cached = self.cache.get_many(entries) if self.cache is not None else {}
+        instrumentation.cache_lookup("focus_cache", len(cached), len(entries) - len(cached))
+        self.total += len(entries)
+        self.done += len(cached)
+        if cached:
+            self.scores_ready.emit(cached)
+        stats = {path: (file_size, mtime_ns) for path, file_size, mtime_ns in entries}
+        missing = [path for path, _, _ in entries if path not in cached]
+        if not missing:
+            self.progress.emit(self.done, self.total)
+            if self.done >= self.total:
+                self.scoring_finished.emit()
+            return
+        if self.executor is None:
+            # spawn, not fork: forking a process that is running Qt threads is unsafe
+            self.executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        for start in range(0, len(missing), CHUNK_SIZE):
+            chunk = missing[start:start + CHUNK_SIZE]
+            future = self.executor.submit(score_files, chunk)
+            future.add_done_callback(lambda f, chunk=chunk: self.on_chunk_done(f, chunk, generation, stats))
+            self.futures.append(future)
+        instrumentation.gauge("focus.pending", len(self.futures))
+
+    def on_chunk_done(self, future, chunk, generation, stats):
+        # Called on the executor's management thread; the counters belong to
+        # the GUI thread, so only the cache write happens here.
+        if future.cancelled():
+            return
+        try:
+            results = future.result()
+        except Exception as e:
+            print(f"Error scoring focus: {e}")
+            results = [(path, None) for path in chunk]
+        scores = {path: score for path, score in results if score is not None}
+        if self.cache is not None and scores:
+            self.cache.put_many([(path, *stats[path], score) for path, score in scores.items()])
+        self.chunk_scored.emit(generation, scores, len(results))
+
+    def on_chunk_scored(self, generation, scores, count):
+        if generation != self.generation:
+            return
+        self.done += count
+        self.scores_ready.emit(scores)
+        self.progress.emit(self.done, self.total)
+        if self.done >= self.total:
+            self.scoring_finished.emit()
+
+    def cancel(self):
+        self.generation += 1
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+
+    def shutdown(self):
+        self.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,182 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+from pairing import JPEG_EXTENSIONS, iter_directory
+
+# Watches the open folder for files added, removed or renamed by another
+# program (tethering software, a card reader import). Directory change
+# notifications are debounced into one rescan, the listing is read on a worker
+# thread and diffed against the previous one on the GUI thread, and new files are only reported once they have stopped
+# growing, so a half-written JPEG is never decoded.
+
+DEBOUNCE_MS = 300
+STABLE_POLL_MS = 750
+
+
+def jpeg_complete(path):
+    # A JPEG that is still being written has no end-of-image marker yet. Some
+    # cameras pad after it, so look in the last few bytes rather than at the end.
+    try:
+        with open(path, 'rb') as image_file:
+            image_file.seek(0, os.SEEK_END)
+            size = image_file.tell()
+            image_file.seek(max(size - 1024, 0))
+            return b'\xff\xd9' in image_file.read()
+    except OSError:
+        return False
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def list_directory(directory, recursive, known):
+    # Runs on the watcher's worker thread. Returns the visible files, the
+    # directories to watch and the signatures of files not seen before.
+    # Hidden files are skipped too: tethering tools often write to a dot
+    # file and rename it into place when it is complete.
+    listing = {entry.path for entry in iter_directory(directory, recursive)
+               if not entry.name.startswith('.')}
+    directories = [directory]
+    if recursive:
+        for root, subdirs, _ in os.walk(directory):
+            subdirs[:] = [name for name in subdirs if not name.startswith('.')]
+            directories.extend(os.path.join(root, name) for name in subdirs)
+    signatures = {path: file_signature(path) for path in listing - known}
+    return listing, directories, signatures
+
+
+class FolderWatcher(QObject):
+    # files_changed(added, removed): lists of paths. Renames arrive as one of each.
+    files_changed = pyqtSignal(object, object)
+    # generation, listing, directories, signatures; queued from the worker
+    listing_ready = pyqtSignal(int, object, object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule_rescan)
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.setSingleShot(True)
+        self.rescan_timer.setInterval(DEBOUNCE_MS)
+        self.rescan_timer.timeout.connect(self.rescan)
+        self.stable_timer = QTimer(self)
+        self.stable_timer.setInterval(STABLE_POLL_MS)
+        self.stable_timer.timeout.connect(self.check_pending)
+        self.listing_ready.connect(self.on_listing_ready)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.generation = 0
+        self.scanning = False
+        self.rescan_again = False
+        self.directory = None
+        self.recursive = False
+        self.known = set()
+        self.pending = {}
+
+    def start(self, directory, recursive=False, known=()):
+        # known is what the caller has already loaded; anything else found on
+        # the first rescan (files that landed while the folder was loading) is
+        # reported as added.
+        self.stop()
+        self.directory = directory
+        self.recursive = recursive
+        self.known = set(known)
+        self.watcher.addPath(directory)
+        self.rescan()
+
+    def stop(self):
+        self.rescan_timer.stop()
+        self.stable_timer.stop()
+        directories = self.watcher.directories()
+        if directories:
+            self.watcher.removePaths(directories)
+        # A listing still running on the worker is for the old folder
+        self.generation += 1
+        self.scanning = False
+        self.rescan_again = False
+        self.directory = None
+        self.known = set()
+        self.pending = {}
+
+    def shutdown(self):
+        self.stop()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def is_active(self):
+        return self.directory is not None
+
+    def watch_directories(self, directories):
+        watched = set(self.watcher.directories())
+        new = [directory for directory in directories if directory not in watched]
+        if new:
+            self.watcher.addPaths(new)
+
+    def schedule_rescan(self, *args):
+        self.rescan_timer.start()
+
+    def rescan(self):
+        if self.directory is None:
+            return
+        if self.scanning:
+            # Changes during a listing may have been missed; list again after it
+            self.rescan_again = True
+            return
+        self.scanning = True
+        self.executor.submit(self.scan, self.directory, self.recursive, set(self.known), self.generation)
+
+    def scan(self, directory, recursive, known, generation):
+        try:
+            listing, directories, signatures = list_directory(directory, recursive, known)
+        except Exception as e:
+            print(f"Error listing {directory}: {e}")
+            listing, directories, signatures = None, [], {}
+        self.listing_ready.emit(generation, listing, directories, signatures)
+
+    def on_listing_ready(self, generation, listing, directories, signatures):
+        if generation != self.generation:
+            return
+        self.scanning = False
+        if listing is not None:
+            self.apply_listing(listing, directories, signatures)
+        if self.rescan_again:
+            self.rescan_again = False
+            self.rescan()
+
+    def apply_listing(self, listing, directories, signatures):
+        self.watch_directories(directories)
+        removed = sorted(self.known - listing)
+        self.known -= set(removed)
+        for path in list(self.pending):
+            if path not in listing:
+                del self.pending[path]
+        for path in listing - self.known:
+            if path not in self.pending:
+                self.pending[path] = signatures.get(path)
+        if removed:
+            self.files_changed.emit([], removed)
+        if self.pending and not self.stable_timer.isActive():
+            self.stable_timer.start()
+
+    def check_pending(self):
+        # A file counts as complete once its size and mtime are unchanged
+        # between two polls (and, for JPEGs, the end marker is there).
+        ready = []
+        for path, signature in list(self.pending.items()):
+            current = file_signature(path)
+            if current is None:
+                del self.pending[path]
+            elif current == signature and current[0] > 0 and (
+                    os.path.splitext(path)[1].lower() not in JPEG_EXTENSIONS or jpeg_complete(path)):
+                del self.pending[path]
+                ready.append(path)
+            else:
+                self.pending[path] = current
+        if not self.pending:
+            self.stable_timer.stop()
+        if ready:
+            self.known.update(ready)
+            self.files_changed.emit(sorted(ready), [])
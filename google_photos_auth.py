@@ -1,28 +1,95 @@
 import os
 import json
+import threading
+from datetime import datetime, timedelta
 import google.auth
 import google_auth_oauthlib.flow
 import google.auth.transport.requests
-from google.auth.transport.requests import Request
+from google.auth.exceptions import GoogleAuthError
+from google.auth.transport.requests import AuthorizedSession, Request
 from google.oauth2.credentials import Credentials
+from requests.adapters import HTTPAdapter
 
 # Set the path to the credentials file you downloaded from the Google Cloud Console
 CLIENT_SECRETS_FILE = os.path.join(os.path.dirname(__file__), "oauth.json")
 SCOPES = ["https://www.googleapis.com/auth/photoslibrary.appendonly"]
+TOKEN_PATH = "token.json"
 
-def get_credentials():
+# Refresh this long before the access token actually expires so an upload
+# never stalls on a 401 and a mid-flight refresh.
+REFRESH_MARGIN = timedelta(minutes=5)
+POOL_SIZE = 8
+
+_lock = threading.Lock()
+_credentials = None
+_session = None
+
+
+class SignInRequired(GoogleAuthError):
+    pass
+
+
+def load_credentials(interactive=True):
+    # interactive=False (batch mode) raises SignInRequired instead of opening
+    # a browser when there is no usable token.
     creds = None
-    token_path = "token.json"
 
-    if os.path.exists(token_path):
-        creds = Credentials.from_authorized_user_file(token_path, SCOPES)
+    if os.path.exists(TOKEN_PATH):
+        creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             creds.refresh(Request())
+        elif not interactive:
+            raise SignInRequired(f"No usable OAuth token in {os.path.abspath(TOKEN_PATH)}; sign in from the app first")
         else:
             flow = google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file(CLIENT_SECRETS_FILE, SCOPES)
             creds = flow.run_local_server(port=0)
-        with open(token_path, 'w') as token:
-            token.write(creds.to_json())
+        save_credentials(creds)
 
     return creds
+
+
+def save_credentials(creds):
+    with open(TOKEN_PATH, 'w') as token:
+        token.write(creds.to_json())
+
+
+def needs_refresh(creds):
+    if not creds.valid:
+        return True
+    return creds.expiry is not None and creds.expiry - datetime.utcnow() < REFRESH_MARGIN
+
+
+def get_credentials(interactive=True):
+    # token.json is only read once per process; after that the in-memory
+    # credentials are reused and refreshed ahead of expiry.
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            _credentials = load_credentials(interactive)
+        elif needs_refresh(_credentials) and _credentials.refresh_token:
+            _credentials.refresh(Request())
+            save_credentials(_credentials)
+        return _credentials
+
+
+class PhotosSession(AuthorizedSession):
+    # Checks the shared credentials before every request, so a long upload
+    # batch rolls over to a fresh token without a failed round trip.
+    def request(self, method, url, *args, **kwargs):
+        get_credentials()
+        return super().request(method, url, *args, **kwargs)
+
+
+def get_session(pool_size=POOL_SIZE, interactive=True):
+    # One keep-alive connection pool for every upload worker, so each file
+    # reuses an open TLS connection instead of handshaking again.
+    global _session
+    creds = get_credentials(interactive)
+    with _lock:
+        if _session is None:
+            _session = PhotosSession(creds)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
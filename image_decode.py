@@ -0,0 +1,84 @@
+import numpy as np
+from PyQt5.QtCore import Qt, QBuffer, QByteArray, QIODevice, QRect, QSize
+from PyQt5.QtGui import QImage, QImageReader
+from exif_reader import ExifFormatError, embedded_thumbnail, read_exif_segment
+
+# Everything here works on QImage so it is safe to call from worker threads;
+# convert to QPixmap on the GUI thread only.
+
+
+def decode_thumbnail(image_path, size, header=None):
+    # Cheapest source first: the camera's embedded Exif thumbnail, then a
+    # decoder-side scaled decode, and a full decode only if both fail.
+    reader = QImageReader(image_path)
+    original_size = reader.size()
+    image = decode_embedded_thumbnail(image_path, size, original_size, header)
+    if image is None:
+        image = decode_scaled(image_path, QSize(size, size), reader)
+    if image.isNull():
+        return image
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return image
+
+
+def decode_embedded_thumbnail(image_path, size, original_size=None, header=None):
+    try:
+        tiff_data = header if header is not None else read_exif_segment(image_path)
+        data = embedded_thumbnail(tiff_data) if tiff_data else None
+    except (OSError, ExifFormatError):
+        return None
+    if not data:
+        return None
+    image = QImage()
+    if not image.loadFromData(data, "JPG"):
+        return None
+    if max(image.width(), image.height()) < size:
+        return None
+    if original_size is not None and original_size.isValid():
+        image = crop_to_aspect(image, original_size)
+    return image
+
+
+def crop_to_aspect(image, original_size):
+    # Many bodies store a 4:3 thumbnail with black bars for a 3:2 frame; crop
+    # back to the real frame's aspect so the carousel doesn't show letterboxing.
+    target = original_size.scaled(image.size(), Qt.KeepAspectRatio)
+    if abs(target.width() - image.width()) <= 1 and abs(target.height() - image.height()) <= 1:
+        return image
+    x = (image.width() - target.width()) // 2
+    y = (image.height() - target.height()) // 2
+    return image.copy(QRect(x, y, target.width(), target.height()))
+
+
+def decode_scaled(image_path, bound, reader=None):
+    # Setting a scaled size lets the JPEG plugin downscale in the DCT domain, so
+    # the full-resolution buffer is never allocated.
+    if reader is None:
+        reader = QImageReader(image_path)
+    original_size = reader.size()
+    if original_size.isValid() and (original_size.width() > bound.width() or original_size.height() > bound.height()):
+        reader.setScaledSize(original_size.scaled(bound, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        image = QImage(image_path)
+    return image
+
+
+def encode_image(image, fmt="JPG", quality=85):
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, fmt, quality)
+    buffer.close()
+    return bytes(data)
+
+
+def grayscale_array(image):
+    # Copies the image out as a 2D uint8 array (rows are padded to 4 bytes in
+    # the QImage, so the padding is sliced off).
+    image = image.convertToFormat(QImage.Format_Grayscale8)
+    bits = image.constBits()
+    bits.setsize(image.bytesPerLine() * image.height())
+    rows = np.frombuffer(bits, np.uint8).reshape(image.height(), image.bytesPerLine())
+    return rows[:, :image.width()].copy()
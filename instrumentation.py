@@ -0,0 +1,214 @@
+import atexit
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+# Opt-in tracing for the hot paths. Enable it with SHUTTERSWEEP_TRACE=1 (or a
+# file name) or the --trace / --trace=FILE command line flag. While enabled,
+# spans, counters and queue depths are recorded in memory; at exit they are
+# written as Chrome trace-event JSON (open it in chrome://tracing or Perfetto)
+# and a summary table is printed. Disabled, span() hands back a shared no-op
+# object and the other calls return after a single flag check.
+
+TRACE_ENV = "SHUTTERSWEEP_TRACE"
+DEFAULT_TRACE_FILE = "shuttersweep-trace.json"
+
+_enabled = False
+_trace_path = None
+_lock = threading.Lock()
+_origin = time.perf_counter()
+_events = []
+_counters = defaultdict(int)
+_gauges = {}
+_thread_names = {}
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ('name', 'args', 'start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        _record('X', self.name, self.start, end - self.start, self.args)
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+def enabled():
+    return _enabled
+
+
+def enable(path=None):
+    global _enabled, _trace_path
+    if _enabled:
+        return
+    _enabled = True
+    _trace_path = path or DEFAULT_TRACE_FILE
+    atexit.register(finish)
+
+
+def enable_from_env():
+    # Spawned worker processes inherit the variable but have nothing useful to
+    # add; only the main process records and writes the trace. (A spawned
+    # child is renamed before it re-imports __main__, but parent_process() is
+    # only set after.)
+    if multiprocessing.current_process().name != "MainProcess":
+        return
+    value = os.environ.get(TRACE_ENV, "")
+    if value and value.lower() not in ("0", "false", "no"):
+        enable(None if value.lower() in ("1", "true", "yes") else value)
+
+
+def enable_from_args(argv):
+    # Strips --trace / --trace=FILE from argv (before Qt sees it) and returns
+    # the remaining arguments.
+    remaining = []
+    for arg in argv:
+        if arg == "--trace":
+            enable()
+        elif arg.startswith("--trace="):
+            enable(arg.split("=", 1)[1] or None)
+        else:
+            remaining.append(arg)
+    return remaining
+
+
+def _record(phase, name, start, duration, args):
+    thread = threading.current_thread()
+    if thread.ident not in _thread_names:
+        _thread_names[thread.ident] = thread.name
+    _events.append((phase, name, start, duration, thread.ident, args))
+
+
+def span(name, **args):
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name, args)
+
+
+def count(name, value=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] += value
+
+
+def cache_lookup(cache_name, hits, misses=0):
+    # Counted as "<cache>.hit" / "<cache>.miss"; the summary turns the pair
+    # into a hit rate.
+    if not _enabled:
+        return
+    with _lock:
+        _counters[cache_name + ".hit"] += hits
+        _counters[cache_name + ".miss"] += misses
+
+
+def gauge(name, value):
+    # Queue depths and the like: exported as a Chrome counter track, with the
+    # peak kept for the summary.
+    if not _enabled:
+        return
+    with _lock:
+        last, peak = _gauges.get(name, (0, value))
+        _gauges[name] = (value, max(peak, value))
+    _record('C', name, time.perf_counter(), 0, {"value": value})
+
+
+def trace_events():
+    events = []
+    pid = os.getpid()
+    for tid, name in list(_thread_names.items()):
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+    for phase, name, start, duration, tid, args in list(_events):
+        event = {"name": name, "ph": phase, "ts": round((start - _origin) * 1e6, 1), "pid": pid, "tid": tid}
+        if phase == 'X':
+            event["dur"] = round(duration * 1e6, 1)
+        if args:
+            event["args"] = args
+        events.append(event)
+    return events
+
+
+def write_trace(path):
+    with open(path, 'w') as trace_file:
+        json.dump({"traceEvents": trace_events(), "displayTimeUnit": "ms"}, trace_file)
+
+
+def summary():
+    durations = defaultdict(list)
+    for phase, name, _, duration, _, _ in list(_events):
+        if phase == 'X':
+            durations[name].append(duration * 1000)
+    lines = [f"{'span':<24} {'count':>7} {'total ms':>10} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+    for name in sorted(durations):
+        values = sorted(durations[name])
+        p95 = values[min(len(values) - 1, int(round(0.95 * (len(values) - 1))))]
+        lines.append(f"{name:<24} {len(values):>7} {sum(values):>10.1f} {sum(values) / len(values):>9.2f} "
+                     f"{p95:>9.2f} {values[-1]:>9.2f}")
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+    caches = sorted({name.rsplit('.', 1)[0] for name in counters if name.endswith(('.hit', '.miss'))})
+    if caches:
+        lines.append("")
+        lines.append(f"{'cache':<24} {'hits':>7} {'misses':>10} {'hit rate':>9}")
+        for cache in caches:
+            hits, misses = counters.pop(cache + ".hit", 0), counters.pop(cache + ".miss", 0)
+            rate = f"{hits / (hits + misses) * 100:.1f}%" if hits + misses else "n/a"
+            lines.append(f"{cache:<24} {hits:>7} {misses:>10} {rate:>9}")
+    if gauges:
+        lines.append("")
+        lines.append(f"{'queue':<24} {'peak':>7} {'last':>10}")
+        for name in sorted(gauges):
+            last, peak = gauges[name]
+            lines.append(f"{name:<24} {peak:>7} {last:>10}")
+    if counters:
+        lines.append("")
+        lines.append(f"{'counter':<24} {'value':>7}")
+        for name in sorted(counters):
+            lines.append(f"{name:<24} {counters[name]:>7}")
+    return "\n".join(lines)
+
+
+def finish():
+    if not _enabled:
+        return
+    try:
+        write_trace(_trace_path)
+        print(f"Trace written to {os.path.abspath(_trace_path)}", file=sys.stderr)
+    except OSError as e:
+        print(f"Error writing trace: {e}", file=sys.stderr)
+    print(summary(), file=sys.stderr)
+
+
+enable_from_env()
@@ -0,0 +1,285 @@
+import os
+import re
+import shlex
+from datetime import datetime
+import numpy as np
+from bursts import capture_timestamp
+
+# Exif summary of every loaded frame in one array per field, filled once
+# during the scan. Sorting is a single lexsort over a column and filtering a
+# few vectorised comparisons, so neither touches the files again and both stay
+# in the milliseconds for tens of thousands of frames. Text fields (camera,
+# lens) are stored as codes into a per-column list of distinct values.
+
+NUMERIC_COLUMNS = ("capture_time", "exposure_time", "f_number", "iso", "focus")
+TEXT_COLUMNS = ("make", "model", "lens_make", "lens_model")
+
+# Filter field names as typed -> column
+FILTER_FIELDS = {
+    "iso": "iso",
+    "shutter": "exposure_time",
+    "exposure": "exposure_time",
+    "aperture": "f_number",
+    "f": "f_number",
+    "focus": "focus",
+    "date": "capture_time",
+    "camera": "model",
+    "body": "model",
+    "make": "make",
+    "lens": "lens_model",
+}
+OPERATORS = (">=", "<=", "!=", "=", ":", ">", "<")
+CONDITION = re.compile(r"^(\w+)(>=|<=|!=|=|:|>|<)(.+)$")
+
+
+class FilterError(ValueError):
+    pass
+
+
+def as_number(value):
+    if isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def parse_number(text, column):
+    text = text.strip().lower()
+    if column == "f_number" and text.startswith("f/"):
+        text = text[2:]
+    if column == "exposure_time" and text.endswith("s"):
+        text = text[:-1]
+    try:
+        if "/" in text:
+            numerator, denominator = text.split("/", 1)
+            return float(numerator) / float(denominator)
+        return float(text)
+    except (ValueError, ZeroDivisionError):
+        raise FilterError(f"Not a number: {text}")
+
+
+def parse_date_range(text):
+    # A date (or date and time) stands for the whole day (or minute or second)
+    for fmt, step in (("%Y-%m-%d", 86400), ("%Y-%m-%dT%H:%M", 60), ("%Y-%m-%dT%H:%M:%S", 1)):
+        try:
+            start = datetime.strptime(text.strip(), fmt).timestamp()
+        except ValueError:
+            continue
+        return start, start + step
+    raise FilterError(f"Not a date (use YYYY-MM-DD or YYYY-MM-DDTHH:MM): {text}")
+
+
+def parse_filter(text):
+    # "iso>6400 shutter>1/60 camera=\"EOS R5\"" -> [(column, operator, value)]
+    # Conditions are ANDed. Text fields match case-insensitive substrings.
+    pattern = "|".join(re.escape(operator) for operator in OPERATORS)
+    text = re.sub(rf"\s*({pattern})\s*", r"\1", text.replace(",", " "))
+    try:
+        tokens = shlex.split(text)
+    except ValueError as e:
+        raise FilterError(str(e))
+    conditions = []
+    for token in tokens:
+        match = CONDITION.match(token)
+        if not match:
+            raise FilterError(f"Expected field, operator and value: {token}")
+        field, operator, value = match.groups()
+        column = FILTER_FIELDS.get(field.lower())
+        if column is None:
+            raise FilterError(f"Unknown field: {field} (try {', '.join(sorted(FILTER_FIELDS))})")
+        if column in TEXT_COLUMNS:
+            if operator not in ("=", ":", "!="):
+                raise FilterError(f"{field} only supports =, : and !=")
+            conditions.append((column, operator, value.lower()))
+        elif column == "capture_time":
+            conditions.append((column, operator, parse_date_range(value)))
+        else:
+            conditions.append((column, operator, parse_number(value, column)))
+    return conditions
+
+
+def name_key(path):
+    # Same order as sorting by (folder, lower-case file name); \x01 sorts
+    # before any character that can appear in a path.
+    return os.path.dirname(path) + "\x01" + os.path.basename(path).lower()
+
+
+class MetadataTable:
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.clear()
+
+    def __contains__(self, path):
+        return path in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def clear(self):
+        capacity = self.capacity
+        self.paths = []
+        self.name_keys = []
+        self.rows = {}
+        self.free = []
+        self.numeric = {name: np.full(capacity, np.nan) for name in NUMERIC_COLUMNS}
+        self.text = {name: np.full(capacity, -1, dtype=np.int32) for name in TEXT_COLUMNS}
+        self.categories = {name: [] for name in TEXT_COLUMNS}
+        self.codes = {name: {} for name in TEXT_COLUMNS}
+        self.name_rank = None
+
+    def grow(self):
+        size = len(self.numeric["iso"])
+        for name, column in self.numeric.items():
+            self.numeric[name] = np.concatenate((column, np.full(size, np.nan)))
+        for name, column in self.text.items():
+            self.text[name] = np.concatenate((column, np.full(size, -1, dtype=np.int32)))
+
+    def code(self, column, value):
+        if isinstance(value, (list, tuple)):
+            value = value[0] if value else None
+        value = str(value).strip() if value is not None else ""
+        if not value:
+            return -1
+        codes = self.codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.categories[column])
+            self.categories[column].append(value)
+        return code
+
+    def add(self, path, tags):
+        # tags is the read_summary() dict; a path already present is updated.
+        tags = tags or {}
+        row = self.rows.get(path)
+        if row is None:
+            if self.free:
+                row = self.free.pop()
+                self.paths[row] = path
+                self.name_keys[row] = name_key(path)
+            else:
+                row = len(self.paths)
+                if row >= len(self.numeric["iso"]):
+                    self.grow()
+                self.paths.append(path)
+                self.name_keys.append(name_key(path))
+            self.rows[path] = row
+            self.name_rank = None
+        timestamp = capture_timestamp(tags)
+        self.numeric["capture_time"][row] = np.nan if timestamp is None else timestamp
+        self.numeric["exposure_time"][row] = as_number(tags.get("exposure_time"))
+        self.numeric["f_number"][row] = as_number(tags.get("f_number"))
+        self.numeric["iso"][row] = as_number(tags.get("photographic_sensitivity"))
+        for column in TEXT_COLUMNS:
+            self.text[column][row] = self.code(column, tags.get(column))
+
+    def remove(self, path):
+        row = self.rows.pop(path, None)
+        if row is None:
+            return
+        self.paths[row] = None
+        self.name_keys[row] = ""
+        for column in self.numeric.values():
+            column[row] = np.nan
+        for column in self.text.values():
+            column[row] = -1
+        self.free.append(row)
+
+    def set_focus(self, scores):
+        for path, score in scores.items():
+            row = self.rows.get(path)
+            if row is not None:
+                self.numeric["focus"][row] = np.nan if score is None else score
+
+    def value(self, path, column):
+        row = self.rows.get(path)
+        if row is None:
+            return np.nan
+        return float(self.numeric[column][row])
+
+    def tags(self, path):
+        # The summary tags back in read_summary() form, for the side panel
+        row = self.rows.get(path)
+        if row is None:
+            return None
+        tags = {}
+        for column in TEXT_COLUMNS:
+            code = self.text[column][row]
+            if code >= 0:
+                tags[column] = self.categories[column][code]
+        for column, tag in (("exposure_time", "exposure_time"), ("f_number", "f_number"),
+                            ("iso", "photographic_sensitivity")):
+            value = self.numeric[column][row]
+            if not np.isnan(value):
+                tags[tag] = int(value) if column == "iso" else float(value)
+        timestamp = self.numeric["capture_time"][row]
+        if not np.isnan(timestamp):
+            tags["datetime_original"] = datetime.fromtimestamp(timestamp).strftime("%Y:%m:%d %H:%M:%S")
+        return tags
+
+    def rows_of(self, paths):
+        try:
+            return np.fromiter(map(self.rows.__getitem__, paths), dtype=np.int64, count=len(paths))
+        except KeyError:
+            # Frames without a summary yet sort and filter as if no tags were set
+            for path in paths:
+                if path not in self.rows:
+                    self.add(path, {})
+            return self.rows_of(paths)
+
+    def ranks(self):
+        # Position of every row in name order, recomputed only after new rows
+        if self.name_rank is None:
+            order = sorted(range(len(self.name_keys)), key=self.name_keys.__getitem__)
+            self.name_rank = np.empty(len(order), dtype=np.int64)
+            self.name_rank[order] = np.arange(len(order))
+        return self.name_rank
+
+    def order(self, paths, column=None):
+        # paths sorted by column (missing values last), then by name
+        paths = list(paths)
+        rows = self.rows_of(paths)
+        names = self.ranks()[rows]
+        if column is None or column == "name":
+            order = np.argsort(names, kind="stable")
+        else:
+            values = self.numeric[column][rows]
+            order = np.lexsort((names, np.where(np.isnan(values), np.inf, values)))
+        return np.array(paths, dtype=object)[order].tolist()
+
+    def matches(self, paths, conditions):
+        # Boolean mask over paths; a frame missing a field never matches a
+        # condition on it (except !=).
+        rows = self.rows_of(paths)
+        mask = np.ones(len(rows), dtype=bool)
+        for column, operator, value in conditions:
+            if column in TEXT_COLUMNS:
+                wanted = [code for code, name in enumerate(self.categories[column]) if value in name.lower()]
+                hit = np.isin(self.text[column][rows], wanted)
+                mask &= ~hit if operator == "!=" else hit
+                continue
+            values = self.numeric[column][rows]
+            with np.errstate(invalid="ignore"):
+                if column == "capture_time":
+                    start, end = value
+                    hit = {
+                        ">": values >= end, ">=": values >= start,
+                        "<": values < start, "<=": values < end,
+                    }.get(operator, (values >= start) & (values < end))
+                    if operator == "!=":
+                        hit = ~hit
+                else:
+                    hit = {
+                        ">": values > value, ">=": values >= value,
+                        "<": values < value, "<=": values <= value,
+                        "!=": values != value,
+                    }.get(operator, values == value)
+            mask &= hit
+        return mask
+
+    def filter(self, paths, conditions):
+        paths = list(paths)
+        if not conditions:
+            return paths
+        return [path for path, keep in zip(paths, self.matches(paths, conditions)) if keep]
@@ -0,0 +1,194 @@
+import os
+
+JPEG_EXTENSIONS = frozenset({'.jpg', '.jpeg'})
+RAW_EXTENSIONS = frozenset({
+    '.3fr', '.arw', '.cr2', '.cr3', '.crw', '.dng', '.erf', '.iiq', '.kdc', '.mos', '.mrw',
+    '.nef', '.nrw', '.orf', '.pef', '.raf', '.rw2', '.rwl', '.sr2', '.srf', '.srw', '.x3f',
+})
+METADATA_EXTENSIONS = frozenset({'.xmp'})
+
+
+def raw_extensions_from_env(default=RAW_EXTENSIONS):
+    # SHUTTERSWEEP_RAW_EXTENSIONS=".raf,.nef" replaces the built-in RAW list.
+    value = os.environ.get("SHUTTERSWEEP_RAW_EXTENSIONS")
+    if not value:
+        return default
+    return frozenset('.' + ext.strip().lstrip('.').lower() for ext in value.split(',') if ext.strip())
+
+
+class PairGroup:
+    __slots__ = ('jpegs', 'raws', 'metadata')
+
+    def __init__(self):
+        # Usually one JPEG, but IMG_1.JPG and IMG_1.jpg (or .jpg and .jpeg)
+        # can sit side by side and share the RAW
+        self.jpegs = []
+        self.raws = []
+        self.metadata = []
+
+    @property
+    def sidecars(self):
+        return self.raws + self.metadata
+
+    @property
+    def files(self):
+        return self.jpegs + self.sidecars
+
+
+class PairingIndex:
+    # Groups files sharing a basename (case-insensitive, per directory): the
+    # JPEG shown in the carousel plus its RAWs and XMP sidecars. Built from a
+    # directory listing, so looking up pairs never touches the filesystem.
+    def __init__(self, raw_extensions=None, metadata_extensions=METADATA_EXTENSIONS, jpeg_extensions=JPEG_EXTENSIONS):
+        self.raw_extensions = raw_extensions_from_env() if raw_extensions is None else frozenset(raw_extensions)
+        self.metadata_extensions = frozenset(metadata_extensions)
+        self.jpeg_extensions = frozenset(jpeg_extensions)
+        self.accepted_extensions = self.raw_extensions | self.metadata_extensions | self.jpeg_extensions
+        self.groups = {}
+        self.stats = {}
+
+    def key(self, path):
+        directory, name = os.path.split(path)
+        stem, ext = os.path.splitext(name)
+        ext = ext.lower()
+        if ext in self.metadata_extensions:
+            # darktable and friends write IMG_0001.CR2.xmp next to IMG_0001.CR2
+            inner_stem, inner_ext = os.path.splitext(stem)
+            if inner_ext.lower() in self.raw_extensions or inner_ext.lower() in self.jpeg_extensions:
+                stem = inner_stem
+        return (directory, stem.lower()), ext
+
+    def add(self, path, stat=None):
+        key, ext = self.key(path)
+        if ext in self.jpeg_extensions:
+            group = self.groups.setdefault(key, PairGroup())
+            if path not in group.jpegs:
+                group.jpegs.append(path)
+            if stat is not None:
+                self.stats[path] = (stat.st_size, stat.st_mtime_ns)
+        elif ext in self.raw_extensions:
+            group = self.groups.setdefault(key, PairGroup())
+            if path not in group.raws:
+                group.raws.append(path)
+        elif ext in self.metadata_extensions:
+            group = self.groups.setdefault(key, PairGroup())
+            if path not in group.metadata:
+                group.metadata.append(path)
+        else:
+            return False
+        return True
+
+    def add_entry(self, entry):
+        # Only JPEGs need their stat (for the thumbnail cache key).
+        ext = os.path.splitext(entry.name)[1].lower()
+        return self.add(entry.path, entry.stat() if ext in self.jpeg_extensions else None)
+
+    def accepts(self, path):
+        return self.key(path)[1] in self.accepted_extensions
+
+    def contains(self, path):
+        group = self.group(path)
+        return group is not None and path in group.files
+
+    def is_jpeg(self, path):
+        return os.path.splitext(path)[1].lower() in self.jpeg_extensions
+
+    def remove(self, path):
+        key, _ = self.key(path)
+        group = self.groups.get(key)
+        if group is None:
+            return
+        if path in group.jpegs:
+            group.jpegs.remove(path)
+            self.stats.pop(path, None)
+        if path in group.raws:
+            group.raws.remove(path)
+        if path in group.metadata:
+            group.metadata.remove(path)
+        if not group.files:
+            del self.groups[key]
+
+    def group(self, jpeg_path):
+        return self.groups.get(self.key(jpeg_path)[0])
+
+    def raws(self, jpeg_path):
+        group = self.group(jpeg_path)
+        return list(group.raws) if group else []
+
+    def sidecars(self, jpeg_path):
+        group = self.group(jpeg_path)
+        return group.sidecars if group else []
+
+    def files(self, jpeg_path):
+        # The JPEG itself plus the group's RAWs and sidecars, never another
+        # JPEG sharing the stem
+        group = self.group(jpeg_path)
+        return [jpeg_path] + group.sidecars if group else [jpeg_path]
+
+    def merge(self, other):
+        for group in other.groups.values():
+            for path in group.files:
+                self.add(path)
+        self.stats.update(other.stats)
+
+    def jpeg_paths(self):
+        return [path for group in self.groups.values() for path in group.jpegs]
+
+    def orphans(self):
+        # Sidecars whose JPEG is gone, e.g. after culling JPEGs in another tool.
+        return [group for group in self.groups.values() if not group.jpegs and group.raws]
+
+
+def iter_directory(directory, recursive=False):
+    # Yields os.DirEntry objects for files as the directory is read, so callers
+    # can start work before a large listing has finished. Hidden folders (like
+    # the staging trash) are never descended into.
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive and not entry.name.startswith('.'):
+                                subdirs.append(entry.path)
+                        elif entry.is_file():
+                            yield entry
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Error reading directory {current}: {e}")
+        stack.extend(sorted(subdirs, reverse=True))
+
+
+class PathEntry:
+    # Stands in for os.DirEntry when the file list comes from somewhere other
+    # than a directory scan (e.g. the folder watcher).
+    __slots__ = ('path', 'name', '_stat')
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._stat = None
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+
+def iter_paths(paths):
+    for path in paths:
+        yield PathEntry(path)
+
+
+def build_pairing_index(directory, index=None, recursive=False):
+    # One os.scandir pass. File types come with the directory entries; only
+    # JPEGs are stat'ed (one call each on Linux, free on Windows).
+    if index is None:
+        index = PairingIndex()
+    for entry in iter_directory(directory, recursive):
+        index.add_entry(entry)
+    return index
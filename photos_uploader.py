@@ -0,0 +1,308 @@
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+import instrumentation
+
+# Point SHUTTERSWEEP_PHOTOS_API at a local stub server to exercise the upload
+# path without touching a real library.
+API_BASE = os.environ.get("SHUTTERSWEEP_PHOTOS_API", "https://photoslibrary.googleapis.com")
+
+BATCH_CREATE_LIMIT = 50
+CHUNK_SIZE = 8 * 1024 * 1024
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+TIMEOUT = (10, 120)
+
+
+class UploadError(Exception):
+    pass
+
+
+class UploadCancelled(UploadError):
+    pass
+
+
+class UploadItem:
+    def __init__(self, path):
+        self.path = path
+        self.file_name = os.path.basename(path)
+        self.size = 0
+        self.bytes_sent = 0
+        self.upload_token = None
+        self.media_item_id = None
+        self.error = None
+        self.sha256 = None
+        self.skipped = False
+        self.duplicate_of = None
+
+    @property
+    def succeeded(self):
+        return self.media_item_id is not None and self.error is None
+
+
+def upload_content_type(path):
+    return 'image/jpeg' if path.lower().endswith(('.jpg', '.jpeg')) else 'image/raw'
+
+
+class PhotosUploader:
+    # Uploads files to Google Photos with the resumable protocol: bodies are
+    # streamed in CHUNK_SIZE pieces from a bounded worker pool, and the upload
+    # tokens are turned into media items BATCH_CREATE_LIMIT at a time.
+    # Callbacks are invoked from worker threads.
+    # With a ledger (upload_ledger.UploadLedger) every file is hashed first:
+    # content that is already in the library is skipped, and a file that was
+    # cut off mid-upload continues from its stored session or upload token.
+    def __init__(self, session, api_base=API_BASE, max_workers=4, chunk_size=CHUNK_SIZE,
+                 max_retries=5, backoff=1.0, on_progress=None, on_item_done=None, ledger=None):
+        self.session = session
+        self.api_base = api_base.rstrip('/')
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.on_progress = on_progress
+        self.on_item_done = on_item_done
+        self.ledger = ledger
+        self.cancelled = threading.Event()
+        self.claims_lock = threading.Lock()
+        self.claims = {}
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise UploadCancelled("Upload cancelled")
+
+    def upload(self, paths):
+        items = [UploadItem(path) for path in paths]
+        ready = []
+        duplicates = []
+        self.claims = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.upload_item_bytes, item): item for item in items}
+            remaining = len(futures)
+            for future in as_completed(futures):
+                item = futures[future]
+                remaining -= 1
+                instrumentation.gauge("upload.pending", remaining)
+                try:
+                    # After a cancel, queued items fail straight away in
+                    # upload_item_bytes without touching the file or network
+                    future.result()
+                except Exception as e:
+                    item.error = str(e)
+                    self.item_done(item)
+                    continue
+                if item.duplicate_of is not None:
+                    duplicates.append(item)
+                    continue
+                if item.skipped:
+                    self.item_done(item)
+                    continue
+                ready.append(item)
+                if len(ready) >= BATCH_CREATE_LIMIT:
+                    self.create_media_items(ready[:BATCH_CREATE_LIMIT])
+                    del ready[:BATCH_CREATE_LIMIT]
+        if ready:
+            self.create_media_items(ready)
+        # The same content selected twice in one batch is only sent once
+        for item in duplicates:
+            item.media_item_id = item.duplicate_of.media_item_id
+            item.error = item.duplicate_of.error
+            self.item_done(item)
+        return items
+
+    def item_done(self, item):
+        if self.on_item_done:
+            self.on_item_done(item)
+
+    def progress(self, item):
+        if self.on_progress:
+            self.on_progress(item.path, item.bytes_sent, item.size)
+
+    def upload_item_bytes(self, item):
+        self.check_cancelled()
+        item.size = os.path.getsize(item.path)
+        if self.ledger is not None and self.resume_from_ledger(item):
+            return item
+        self.check_cancelled()
+        upload_url, granularity = self.start_upload_session(item)
+        if self.ledger is not None:
+            self.ledger.record_session(item.sha256, item.size, item.file_name, upload_url, granularity)
+        self.send_chunks(item, upload_url, self.aligned_chunk_size(granularity))
+        self.record_token(item)
+        return item
+
+    def aligned_chunk_size(self, granularity):
+        if granularity:
+            return max(granularity, self.chunk_size // granularity * granularity)
+        return self.chunk_size
+
+    def resume_from_ledger(self, item):
+        # Returns True when nothing (more) needs to be sent for this item.
+        with instrumentation.span("upload.hash", path=item.path):
+            item.sha256 = self.ledger.file_hash(item.path)
+        self.check_cancelled()
+        with self.claims_lock:
+            first = self.claims.setdefault(item.sha256, item)
+        if first is not item:
+            item.duplicate_of = first
+            item.skipped = True
+            return True
+        record = self.ledger.lookup(item.sha256)
+        if record is None:
+            return False
+        if record.media_item_id:
+            item.media_item_id = record.media_item_id
+            item.skipped = True
+            return True
+        if record.has_fresh_token():
+            item.upload_token = record.upload_token
+            item.bytes_sent = item.size
+            self.progress(item)
+            return True
+        if not record.has_fresh_session():
+            return False
+        # A finalised session cannot hand out its token again, and an expired
+        # or unknown one errors; either way start over.
+        try:
+            offset, status = self.query_session(record.upload_url)
+        except UploadError:
+            status = None
+        if status != 'active' or offset > item.size:
+            self.ledger.forget_session(item.sha256)
+            return False
+        instrumentation.count("upload.resumed")
+        item.bytes_sent = offset
+        self.progress(item)
+        self.send_chunks(item, record.upload_url, self.aligned_chunk_size(record.granularity), offset)
+        self.record_token(item)
+        return True
+
+    def record_token(self, item):
+        if self.ledger is not None:
+            self.ledger.record_token(item.sha256, item.size, item.file_name, item.upload_token)
+
+    def start_upload_session(self, item):
+        response = self.request('POST', f"{self.api_base}/v1/uploads", headers={
+            'Content-Length': '0',
+            'X-Goog-Upload-Command': 'start',
+            'X-Goog-Upload-Content-Type': upload_content_type(item.path),
+            'X-Goog-Upload-Protocol': 'resumable',
+            'X-Goog-Upload-Raw-Size': str(item.size),
+        })
+        upload_url = response.headers.get('X-Goog-Upload-URL')
+        if not upload_url:
+            raise UploadError("Upload session was not created")
+        return upload_url, int(response.headers.get('X-Goog-Upload-Chunk-Granularity', 0) or 0)
+
+    def send_chunks(self, item, upload_url, chunk_size, offset=0):
+        failures = 0
+        with open(item.path, 'rb') as image_file:
+            while True:
+                self.check_cancelled()
+                image_file.seek(offset)
+                chunk = image_file.read(chunk_size)
+                last = offset + len(chunk) >= item.size
+                error = None
+                try:
+                    response = self.send('POST', upload_url, attempt=failures, data=chunk, headers={
+                        'X-Goog-Upload-Command': 'upload, finalize' if last else 'upload',
+                        'X-Goog-Upload-Offset': str(offset),
+                    })
+                except requests.RequestException as e:
+                    error = e
+                else:
+                    if response.status_code in RETRY_STATUSES:
+                        error = f"HTTP {response.status_code}"
+                    elif response.status_code >= 400:
+                        raise UploadError(f"Uploading {item.file_name} failed: HTTP {response.status_code}: {response.text[:200]}")
+                if error is not None:
+                    # Ask the server how much it actually has and carry on from there.
+                    failures += 1
+                    if failures > self.max_retries:
+                        raise UploadError(f"Uploading {item.file_name} failed: {error}")
+                    self.sleep_before_retry(failures)
+                    offset = self.query_offset(upload_url)
+                    item.bytes_sent = offset
+                    continue
+                failures = 0
+                offset += len(chunk)
+                item.bytes_sent = offset
+                self.progress(item)
+                if last:
+                    item.upload_token = response.text.strip()
+                    if not item.upload_token:
+                        raise UploadError(f"No upload token returned for {item.file_name}")
+                    return
+
+    def query_offset(self, upload_url):
+        return self.query_session(upload_url)[0]
+
+    def query_session(self, upload_url):
+        response = self.request('POST', upload_url, headers={'X-Goog-Upload-Command': 'query'})
+        return (int(response.headers.get('X-Goog-Upload-Size-Received', 0) or 0),
+                response.headers.get('X-Goog-Upload-Status'))
+
+    def create_media_items(self, items):
+        body = {'newMediaItems': [
+            {'description': item.file_name, 'simpleMediaItem': {'uploadToken': item.upload_token, 'fileName': item.file_name}}
+            for item in items
+        ]}
+        try:
+            response = self.request('POST', f"{self.api_base}/v1/mediaItems:batchCreate", json=body)
+            results = response.json().get('newMediaItemResults', [])
+        except (UploadError, ValueError) as e:
+            for item in items:
+                item.error = f"Creating media item failed: {e}"
+                self.item_done(item)
+            return
+        by_token = {result.get('uploadToken'): result for result in results}
+        for item in items:
+            result = by_token.get(item.upload_token)
+            media_item = (result or {}).get('mediaItem')
+            if media_item and media_item.get('id'):
+                item.media_item_id = media_item['id']
+                if self.ledger is not None:
+                    self.ledger.record_media_item(item.sha256, item.size, item.file_name, item.media_item_id)
+            else:
+                status = (result or {}).get('status', {})
+                item.error = status.get('message') or "Media item was not created"
+                if self.ledger is not None:
+                    # The token was rejected; send the bytes again next time
+                    self.ledger.forget_token(item.sha256)
+            self.item_done(item)
+
+    def send(self, method, url, attempt=0, **kwargs):
+        # A single traced round trip; retrying is up to the caller
+        with instrumentation.span("upload.http", method=method, url=url, attempt=attempt) as http_span:
+            response = self.session.request(method, url, timeout=TIMEOUT, **kwargs)
+            http_span.set(status=response.status_code)
+        return response
+
+    def request(self, method, url, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.send(method, url, attempt, **kwargs)
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    raise UploadError(str(e))
+                self.sleep_before_retry(attempt + 1)
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                self.sleep_before_retry(attempt + 1, response.headers.get('Retry-After'))
+                continue
+            if response.status_code >= 400:
+                raise UploadError(f"HTTP {response.status_code}: {response.text[:200]}")
+            return response
+        raise UploadError(f"Giving up on {url}")
+
+    def sleep_before_retry(self, attempt, retry_after=None):
+        instrumentation.count("upload.retries")
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random())
+        self.cancelled.wait(min(delay, 60))
@@ -0,0 +1,138 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, QSize, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+from image_decode import decode_scaled
+import instrumentation
+
+
+class DecodedImageCache:
+    # LRU of display-resolution images, bounded by decoded bytes rather than
+    # entry count so 50MP and 12MP shoots get the same memory ceiling.
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+
+    def __contains__(self, path):
+        return path in self.entries
+
+    def get(self, path):
+        entry = self.entries.get(path)
+        if entry is not None:
+            self.entries.move_to_end(path)
+        return entry
+
+    def put(self, path, image, original_size):
+        self.discard(path)
+        self.entries[path] = (image, original_size)
+        self.total_bytes += image.sizeInBytes()
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, (old_image, _) = self.entries.popitem(last=False)
+            self.total_bytes -= old_image.sizeInBytes()
+
+    def discard(self, path):
+        entry = self.entries.pop(path, None)
+        if entry is not None:
+            self.total_bytes -= entry[0].sizeInBytes()
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+
+def decode_for_display(image_path, bound):
+    reader = QImageReader(image_path)
+    original_size = reader.size()
+    image = decode_scaled(image_path, bound, reader)
+    if not original_size.isValid():
+        original_size = image.size()
+    return image, original_size
+
+
+class ImagePrefetcher(QObject):
+    # Decodes the frames around the current one on a small pool. Results come
+    # back through image_ready (queued onto the GUI thread) and are only ever
+    # inserted into the cache from there. Each submission carries the
+    # generation it was made in; reset() starts a new one, so results from
+    # before it (and for paths discarded since) are dropped.
+    image_ready = pyqtSignal(str, int, QImage, QSize)
+
+    def __init__(self, cache, bound, radius=3, max_workers=2, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.bound = bound
+        self.radius = radius
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.pending = {}
+        self.generation = 0
+        self.image_ready.connect(self.on_image_ready)
+
+    def load(self, image_path):
+        entry = self.cache.get(image_path)
+        instrumentation.cache_lookup("display_cache", entry is not None, entry is None)
+        if entry is not None:
+            return entry
+        future = self.pending.pop(image_path, None)
+        if future is not None and not future.cancel():
+            # Already being decoded: wait for that instead of decoding twice
+            with instrumentation.span("display.wait_prefetch", path=image_path):
+                image, original_size = future.result()
+        else:
+            with instrumentation.span("display.decode", path=image_path):
+                image, original_size = decode_for_display(image_path, self.bound)
+        if not image.isNull():
+            self.cache.put(image_path, image, original_size)
+        return image, original_size
+
+    def request(self, images, current_index):
+        # Nearest frames first, alternating ahead and behind, so a held arrow key
+        # in either direction is covered before the far end of the window.
+        window = []
+        for offset in range(1, self.radius + 1):
+            for index in (current_index + offset, current_index - offset):
+                if 0 <= index < len(images):
+                    window.append(images[index])
+        wanted = set(window)
+        for path, future in list(self.pending.items()):
+            if path not in wanted and future.cancel():
+                del self.pending[path]
+        for path in window:
+            if path not in self.cache and path not in self.pending:
+                self.pending[path] = self.executor.submit(self.decode, path, self.bound, self.generation)
+        instrumentation.gauge("prefetch.pending", len(self.pending))
+
+    def decode(self, image_path, bound, generation):
+        try:
+            with instrumentation.span("prefetch.decode", path=image_path):
+                image, original_size = decode_for_display(image_path, bound)
+        except Exception as e:
+            print(f"Error prefetching {image_path}: {e}")
+            image, original_size = QImage(), QSize()
+        self.image_ready.emit(image_path, generation, image, original_size)
+        return image, original_size
+
+    def on_image_ready(self, image_path, generation, image, original_size):
+        # Only still-wanted results go in: not from before a reset, not for a
+        # path discarded (e.g. deleted) or already taken over by load()
+        if generation != self.generation or self.pending.pop(image_path, None) is None:
+            return
+        if not image.isNull():
+            self.cache.put(image_path, image, original_size)
+
+    def discard(self, image_path):
+        future = self.pending.pop(image_path, None)
+        if future is not None:
+            future.cancel()
+        self.cache.discard(image_path)
+
+    def reset(self):
+        self.generation += 1
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.cache.clear()
+
+    def shutdown(self):
+        self.reset()
+        self.executor.shutdown(wait=False)
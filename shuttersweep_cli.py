@@ -0,0 +1,404 @@
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import instrumentation
+import trash
+from exif_reader import read_summary
+from pairing import PairingIndex, iter_directory, iter_paths
+
+# Headless batch mode: the app's scan, RAW pairing, focus scoring, delete and
+# upload code driven from the command line, for cron jobs and SSH sessions.
+# Every result and progress update is one JSON object per line on stdout;
+# anything the library code prints goes to stderr instead. Qt is only
+# imported by the score command (for decoding), and never its widgets.
+#
+#   python shuttersweep_cli.py scan /photos -r --exif
+#   python shuttersweep_cli.py clean-orphans /photos -r --dry-run
+#   python shuttersweep_cli.py score /photos/2024-05-01 --softest 20 --delete
+#   python shuttersweep_cli.py delete /photos/IMG_0001.JPG /photos/IMG_0002.JPG
+#   python shuttersweep_cli.py upload /photos/keepers -r --workers 8
+
+PROGRESS_INTERVAL = 1.0
+BATCH_SIZE = 500
+
+
+class Reporter:
+    # Thread-safe JSON lines writer; progress events are throttled per stage.
+    def __init__(self, stream, progress_interval=PROGRESS_INTERVAL):
+        self.stream = stream
+        self.progress_interval = progress_interval
+        self.lock = threading.Lock()
+        self.last_progress = {}
+        self.errors = 0
+
+    def emit(self, event, **fields):
+        line = json.dumps(dict(event=event, **fields), default=str)
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def progress(self, stage, done, total=None, force=False, **fields):
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.last_progress.get(stage, 0) < self.progress_interval:
+                return
+            self.last_progress[stage] = now
+        self.emit("progress", stage=stage, done=done, total=total, **fields)
+
+    def error(self, path, error):
+        with self.lock:
+            self.errors += 1
+        self.emit("error", path=path, error=str(error))
+
+
+def quiet_stdout():
+    # Worker process initializer: keep library prints off the JSON stream
+    sys.stdout = sys.stderr
+
+
+def scan_index(targets, recursive, reporter):
+    # Directories are listed (recursively if asked); files are taken as given.
+    index = PairingIndex()
+    files = 0
+    for target in read_targets(targets):
+        # Absolute paths, so cache and ledger entries are shared with the app
+        target = os.path.abspath(target)
+        if os.path.isdir(target):
+            entries = iter_directory(target, recursive)
+        elif os.path.isfile(target):
+            entries = iter_paths([target])
+        else:
+            reporter.error(target, "No such file or directory")
+            continue
+        for entry in entries:
+            try:
+                if index.add_entry(entry):
+                    files += 1
+            except OSError as e:
+                reporter.error(entry.path, e)
+                continue
+            reporter.progress("scan", files)
+    reporter.progress("scan", files, files, force=True)
+    return index
+
+
+def delete_files(files, keep_deleted, reporter, stage="delete"):
+    # The app's delete path: rename into the staging trash, then purge. With
+    # keep_deleted the files are moved to .shuttersweep_deleted instead, to be
+    # checked first (the app never empties that one).
+    deleted = 0
+    root_name = trash.KEPT_DIR_NAME if keep_deleted else trash.TRASH_DIR_NAME
+    for start in range(0, len(files), BATCH_SIZE):
+        staged, errors = trash.stage_files(files[start:start + BATCH_SIZE], trash.new_batch_id(), root_name)
+        if not keep_deleted:
+            errors += trash.purge_files(staged)
+        failed = {path for path, _ in errors}
+        for path, error in errors:
+            reporter.error(path, error)
+        for original_path, staged_path in staged:
+            if original_path not in failed:
+                deleted += 1
+                reporter.emit("deleted", path=original_path, kept=staged_path if keep_deleted else None)
+        reporter.progress(stage, min(start + BATCH_SIZE, len(files)), len(files))
+    return deleted
+
+
+def delete_images(index, jpeg_paths, args, reporter):
+    # Each JPEG goes together with its RAW pairs and sidecars, as in the app
+    files = []
+    for path in jpeg_paths:
+        group_files = index.files(path)
+        if args.dry_run:
+            reporter.emit("would_delete", path=path, files=group_files)
+        files.extend(group_files)
+    if args.dry_run:
+        return 0
+    # JPEGs sharing a stem share their RAWs; stage those only once
+    return delete_files(list(dict.fromkeys(files)), args.keep_deleted, reporter)
+
+
+def command_scan(args, reporter):
+    index = scan_index(args.targets, args.recursive, reporter)
+    jpegs = sorted(index.jpeg_paths())
+    raws = 0
+    with ThreadPoolExecutor(max_workers=args.workers or 8) as executor:
+        # Exif is read a batch at a time and streamed out, so memory stays
+        # flat however many images there are
+        for start in range(0, len(jpegs), BATCH_SIZE):
+            batch = jpegs[start:start + BATCH_SIZE]
+            summaries = executor.map(read_summary, batch) if args.exif else [None] * len(batch)
+            for path, tags in zip(batch, summaries):
+                group = index.group(path)
+                raws += len(group.raws)
+                record = {"path": path, "raws": group.raws, "sidecars": group.metadata}
+                if path in index.stats:
+                    record["size"], record["mtime_ns"] = index.stats[path]
+                if args.exif:
+                    record["exif"] = tags or {}
+                reporter.emit("image", **record)
+            reporter.progress("images", start + len(batch), len(jpegs), force=start + BATCH_SIZE >= len(jpegs))
+    orphans = index.orphans()
+    for group in orphans:
+        reporter.emit("orphan", files=group.files)
+    reporter.emit("summary", images=len(jpegs), raws=raws, orphans=len(orphans))
+
+
+def command_clean_orphans(args, reporter):
+    # RAWs (and their sidecars) whose JPEG has been culled elsewhere
+    index = scan_index(args.targets, args.recursive, reporter)
+    files = []
+    for group in index.orphans():
+        if args.dry_run:
+            reporter.emit("would_delete", files=group.files)
+        files.extend(group.files)
+    # Set aside rather than removed unless asked: a RAW-only folder is all orphans
+    deleted = 0 if args.dry_run else delete_files(files, not args.purge, reporter)
+    reporter.emit("summary", orphan_files=len(files), deleted=deleted, dry_run=args.dry_run, purged=args.purge)
+
+
+def command_delete(args, reporter):
+    paths = read_targets(args.targets)
+    index = PairingIndex()
+    for directory in sorted({os.path.dirname(os.path.abspath(path)) for path in paths}):
+        for entry in iter_directory(directory):
+            index.add_entry(entry)
+    jpegs = []
+    for path in paths:
+        path = os.path.join(os.path.dirname(os.path.abspath(path)), os.path.basename(path))
+        if not index.is_jpeg(path) or not index.contains(path):
+            reporter.error(path, "Not found, or not a JPEG")
+            continue
+        jpegs.append(path)
+    deleted = delete_images(index, jpegs, args, reporter)
+    reporter.emit("summary", images=len(jpegs), deleted=deleted, dry_run=args.dry_run)
+
+
+def command_score(args, reporter):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from focus import CHUNK_SIZE, FocusScoreCache, default_workers, score_files
+    index = scan_index(args.targets, args.recursive, reporter)
+    jpegs = sorted(index.jpeg_paths())
+    stats = index.stats
+    try:
+        cache = FocusScoreCache()
+    except Exception as e:
+        print(f"Focus score cache unavailable: {e}")
+        cache = None
+    scores = cache.get_many([(path, *stats.get(path, (0, 0))) for path in jpegs]) if cache is not None else {}
+    for path in jpegs:
+        if path in scores:
+            reporter.emit("score", path=path, score=scores[path], cached=True)
+    missing = [path for path in jpegs if path not in scores]
+    done = len(jpegs) - len(missing)
+    workers = args.workers or default_workers()
+    # Only a few chunks in flight at a time, however large the archive
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=quiet_stdout) as executor:
+        pending = {}
+        position = 0
+        while position < len(missing) or pending:
+            while position < len(missing) and len(pending) < workers * 2:
+                chunk = missing[position:position + CHUNK_SIZE]
+                pending[executor.submit(score_files, chunk)] = chunk
+                position += CHUNK_SIZE
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                chunk = pending.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = [(path, None) for path in chunk]
+                    print(f"Error scoring focus: {e}")
+                rows = []
+                for path, score in results:
+                    if score is None:
+                        reporter.error(path, "Could not decode image")
+                        continue
+                    scores[path] = score
+                    rows.append((path, *stats.get(path, (0, 0)), score))
+                    reporter.emit("score", path=path, score=score, cached=False)
+                if cache is not None and rows:
+                    cache.put_many(rows)
+                done += len(results)
+                reporter.progress("score", done, len(jpegs))
+    if cache is not None:
+        cache.close()
+    reporter.progress("score", done, len(jpegs), force=True)
+
+    softest = []
+    if args.softest:
+        # Same selection as the app's "Select Softest"
+        scored = sorted((path for path in jpegs if path in scores), key=scores.get)
+        softest = scored[:max(1, round(len(jpegs) * args.softest / 100))] if scored else []
+        for path in softest:
+            reporter.emit("softest", path=path, score=scores[path])
+    deleted = 0
+    if args.delete and softest:
+        deleted = delete_images(index, softest, args, reporter)
+    reporter.emit("summary", images=len(jpegs), scored=len(scores), softest=len(softest), deleted=deleted,
+                  dry_run=args.dry_run)
+
+
+def command_upload(args, reporter):
+    from upload_ledger import UploadLedger
+    index = scan_index(args.targets, args.recursive, reporter)
+    # Each JPEG goes up together with its RAW pairs, as in the app
+    paths = []
+    for jpeg in sorted(index.jpeg_paths()):
+        paths.append(jpeg)
+        if not args.jpeg_only:
+            paths.extend(index.raws(jpeg))
+    ledger = None
+    if not args.no_ledger:
+        try:
+            ledger = UploadLedger()
+        except Exception as e:
+            print(f"Upload ledger unavailable: {e}")
+    try:
+        if args.dry_run:
+            upload_dry_run(paths, ledger, args, reporter)
+            return
+        upload_files(paths, ledger, args, reporter)
+    finally:
+        if ledger is not None:
+            ledger.close()
+
+
+def upload_dry_run(paths, ledger, args, reporter):
+    hashes = ledger.hash_files(paths, args.workers or 4) if ledger is not None else {}
+    counts = {}
+    for path in paths:
+        record = ledger.lookup(hashes[path]) if path in hashes else None
+        if record is not None and record.media_item_id:
+            action = "skip"
+        elif record is not None and (record.has_fresh_token() or record.has_fresh_session()):
+            action = "resume"
+        else:
+            action = "upload"
+        counts[action] = counts.get(action, 0) + 1
+        reporter.emit("would_upload", path=path, action=action)
+    reporter.emit("summary", files=len(paths), dry_run=True, **counts)
+
+
+def upload_files(paths, ledger, args, reporter):
+    import google_photos_auth
+    from photos_uploader import PhotosUploader
+    if args.token:
+        google_photos_auth.TOKEN_PATH = args.token
+    workers = args.workers or 4
+    try:
+        # Signing in needs a browser; do it once from the app, then point
+        # --token at its token.json
+        session = google_photos_auth.get_session(pool_size=workers * 2, interactive=False)
+    except (google_photos_auth.GoogleAuthError, ValueError) as e:
+        # Missing, unreadable or revoked token, or no way to refresh it
+        reporter.error(os.path.abspath(google_photos_auth.TOKEN_PATH), e)
+        return
+    sent = {}
+    sizes = {}
+    lock = threading.Lock()
+
+    def on_progress(path, bytes_sent, total):
+        with lock:
+            sent[path] = bytes_sent
+            sizes[path] = total
+            done, total = sum(sent.values()), sum(sizes.values())
+        reporter.progress("upload", done, total, unit="bytes")
+
+    def on_item_done(item):
+        if item.succeeded:
+            reporter.emit("uploaded", path=item.path, media_item_id=item.media_item_id, skipped=item.skipped)
+        else:
+            reporter.error(item.path, item.error)
+
+    uploader = PhotosUploader(session, max_workers=workers, on_progress=on_progress,
+                              on_item_done=on_item_done, ledger=ledger)
+    # A cron timeout or Ctrl+C stops cleanly; with the ledger the next run
+    # resumes where this one stopped.
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: uploader.cancel())
+    items = uploader.upload(paths)
+    reporter.emit("summary", files=len(items), uploaded=sum(item.succeeded and not item.skipped for item in items),
+                  skipped=sum(item.succeeded and item.skipped for item in items),
+                  failed=sum(not item.succeeded for item in items), cancelled=uploader.cancelled.is_set())
+
+
+def read_targets(targets):
+    # "-" reads more paths from stdin, one per line (e.g. piped from jq)
+    paths = []
+    for target in targets:
+        if target == "-":
+            paths.extend(line.strip() for line in sys.stdin if line.strip())
+        else:
+            paths.append(target)
+    return paths
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("targets", nargs="+", help="Folders or files (- reads paths from stdin)")
+    common.add_argument("-r", "--recursive", action="store_true", help="Descend into subfolders")
+    common.add_argument("--workers", type=int, help="Worker threads or processes (default depends on the command)")
+    common.add_argument("--progress-interval", type=float, default=PROGRESS_INTERVAL,
+                        help="Seconds between progress lines")
+    dry_run = argparse.ArgumentParser(add_help=False)
+    dry_run.add_argument("--dry-run", action="store_true", help="Report what would be deleted without touching files")
+    deleting = argparse.ArgumentParser(add_help=False, parents=[dry_run])
+    deleting.add_argument("--keep-deleted", action="store_true",
+                          help="Move deleted files to .shuttersweep_deleted instead of removing them")
+
+    parser = argparse.ArgumentParser(
+        description="Shutter Sweep batch mode. Writes one JSON object per line to stdout.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    scan = commands.add_parser("scan", parents=[common], help="List JPEGs with their RAW pairs, and orphaned RAWs")
+    scan.add_argument("--exif", action="store_true", help="Include the Exif summary of every JPEG")
+    scan.set_defaults(handler=command_scan)
+    clean = commands.add_parser(
+        "clean-orphans", parents=[common, dry_run],
+        help="Set aside RAW files (and sidecars) whose JPEG is gone",
+        description="Moves every RAW (and its sidecars) without a JPEG next to it into .shuttersweep_deleted. "
+                    "In a RAW-only folder, or before the JPEGs have been exported, that is the whole shoot, so "
+                    "try --dry-run first. Files are only removed for good with --purge.")
+    clean.add_argument("--purge", action="store_true",
+                       help="Remove the files for good instead of moving them to .shuttersweep_deleted")
+    clean.set_defaults(handler=command_clean_orphans)
+    delete = commands.add_parser("delete", parents=[common, deleting], help="Delete JPEGs with their RAW pairs")
+    delete.set_defaults(handler=command_delete)
+    score = commands.add_parser("score", parents=[common, deleting], help="Score the sharpness of every JPEG")
+    score.add_argument("--softest", type=float, metavar="PERCENT", help="Report the softest PERCENT of frames")
+    score.add_argument("--delete", action="store_true", help="Delete the frames reported by --softest")
+    score.set_defaults(handler=command_score)
+    upload = commands.add_parser("upload", parents=[common], help="Upload JPEGs and their RAW pairs to Google Photos")
+    upload.add_argument("--dry-run", action="store_true", help="Report what would be uploaded, skipped or resumed")
+    upload.add_argument("--jpeg-only", action="store_true", help="Leave the RAW pairs out")
+    upload.add_argument("--no-ledger", action="store_true", help="Upload everything, ignoring past uploads")
+    upload.add_argument("--token", help="OAuth token file (default: token.json in the working directory)")
+    upload.set_defaults(handler=command_upload)
+    return parser
+
+
+def main(argv=None):
+    argv = instrumentation.enable_from_args(sys.argv if argv is None else [sys.argv[0]] + list(argv))
+    args = build_parser().parse_args(argv[1:])
+    # JSON goes to the real stdout; stray prints from library code to stderr
+    reporter = Reporter(sys.stdout, args.progress_interval)
+    sys.stdout = sys.stderr
+    try:
+        args.handler(args, reporter)
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head); stop quietly
+        os.dup2(os.open(os.devnull, os.O_WRONLY), reporter.stream.fileno())
+        return 1
+    finally:
+        sys.stdout = reporter.stream
+    return 1 if reporter.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+import os
+import sys
+import pytest
+
+# The modules live at the top of the repository, next to this folder
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.photos_stub import PhotosStubServer  # noqa: E402
+
+
+@pytest.fixture
+def stub():
+    server = PhotosStubServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def make_files(tmp_path):
+    # make_files(count, size) -> paths of files with distinct contents
+    def make(count, size, prefix="IMG_"):
+        paths = []
+        for number in range(count):
+            path = tmp_path / f"{prefix}{number:04d}.JPG"
+            header = f"{prefix}{number}".encode()
+            path.write_bytes(header + b"\0" * (size - len(header)))
+            paths.append(str(path))
+        return paths
+    return make
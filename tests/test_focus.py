@@ -0,0 +1,53 @@
+import os
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtGui import QGuiApplication, QImage  # noqa: E402
+from focus import FocusScorer  # noqa: E402
+
+app = QGuiApplication.instance() or QGuiApplication([])
+
+
+def make_jpegs(directory, count):
+    paths = []
+    for i in range(count):
+        image = QImage(64, 64, QImage.Format_RGB888)
+        image.fill(i * 10)
+        path = os.path.join(directory, f"IMG_{i:04d}.jpg")
+        image.save(path, "JPEG")
+        paths.append(path)
+    return paths
+
+
+def test_results_are_counted_on_the_gui_thread(tmp_path):
+    paths = make_jpegs(str(tmp_path), 12)
+    scorer = FocusScorer(max_workers=2)
+    threads = []
+    finished = []
+    scorer.scores_ready.connect(lambda scores: threads.append(threading.current_thread()))
+    scorer.scoring_finished.connect(lambda: finished.append(True))
+    scorer.score([(path, 0, 0) for path in paths])
+    deadline = time.monotonic() + 60
+    while not finished and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    scorer.shutdown()
+    assert finished
+    assert scorer.done == scorer.total == len(paths)
+    assert threads and all(thread is threading.main_thread() for thread in threads)
+
+
+def test_stale_chunks_are_dropped():
+    scorer = FocusScorer()
+    scorer.total = 8
+    generation = scorer.generation
+    scorer.cancel()
+    received = []
+    scorer.scores_ready.connect(received.append)
+    worker = threading.Thread(target=scorer.chunk_scored.emit, args=(generation, {"a.jpg": 1.0}, 8))
+    worker.start()
+    worker.join()
+    app.processEvents()
+    assert received == []
+    assert scorer.done == 0
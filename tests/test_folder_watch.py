@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtGui import QGuiApplication, QImage  # noqa: E402
+import folder_watch  # noqa: E402
+from folder_watch import FolderWatcher  # noqa: E402
+
+app = QGuiApplication.instance() or QGuiApplication([])
+
+
+def write_jpeg(path):
+    image = QImage(16, 16, QImage.Format_RGB888)
+    image.fill(0)
+    image.save(path, "JPEG")
+    return path
+
+
+def process_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    return condition()
+
+
+def test_listing_runs_off_the_gui_thread(tmp_path, monkeypatch):
+    threads = []
+    list_directory = folder_watch.list_directory
+
+    def recording(*args):
+        threads.append(threading.current_thread())
+        return list_directory(*args)
+    monkeypatch.setattr(folder_watch, "list_directory", recording)
+    existing = write_jpeg(str(tmp_path / "IMG_0001.jpg"))
+    watcher = FolderWatcher()
+    changes = []
+    watcher.files_changed.connect(lambda added, removed: changes.append((added, removed)))
+    watcher.start(str(tmp_path), known=[existing])
+    assert process_until(lambda: threads and not watcher.scanning)
+    added = write_jpeg(str(tmp_path / "IMG_0002.jpg"))
+    os.remove(existing)
+    watcher.rescan()
+    assert process_until(lambda: len(changes) == 2)
+    watcher.shutdown()
+    assert all(thread is not threading.main_thread() for thread in threads)
+    assert changes == [([], [existing]), ([added], [])]
+
+
+def test_recursive_mode_watches_subfolders(tmp_path):
+    subfolder = tmp_path / "card" / "DCIM"
+    subfolder.mkdir(parents=True)
+    (tmp_path / ".hidden").mkdir()
+    watcher = FolderWatcher()
+    watcher.start(str(tmp_path), recursive=True)
+    assert process_until(lambda: not watcher.scanning)
+    watched = set(watcher.watcher.directories())
+    watcher.shutdown()
+    assert str(subfolder) in watched
+    assert str(tmp_path / ".hidden") not in watched
+
+
+def test_listing_for_a_previous_folder_is_dropped(tmp_path, monkeypatch):
+    release = threading.Event()
+    list_directory = folder_watch.list_directory
+
+    def blocking(*args):
+        release.wait(5)
+        return list_directory(*args)
+    monkeypatch.setattr(folder_watch, "list_directory", blocking)
+    old = tmp_path / "old"
+    old.mkdir()
+    write_jpeg(str(old / "IMG_0001.jpg"))
+    watcher = FolderWatcher()
+    watcher.start(str(old))
+    watcher.stop()
+    release.set()
+    watcher.executor.submit(lambda: None).result(5)
+    app.processEvents()
+    assert watcher.pending == {}
+    assert watcher.known == set()
+    watcher.shutdown()
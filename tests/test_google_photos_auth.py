@@ -0,0 +1,78 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+import google_photos_auth
+from google.oauth2.credentials import Credentials
+
+
+def write_token(path, expires_in):
+    expiry = datetime.utcnow() + expires_in
+    path.write_text(json.dumps({
+        "token": "access", "refresh_token": "refresh", "token_uri": "https://oauth2.example/token",
+        "client_id": "client", "client_secret": "secret", "scopes": google_photos_auth.SCOPES,
+        "expiry": expiry.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }))
+
+
+@pytest.fixture
+def auth(tmp_path, monkeypatch):
+    # Fresh module state and a token file of the test's own
+    monkeypatch.setattr(google_photos_auth, "TOKEN_PATH", str(tmp_path / "token.json"))
+    monkeypatch.setattr(google_photos_auth, "_credentials", None)
+    monkeypatch.setattr(google_photos_auth, "_session", None)
+    refreshed = []
+
+    def refresh(creds, request):
+        refreshed.append(creds)
+        creds.token = "refreshed"
+        creds.expiry = datetime.utcnow() + timedelta(hours=1)
+    monkeypatch.setattr(Credentials, "refresh", refresh)
+    return tmp_path, refreshed
+
+
+def test_token_file_is_read_once(auth, monkeypatch):
+    tmp_path, refreshed = auth
+    write_token(tmp_path / "token.json", timedelta(hours=1))
+    reads = []
+    original = Credentials.from_authorized_user_file
+    monkeypatch.setattr(Credentials, "from_authorized_user_file",
+                        lambda *args: reads.append(args) or original(*args))
+    first = google_photos_auth.get_credentials()
+    assert google_photos_auth.get_credentials() is first
+    assert len(reads) == 1
+    assert refreshed == []
+
+
+def test_refreshes_ahead_of_expiry(auth):
+    tmp_path, refreshed = auth
+    write_token(tmp_path / "token.json", timedelta(hours=1))
+    creds = google_photos_auth.get_credentials()
+    creds.expiry = datetime.utcnow() + google_photos_auth.REFRESH_MARGIN / 2
+    assert google_photos_auth.needs_refresh(creds)
+    google_photos_auth.get_credentials()
+    assert refreshed == [creds]
+    # The refreshed token is written back for the next run
+    assert json.loads((tmp_path / "token.json").read_text())["token"] == "refreshed"
+
+
+def test_expired_token_is_refreshed_on_load(auth):
+    tmp_path, refreshed = auth
+    write_token(tmp_path / "token.json", -timedelta(hours=1))
+    assert google_photos_auth.get_credentials().token == "refreshed"
+    assert len(refreshed) == 1
+
+
+def test_session_is_shared_and_pooled(auth):
+    tmp_path, _ = auth
+    write_token(tmp_path / "token.json", timedelta(hours=1))
+    session = google_photos_auth.get_session(pool_size=6)
+    assert google_photos_auth.get_session(pool_size=6) is session
+    adapter = session.get_adapter("https://photoslibrary.googleapis.com")
+    assert adapter._pool_maxsize == 6
+
+
+def test_headless_without_token_does_not_open_a_browser(auth, monkeypatch):
+    monkeypatch.setattr(google_photos_auth.google_auth_oauthlib.flow.InstalledAppFlow, "from_client_secrets_file",
+                        lambda *args: pytest.fail("browser sign-in started"))
+    with pytest.raises(google_photos_auth.SignInRequired):
+        google_photos_auth.get_session(interactive=False)
@@ -0,0 +1,24 @@
+import os
+from pairing import build_pairing_index
+
+
+def touch(directory, *names):
+    for name in names:
+        with open(os.path.join(directory, name), 'wb'):
+            pass
+
+
+def test_jpegs_sharing_a_stem_stay_separate(tmp_path):
+    touch(tmp_path, "IMG_1.JPG", "IMG_1.jpg", "IMG_1.NEF", "IMG_1.NEF.xmp")
+    index = build_pairing_index(str(tmp_path))
+    upper, lower, raw, xmp = (os.path.join(str(tmp_path), name)
+                              for name in ("IMG_1.JPG", "IMG_1.jpg", "IMG_1.NEF", "IMG_1.NEF.xmp"))
+
+    assert sorted(index.jpeg_paths()) == sorted([upper, lower])
+    assert index.files(upper) == [upper, raw, xmp]
+    assert index.files(lower) == [lower, raw, xmp]
+    assert index.orphans() == []
+
+    index.remove(upper)
+    assert index.jpeg_paths() == [lower]
+    assert index.contains(raw)
@@ -0,0 +1,81 @@
+import threading
+import time
+import requests
+from photos_uploader import PhotosUploader
+
+
+def make_uploader(stub, **kwargs):
+    kwargs.setdefault('backoff', 0.01)
+    return PhotosUploader(requests.Session(), api_base=stub.url, **kwargs)
+
+
+def test_cancel_returns_promptly(stub, make_files):
+    paths = make_files(3000, 64)
+    stub.state.latency = 0.002
+    uploader = make_uploader(stub, max_workers=2)
+    threading.Timer(0.5, uploader.cancel).start()
+    result = {}
+    worker = threading.Thread(target=lambda: result.setdefault('items', uploader.upload(paths)), daemon=True)
+    start = time.monotonic()
+    worker.start()
+    worker.join(10)
+    assert not worker.is_alive(), "upload() did not return after cancel"
+    assert time.monotonic() - start < 5
+    items = result['items']
+    assert any(item.error == "Upload cancelled" for item in items)
+    # Queued items fail before opening a session
+    assert stub.state.stats()['requests'] < len(paths)
+
+
+def test_chunked_upload_resumes_at_server_offset(stub, make_files):
+    # A chunk failing mid-file is retried from the offset the server reports,
+    # so nothing it already has is sent again
+    clean, failing = make_files(2, 1024 * 1024 + 1000)
+    chunk = 256 * 1024
+
+    def fail_second_chunk(path, bytes_sent, total):
+        if path == failing and bytes_sent == chunk:
+            stub.state.fail_next("chunk", 503)
+
+    uploader = make_uploader(stub, chunk_size=chunk, on_progress=fail_second_chunk)
+    before = stub.state.stats()['bytes_received']
+    assert uploader.upload([clean])[0].succeeded
+    clean_bytes = stub.state.stats()['bytes_received'] - before
+    before = stub.state.stats()['bytes_received']
+    assert uploader.upload([failing])[0].succeeded
+    failing_bytes = stub.state.stats()['bytes_received'] - before
+    assert stub.state.stats()['failures_injected'] == 1
+    # Only the rejected chunk went over the wire twice
+    assert failing_bytes - clean_bytes == chunk
+    assert stub.state.stats()['media_items'] == 2
+
+
+def test_retries_5xx_and_429_with_backoff(stub, make_files):
+    paths = make_files(3, 1000)
+    stub.state.fail_next("start", 503, 429)
+    stub.state.fail_next("chunk", 502)
+    stub.state.fail_next("batch", 429, 500)
+    items = make_uploader(stub).upload(paths)
+    assert all(item.succeeded for item in items)
+    assert stub.state.stats()['failures_injected'] == 5
+    assert stub.state.stats()['media_items'] == 3
+
+
+def test_gives_up_after_max_retries(stub, make_files):
+    paths = make_files(1, 1000)
+    stub.state.fail_next("start", *[503] * 3)
+    items = make_uploader(stub, max_retries=2).upload(paths)
+    assert not items[0].succeeded
+    assert "503" in items[0].error
+    assert stub.state.stats()['media_items'] == 0
+
+
+def test_batch_create_is_split_at_50(stub, make_files):
+    paths = make_files(120, 100)
+    done = []
+    items = make_uploader(stub, max_workers=8, on_item_done=done.append).upload(paths)
+    assert all(item.succeeded for item in items)
+    assert len(done) == 120
+    assert max(stub.state.batch_sizes) == 50
+    assert sum(stub.state.batch_sizes) == 120
+    assert len({item.media_item_id for item in items}) == 120
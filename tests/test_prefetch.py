@@ -0,0 +1,64 @@
+import os
+import threading
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5.QtCore import QSize  # noqa: E402
+from PyQt5.QtGui import QGuiApplication, QImage  # noqa: E402
+import prefetch  # noqa: E402
+from prefetch import DecodedImageCache, ImagePrefetcher  # noqa: E402
+
+app = QGuiApplication.instance() or QGuiApplication([])
+
+
+@pytest.fixture
+def slow_decode(monkeypatch):
+    # Decodes block until released, and are counted
+    release = threading.Event()
+    calls = []
+
+    def decode(path, bound):
+        calls.append(path)
+        release.wait(5)
+        image = QImage(10, 10, QImage.Format_RGB888)
+        image.fill(0)
+        return image, QSize(10, 10)
+    monkeypatch.setattr(prefetch, "decode_for_display", decode)
+    return release, calls
+
+
+def wait_for(future):
+    future.result(5)
+    app.processEvents()
+
+
+def test_load_reuses_the_pending_decode(slow_decode):
+    release, calls = slow_decode
+    prefetcher = ImagePrefetcher(DecodedImageCache(), QSize(100, 100), radius=1)
+    prefetcher.request(["a.jpg", "b.jpg"], 0)
+    future = prefetcher.pending["b.jpg"]
+    while not future.running():
+        pass
+    threading.Timer(0.1, release.set).start()
+    image, _ = prefetcher.load("b.jpg")
+    assert not image.isNull()
+    assert calls == ["b.jpg"]
+    assert "b.jpg" in prefetcher.cache
+    prefetcher.shutdown()
+
+
+def test_late_results_are_dropped(slow_decode):
+    release, _ = slow_decode
+    prefetcher = ImagePrefetcher(DecodedImageCache(), QSize(100, 100), radius=2, max_workers=2)
+    prefetcher.request(["a.jpg", "b.jpg", "c.jpg"], 0)
+    discarded, reset = prefetcher.pending["b.jpg"], prefetcher.pending["c.jpg"]
+    while not (discarded.running() and reset.running()):
+        pass
+    prefetcher.discard("b.jpg")
+    prefetcher.reset()
+    release.set()
+    wait_for(discarded)
+    wait_for(reset)
+    assert "b.jpg" not in prefetcher.cache
+    assert "c.jpg" not in prefetcher.cache
+    prefetcher.shutdown()
@@ -0,0 +1,24 @@
+from thumbnail_cache import ThumbnailCache
+
+
+def test_get_many_and_buffered_puts(tmp_path):
+    cache = ThumbnailCache(str(tmp_path / "thumbnails.db"))
+    count = ThumbnailCache.MAX_VARIABLES + 100
+    for number in range(count):
+        cache.put(f"/photos/{number}.JPG", 100, number, 1, b"x" * 10)
+    cache.flush()
+    assert cache.total_bytes == count * 10
+    entries = [(f"/photos/{number}.JPG", number, 1) for number in range(count)]
+    # A changed file (different mtime) is a miss
+    entries[0] = ("/photos/0.JPG", 0, 2)
+    hits = cache.get_many(entries, 100)
+    assert len(hits) == count - 1
+    assert "/photos/0.JPG" not in hits
+    assert cache.get_many(entries, 200) == {}
+    # Replacing an entry keeps the byte count right
+    cache.put("/photos/1.JPG", 100, 1, 1, b"y" * 30)
+    cache.close()
+    cache = ThumbnailCache(str(tmp_path / "thumbnails.db"))
+    assert cache.total_bytes == count * 10 + 20
+    assert cache.get("/photos/1.JPG", 100, 1, 1) == b"y" * 30
+    cache.close()
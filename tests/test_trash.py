@@ -0,0 +1,22 @@
+import os
+import trash
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x")
+    return path
+
+
+def test_purge_directory_empties_subfolder_trash(tmp_path):
+    top = touch(str(tmp_path / "IMG_0001.jpg"))
+    nested = touch(str(tmp_path / "day2" / "card" / "IMG_0002.jpg"))
+    staged, errors = trash.stage_files([top, nested], trash.new_batch_id())
+    assert errors == []
+    kept, _ = trash.stage_files([touch(str(tmp_path / "day2" / "IMG_0003.jpg"))],
+                                trash.new_batch_id(), trash.KEPT_DIR_NAME)
+    trash.purge_directory(str(tmp_path))
+    for directory in (tmp_path, tmp_path / "day2" / "card"):
+        assert not os.path.exists(trash.trash_root(str(directory)))
+    assert os.path.exists(kept[0][1])
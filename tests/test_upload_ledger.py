@@ -0,0 +1,91 @@
+import shutil
+import time
+import requests
+import upload_ledger
+from photos_uploader import PhotosUploader
+from upload_ledger import UploadLedger
+
+CHUNK = 256 * 1024
+
+
+def make_uploader(stub, ledger, **kwargs):
+    return PhotosUploader(requests.Session(), api_base=stub.url, chunk_size=CHUNK, backoff=0.01,
+                          ledger=ledger, **kwargs)
+
+
+def test_file_hash_is_cached_by_size_and_mtime(tmp_path, make_files, monkeypatch):
+    path, = make_files(1, 1000)
+    ledger = UploadLedger(str(tmp_path / "uploads.db"))
+    first = ledger.file_hash(path)
+    calls = []
+    monkeypatch.setattr(upload_ledger, "hash_file", lambda path: calls.append(path) or "changed")
+    assert ledger.file_hash(path) == first
+    assert calls == []
+    with open(path, 'ab') as appended:
+        appended.write(b"more")
+    assert ledger.file_hash(path) == "changed"
+    ledger.close()
+
+
+def test_repeat_upload_is_skipped(stub, tmp_path, make_files):
+    paths = make_files(5, 1000)
+    ledger = UploadLedger(str(tmp_path / "uploads.db"))
+    assert all(item.succeeded for item in make_uploader(stub, ledger).upload(paths))
+    before = stub.state.stats()
+    # A renamed copy is recognised by its contents
+    copy = str(tmp_path / "renamed.JPG")
+    shutil.copy(paths[0], copy)
+    items = make_uploader(stub, ledger).upload(paths + [copy])
+    assert all(item.succeeded and item.skipped for item in items)
+    assert stub.state.stats()['requests'] == before['requests']
+    assert stub.state.stats()['media_items'] == 5
+    ledger.close()
+
+
+def test_duplicates_in_one_batch_are_sent_once(stub, tmp_path, make_files):
+    path, = make_files(1, 1000)
+    copy = str(tmp_path / "copy.JPG")
+    shutil.copy(path, copy)
+    ledger = UploadLedger(str(tmp_path / "uploads.db"))
+    items = make_uploader(stub, ledger).upload([path, copy])
+    assert all(item.succeeded for item in items)
+    assert items[0].media_item_id == items[1].media_item_id
+    assert stub.state.stats()['media_items'] == 1
+    ledger.close()
+
+
+def test_interrupted_upload_resumes_where_it_stopped(stub, tmp_path, make_files):
+    path, = make_files(1, 4 * CHUNK + 1000)
+    ledger = UploadLedger(str(tmp_path / "uploads.db"))
+    uploader = make_uploader(stub, ledger)
+    uploader.on_progress = lambda _, bytes_sent, total: bytes_sent >= 2 * CHUNK and uploader.cancel()
+    item, = uploader.upload([path])
+    assert not item.succeeded
+    record = ledger.lookup(item.sha256)
+    assert record.has_fresh_session()
+    sent_before = stub.state.stats()['bytes_received']
+    assert sent_before == 2 * CHUNK
+
+    item, = make_uploader(stub, ledger).upload([path])
+    assert item.succeeded and not item.skipped
+    # Only the remaining bytes (and the batchCreate body) were sent
+    resent = stub.state.stats()['bytes_received'] - sent_before
+    assert 2 * CHUNK + 1000 <= resent < 2 * CHUNK + 1000 + 1024
+    assert stub.state.stats()['media_items'] == 1
+    assert ledger.lookup(item.sha256).media_item_id == item.media_item_id
+    ledger.close()
+
+
+def test_stale_session_starts_over(stub, tmp_path, make_files):
+    path, = make_files(1, 2 * CHUNK + 1000)
+    ledger = UploadLedger(str(tmp_path / "uploads.db"))
+    sha256 = ledger.file_hash(path)
+    ledger.record_session(sha256, 2 * CHUNK + 1000, "IMG_0000.JPG", stub.url + "/upload/gone", CHUNK)
+    item, = make_uploader(stub, ledger).upload([path])
+    assert item.succeeded
+    assert stub.state.stats()['media_items'] == 1
+    # Expired tokens are not reused either
+    ledger.record_token(sha256, item.size, item.file_name, "stale-token")
+    record = ledger.lookup(sha256)
+    assert not record.has_fresh_token(now=time.time() + upload_ledger.TOKEN_LIFETIME + 1)
+    ledger.close()
@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+def default_cache_dir():
+    override = os.environ.get("SHUTTERSWEEP_CACHE_DIR")
+    if override:
+        return override
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "ShutterSweep")
+
+
+class ThumbnailCache:
+    # Encoded thumbnails keyed by (path, thumbnail dimension). The file size and
+    # mtime are stored next to each entry so a changed file is treated as a miss.
+    # Reads take one query per chunk of paths; writes are buffered and go in
+    # one transaction per WRITE_BATCH thumbnails (call flush() when done).
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+    WRITE_BATCH = 64
+    # Stay under SQLite's default limit on bound variables per statement
+    MAX_VARIABLES = 900
+
+    def __init__(self, db_path=None, max_bytes=DEFAULT_MAX_BYTES):
+        if db_path is None:
+            cache_dir = default_cache_dir()
+            os.makedirs(cache_dir, exist_ok=True)
+            db_path = os.path.join(cache_dir, "thumbnails.db")
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS thumbnails ("
+            " path TEXT NOT NULL,"
+            " dimension INTEGER NOT NULL,"
+            " file_size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " data BLOB NOT NULL,"
+            " PRIMARY KEY (path, dimension))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS thumbnails_accessed ON thumbnails (accessed)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM thumbnails").fetchone()[0]
+
+    def get(self, path, dimension, file_size, mtime_ns):
+        return self.get_many([(path, file_size, mtime_ns)], dimension).get(path)
+
+    def get_many(self, entries, dimension):
+        # entries is a list of (path, file_size, mtime_ns); stale rows are ignored
+        # and will be replaced by the next put() for that path.
+        hits = {}
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.cursor()
+            for start in range(0, len(entries), self.MAX_VARIABLES):
+                chunk = entries[start:start + self.MAX_VARIABLES]
+                rows = cursor.execute(
+                    "SELECT path, file_size, mtime_ns, data FROM thumbnails"
+                    f" WHERE dimension = ? AND path IN ({', '.join('?' * len(chunk))})",
+                    [dimension] + [path for path, _, _ in chunk]
+                ).fetchall()
+                found = {row[0]: row[1:] for row in rows}
+                for path, file_size, mtime_ns in chunk:
+                    row = found.get(path)
+                    if row and row[0] == file_size and row[1] == mtime_ns:
+                        hits[path] = row[2]
+            if hits:
+                cursor.executemany(
+                    "UPDATE thumbnails SET accessed = ? WHERE path = ? AND dimension = ?",
+                    [(now, path, dimension) for path in hits]
+                )
+            self.conn.commit()
+        return hits
+
+    def put(self, path, dimension, file_size, mtime_ns, data):
+        with self.lock:
+            self.pending[(path, dimension)] = (path, dimension, file_size, mtime_ns, time.time(), bytes(data))
+            if len(self.pending) >= self.WRITE_BATCH:
+                self._write_pending()
+
+    def flush(self):
+        with self.lock:
+            self._write_pending()
+
+    def _write_pending(self):
+        if not self.pending:
+            return
+        rows = list(self.pending.values())
+        self.pending = {}
+        old_bytes = 0
+        for dimension in {row[1] for row in rows}:
+            paths = [row[0] for row in rows if row[1] == dimension]
+            for start in range(0, len(paths), self.MAX_VARIABLES):
+                chunk = paths[start:start + self.MAX_VARIABLES]
+                old_bytes += self.conn.execute(
+                    "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM thumbnails"
+                    f" WHERE dimension = ? AND path IN ({', '.join('?' * len(chunk))})",
+                    [dimension] + chunk
+                ).fetchone()[0]
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO thumbnails (path, dimension, file_size, mtime_ns, accessed, data)"
+            " VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+        self.total_bytes += sum(len(row[5]) for row in rows) - old_bytes
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+        self.conn.commit()
+
+    def _evict(self):
+        # Drop least recently used entries until we are comfortably under budget
+        # so a full cache does not evict on every single put().
+        target = int(self.max_bytes * 0.9)
+        rows = self.conn.execute("SELECT rowid, LENGTH(data) FROM thumbnails ORDER BY accessed").fetchall()
+        doomed = []
+        for rowid, length in rows:
+            if self.total_bytes <= target:
+                break
+            doomed.append((rowid,))
+            self.total_bytes -= length
+        self.conn.executemany("DELETE FROM thumbnails WHERE rowid = ?", doomed)
+
+    def close(self):
+        with self.lock:
+            self._write_pending()
+            self.conn.close()
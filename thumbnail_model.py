@@ -0,0 +1,271 @@
+import bisect
+import os
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QEvent, QRect, QSize
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionButton
+
+PathRole = Qt.UserRole
+StackSizeRole = Qt.UserRole + 1
+
+CHECKBOX_SIZE = 20
+ITEM_PADDING = 4
+
+
+class ThumbnailModel(QAbstractListModel):
+    # Carousel contents: paths kept ordered by sort_key with an O(1) path -> row
+    # index and the set of checked paths. Thumbnail pixels live in a
+    # ThumbnailStore and only become pixmaps when a row is painted, so the view
+    # only pays for the rows it actually shows. Frames folded into a burst
+    # stack are kept in `hidden` (with their check state) until the stack is
+    # expanded again. Hidden frames the EXIF filter rejects are also listed in
+    # `filtered`; they keep their check state but are not acted on.
+    def __init__(self, store, sort_key=None, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.sort_key = sort_key or (lambda path: path)
+        self.paths = []
+        self.keys = []
+        self.rows = {}
+        self.selected = set()
+        self.hidden = set()
+        self.filtered = set()
+        self.stack_sizes = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.paths):
+            return None
+        path = self.paths[index.row()]
+        if role == Qt.DecorationRole:
+            return self.store.pixmap(path)
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if path in self.selected else Qt.Unchecked
+        if role == PathRole:
+            return path
+        if role == StackSizeRole:
+            return self.stack_sizes.get(path, 0)
+        if role == Qt.ToolTipRole:
+            size = self.stack_sizes.get(path)
+            return f"{os.path.basename(path)} (burst of {size})" if size else os.path.basename(path)
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsUserCheckable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.CheckStateRole or not index.isValid():
+            return False
+        self.set_selected(self.paths[index.row()], value == Qt.Checked)
+        return True
+
+    def clear(self):
+        self.beginResetModel()
+        self.paths = []
+        self.keys = []
+        self.rows = {}
+        self.selected = set()
+        self.hidden = set()
+        self.filtered = set()
+        self.stack_sizes = {}
+        self.store.clear()
+        self.endResetModel()
+
+    def insert_sorted(self, entries):
+        # entries are (path, QImage) in any order, e.g. as decodes complete;
+        # each lands at its sorted position so the final order never depends on
+        # which file happened to finish first. A None image keeps whatever the
+        # store already holds for the path (frames coming back from an undo).
+        inserted = False
+        refreshed = []
+        if self.keys is None:
+            self.keys = [self.sort_key(path) for path in self.paths]
+        for path, thumbnail in entries:
+            if thumbnail is not None:
+                self.store.put(path, thumbnail)
+            if path in self.rows:
+                refreshed.append(path)
+                continue
+            key = self.sort_key(path)
+            row = bisect.bisect_right(self.keys, key)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.keys.insert(row, key)
+            self.paths.insert(row, path)
+            self.rows[path] = row
+            self.endInsertRows()
+            inserted = True
+        if inserted:
+            self.rows = {path: row for row, path in enumerate(self.paths)}
+        for path in refreshed:
+            index = self.index(self.rows[path])
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def set_order(self, paths, hidden=None):
+        # Replace the visible rows with paths, already in sort_key order (the
+        # caller sorts in bulk, e.g. with MetadataTable.order). Sort keys are
+        # only computed again if single frames get inserted later.
+        self.beginResetModel()
+        self.paths = list(paths)
+        self.keys = None
+        self.rows = {path: row for row, path in enumerate(self.paths)}
+        if hidden is not None:
+            self.hidden = set(hidden)
+        self.endResetModel()
+
+    def remove_paths(self, paths, keep_thumbnails=False):
+        # keep_thumbnails leaves the pixels in the store so the frames can be
+        # put back cheaply; release_thumbnails frees them for good.
+        paths = list(paths)
+        for path in paths:
+            if path in self.hidden:
+                self.hidden.discard(path)
+                self.selected.discard(path)
+        self.remove_rows(paths)
+        for path in paths:
+            self.selected.discard(path)
+            self.filtered.discard(path)
+            self.stack_sizes.pop(path, None)
+            if not keep_thumbnails:
+                self.store.discard(path)
+
+    def release_thumbnails(self, paths):
+        for path in paths:
+            if not self.contains(path):
+                self.store.discard(path)
+
+    def remove_rows(self, paths):
+        # Remove contiguous runs from the back so each beginRemoveRows covers as
+        # many rows as possible and earlier row numbers stay valid.
+        doomed = sorted((self.rows[path] for path in paths if path in self.rows), reverse=True)
+        runs = []
+        for row in doomed:
+            if runs and runs[-1][0] == row + 1:
+                runs[-1][0] = row
+            else:
+                runs.append([row, row])
+        removed = []
+        for first, last in runs:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            removed.extend(self.paths[first:last + 1])
+            del self.paths[first:last + 1]
+            if self.keys is not None:
+                del self.keys[first:last + 1]
+            self.endRemoveRows()
+        if runs:
+            self.rows = {path: row for row, path in enumerate(self.paths)}
+        return removed
+
+    def hide_paths(self, paths):
+        self.hidden.update(self.remove_rows(paths))
+
+    def show_paths(self, paths):
+        shown = [path for path in paths if path in self.hidden]
+        self.hidden.difference_update(shown)
+        self.insert_sorted([(path, None) for path in shown])
+
+    def all_paths(self):
+        return self.paths + list(self.hidden)
+
+    def contains(self, path):
+        return path in self.rows or path in self.hidden
+
+    def set_stack_sizes(self, stack_sizes):
+        changed = set(self.stack_sizes) ^ set(stack_sizes)
+        changed.update(path for path, size in stack_sizes.items() if self.stack_sizes.get(path) != size)
+        self.stack_sizes = dict(stack_sizes)
+        for path in changed:
+            row = self.rows.get(path)
+            if row is not None:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [StackSizeRole])
+
+    def row_of(self, path):
+        return self.rows.get(path, -1)
+
+    def is_selected(self, path):
+        return path in self.selected
+
+    def set_selected(self, path, selected):
+        if not self.contains(path):
+            return
+        if selected:
+            self.selected.add(path)
+        else:
+            self.selected.discard(path)
+        row = self.rows.get(path)
+        if row is None:
+            return
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+
+    def toggle_selected(self, path):
+        self.set_selected(path, path not in self.selected)
+
+    def select_all(self, paths=None):
+        # paths defaults to the visible rows; pass all_paths() (or a subset of
+        # it) to take in frames folded into stacks too
+        # Added to the current selection, so picks outside the filter stay
+        self.selected.update(self.paths if paths is None else paths)
+        if not self.paths:
+            return
+        self.dataChanged.emit(self.index(0), self.index(len(self.paths) - 1), [Qt.CheckStateRole])
+
+    def set_filtered(self, paths):
+        self.filtered = set(paths)
+
+    def selected_paths(self):
+        # Checked frames folded into a stack still count; frames the filter
+        # hides do not, as they cannot be seen
+        return [path for path in self.paths if path in self.selected] + \
+            sorted(path for path in self.hidden if path in self.selected and path not in self.filtered)
+
+
+class ThumbnailDelegate(QStyledItemDelegate):
+    def __init__(self, thumbnail_size, parent=None):
+        super().__init__(parent)
+        self.thumbnail_size = thumbnail_size
+
+    def sizeHint(self, option, index):
+        return QSize(self.thumbnail_size + CHECKBOX_SIZE + ITEM_PADDING, self.thumbnail_size + ITEM_PADDING)
+
+    def checkbox_rect(self, rect):
+        return QRect(rect.right() - CHECKBOX_SIZE, rect.top() + ITEM_PADDING // 2, CHECKBOX_SIZE, CHECKBOX_SIZE)
+
+    def paint(self, painter, option, index):
+        rect = option.rect
+        thumbnail = index.data(Qt.DecorationRole)
+        if thumbnail is not None and not thumbnail.isNull():
+            x = rect.left() + (self.thumbnail_size - thumbnail.width()) // 2
+            y = rect.top() + (rect.height() - thumbnail.height()) // 2
+            painter.drawPixmap(x, y, thumbnail)
+
+        stack_size = index.data(StackSizeRole)
+        if stack_size:
+            # Burst stacks get a frame count in the corner; double-click expands
+            badge = QRect(rect.left() + ITEM_PADDING, rect.bottom() - 18 - ITEM_PADDING, 30, 18)
+            painter.save()
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(0, 0, 0, 170))
+            painter.drawRoundedRect(badge, 4, 4)
+            painter.setPen(Qt.white)
+            painter.drawText(badge, Qt.AlignCenter, f"x{stack_size}")
+            painter.restore()
+
+        checkbox = QStyleOptionButton()
+        checkbox.rect = self.checkbox_rect(rect)
+        checkbox.state = QStyle.State_Enabled
+        checkbox.state |= QStyle.State_On if index.data(Qt.CheckStateRole) == Qt.Checked else QStyle.State_Off
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PE_IndicatorCheckBox, checkbox, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() in (QEvent.MouseButtonPress, QEvent.MouseButtonRelease, QEvent.MouseButtonDblClick):
+            if self.checkbox_rect(option.rect).contains(event.pos()):
+                if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+                    checked = index.data(Qt.CheckStateRole) == Qt.Checked
+                    model.setData(index, Qt.Unchecked if checked else Qt.Checked, Qt.CheckStateRole)
+                return True
+        return super().editorEvent(event, model, option, index)
@@ -0,0 +1,147 @@
+import mmap
+import os
+import tempfile
+from collections import OrderedDict
+import numpy as np
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage, QPixmap
+from thumbnail_cache import default_cache_dir
+
+# Carousel thumbnails packed into fixed-size slots of memory-mapped scratch
+# files instead of one QPixmap per frame. Only the few segments touched last
+# stay mapped (unmapping drops their pages from the process; the data stays in
+# the file), and only the rows actually being painted are turned into pixmaps,
+# kept in a small LRU. What stays resident per frame is a slot number and a
+# width and height, however large the folder is.
+
+SEGMENT_SLOTS = 1024
+MAPPED_SEGMENTS = 3
+PIXMAP_CACHE_SIZE = 256
+
+
+def scanline_bytes(width):
+    # QImage pads RGB888 scanlines to 32 bits
+    return (width * 3 + 3) // 4 * 4
+
+
+class ThumbnailStore:
+    def __init__(self, dimension, segment_slots=SEGMENT_SLOTS, pixmap_cache_size=PIXMAP_CACHE_SIZE):
+        self.dimension = dimension
+        self.slot_bytes = scanline_bytes(dimension) * dimension
+        self.segment_slots = segment_slots
+        self.pixmap_cache_size = pixmap_cache_size
+        self.segments = []
+        self.mapped = OrderedDict()
+        self.sizes = np.zeros((0, 2), dtype=np.uint16)
+        self.slots = {}
+        self.free = []
+        self.pixmaps = OrderedDict()
+
+    def __contains__(self, path):
+        return path in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def add_segment(self):
+        length = self.slot_bytes * self.segment_slots
+        backing = None
+        try:
+            cache_dir = default_cache_dir()
+            os.makedirs(cache_dir, exist_ok=True)
+            # Unlinked on creation, so nothing is left behind after a crash
+            backing = tempfile.TemporaryFile(prefix="thumbnails-", dir=cache_dir)
+            backing.truncate(length)
+        except OSError as e:
+            print(f"Error creating thumbnail store file, keeping thumbnails in memory: {e}")
+            if backing is not None:
+                backing.close()
+            backing = None
+        segment = len(self.segments)
+        start = segment * self.segment_slots
+        # Segments without a backing file stay mapped (and resident) for good
+        self.segments.append(backing if backing is not None else mmap.mmap(-1, length))
+        self.sizes = np.concatenate((self.sizes, np.zeros((self.segment_slots, 2), dtype=np.uint16)))
+        # Hand out low slots first so a fresh folder fills segments in order
+        self.free.extend(range(start + self.segment_slots - 1, start - 1, -1))
+
+    def segment_buffer(self, segment):
+        backing = self.segments[segment]
+        if isinstance(backing, mmap.mmap):
+            return backing
+        buffer = self.mapped.get(segment)
+        if buffer is not None:
+            self.mapped.move_to_end(segment)
+            return buffer
+        buffer = mmap.mmap(backing.fileno(), self.slot_bytes * self.segment_slots)
+        self.mapped[segment] = buffer
+        while len(self.mapped) > MAPPED_SEGMENTS:
+            self.mapped.popitem(last=False)[1].close()
+        return buffer
+
+    def slot_range(self, slot, length):
+        segment, offset = divmod(slot, self.segment_slots)
+        start = offset * self.slot_bytes
+        return self.segment_buffer(segment), start, start + length
+
+    def put(self, path, image):
+        if image is None or image.isNull():
+            self.discard(path)
+            return
+        if image.width() > self.dimension or image.height() > self.dimension:
+            image = image.scaled(self.dimension, self.dimension, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        image = image.convertToFormat(QImage.Format_RGB888)
+        slot = self.slots.get(path)
+        if slot is None:
+            if not self.free:
+                self.add_segment()
+            slot = self.free.pop()
+            self.slots[path] = slot
+        length = image.bytesPerLine() * image.height()
+        buffer, start, end = self.slot_range(slot, length)
+        buffer[start:end] = image.constBits().asstring(length)
+        self.sizes[slot] = (image.width(), image.height())
+        self.pixmaps.pop(path, None)
+
+    def view(self, path):
+        # A QImage over a copy of the slot; callers must keep `data` alive.
+        slot = self.slots.get(path)
+        if slot is None:
+            return None, None
+        width, height = (int(value) for value in self.sizes[slot])
+        bytes_per_line = scanline_bytes(width)
+        buffer, start, end = self.slot_range(slot, bytes_per_line * height)
+        data = buffer[start:end]
+        return data, QImage(data, width, height, bytes_per_line, QImage.Format_RGB888)
+
+    def pixmap(self, path):
+        pixmap = self.pixmaps.get(path)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(path)
+            return pixmap
+        data, image = self.view(path)
+        if image is None:
+            return None
+        pixmap = QPixmap.fromImage(image)
+        self.pixmaps[path] = pixmap
+        while len(self.pixmaps) > self.pixmap_cache_size:
+            self.pixmaps.popitem(last=False)
+        return pixmap
+
+    def discard(self, path):
+        slot = self.slots.pop(path, None)
+        if slot is not None:
+            self.free.append(slot)
+        self.pixmaps.pop(path, None)
+
+    def clear(self):
+        for buffer in self.mapped.values():
+            buffer.close()
+        for backing in self.segments:
+            backing.close()
+        self.segments = []
+        self.mapped = OrderedDict()
+        self.sizes = np.zeros((0, 2), dtype=np.uint16)
+        self.slots = {}
+        self.free = []
+        self.pixmaps = OrderedDict()
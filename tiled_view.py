@@ -0,0 +1,102 @@
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, QRect, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+import instrumentation
+
+# Full-resolution detail for zoomed-in viewing. The frame is split into fixed
+# tiles in sensor pixels; only the tiles under the viewport are decoded, with
+# one clipped read per request, and kept in a byte-bounded LRU so panning
+# back over a region is free.
+
+TILE_SIZE = 512
+
+
+def tile_rect(tile, image_size, tile_size=TILE_SIZE):
+    col, row = tile
+    return QRect(col * tile_size, row * tile_size, tile_size, tile_size).intersected(
+        QRect(0, 0, image_size.width(), image_size.height()))
+
+
+def visible_tiles(region, image_size, tile_size=TILE_SIZE):
+    # region is a QRectF in full-resolution pixel coordinates.
+    left = max(int(region.left()) // tile_size, 0)
+    top = max(int(region.top()) // tile_size, 0)
+    right = min(int(region.right()) // tile_size, (image_size.width() - 1) // tile_size)
+    bottom = min(int(region.bottom()) // tile_size, (image_size.height() - 1) // tile_size)
+    return [(col, row) for row in range(top, bottom + 1) for col in range(left, right + 1)]
+
+
+def decode_region(image_path, rect):
+    # The JPEG plugin honours the clip rect while decoding, so only the region
+    # is ever converted to pixels; formats without clip support fall back to a
+    # full decode and a copy.
+    reader = QImageReader(image_path)
+    reader.setClipRect(rect)
+    image = reader.read()
+    if image.isNull() or image.size() != rect.size():
+        image = QImage(image_path).copy(rect)
+    return image
+
+
+class TileLoader(QObject):
+    # Decodes tiles on a single background thread. Results are inserted into
+    # the cache on the GUI thread, as with the prefetcher.
+    tiles_ready = pyqtSignal(str, object)
+
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.futures = []
+        self.pending = set()
+        self.tiles_ready.connect(self.on_tiles_ready)
+
+    def cached(self, image_path, tile):
+        entry = self.cache.get((image_path,) + tile)
+        return entry[0] if entry is not None else None
+
+    def request(self, image_path, image_size, tiles):
+        # A new request supersedes queued ones: the viewport has moved on.
+        for future, keys in self.futures:
+            if future.cancel():
+                self.pending.difference_update(keys)
+        self.futures = [(future, keys) for future, keys in self.futures if not future.done()]
+        missing = [tile for tile in tiles
+                   if (image_path,) + tile not in self.cache and (image_path,) + tile not in self.pending]
+        if not missing:
+            return
+        bounds = QRect()
+        for tile in missing:
+            bounds = bounds.united(tile_rect(tile, image_size))
+        keys = [(image_path,) + tile for tile in missing]
+        self.pending.update(keys)
+        self.futures.append((self.executor.submit(self.decode, image_path, image_size, bounds, missing), keys))
+
+    def decode(self, image_path, image_size, bounds, tiles):
+        try:
+            with instrumentation.span("display.tiles", path=image_path, tiles=len(tiles)):
+                region = decode_region(image_path, bounds)
+        except Exception as e:
+            print(f"Error decoding tiles of {image_path}: {e}")
+            region = QImage()
+        results = {}
+        for tile in tiles:
+            rect = tile_rect(tile, image_size)
+            results[tile] = QImage() if region.isNull() else region.copy(rect.translated(-bounds.topLeft()))
+        self.tiles_ready.emit(image_path, results)
+
+    def on_tiles_ready(self, image_path, results):
+        for tile, image in results.items():
+            self.pending.discard((image_path,) + tile)
+            if not image.isNull():
+                self.cache.put((image_path,) + tile, image, image.size())
+
+    def reset(self):
+        for future, _ in self.futures:
+            future.cancel()
+        self.futures = []
+        self.pending.clear()
+
+    def shutdown(self):
+        self.reset()
+        self.executor.shutdown(wait=False)
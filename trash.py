@@ -0,0 +1,82 @@
+import os
+import shutil
+import uuid
+
+# Deleted files are first renamed into a hidden folder next to them. A rename
+# within one directory tree is a metadata-only operation, so staging is cheap
+# and fully reversible until the batch is purged.
+TRASH_DIR_NAME = ".shuttersweep_trash"
+# Batch mode can set deleted files aside for checking instead. The app empties
+# its trash folder whenever a folder is opened, so these go somewhere else.
+KEPT_DIR_NAME = ".shuttersweep_deleted"
+
+
+def new_batch_id():
+    return uuid.uuid4().hex
+
+
+def trash_root(directory, root_name=TRASH_DIR_NAME):
+    return os.path.join(directory, root_name)
+
+
+def stage_files(paths, batch_id, root_name=TRASH_DIR_NAME):
+    # Returns ([(original_path, staged_path)], [(path, error)]).
+    staged = []
+    errors = []
+    for path in paths:
+        batch_dir = os.path.join(trash_root(os.path.dirname(path), root_name), batch_id)
+        staged_path = os.path.join(batch_dir, os.path.basename(path))
+        try:
+            os.makedirs(batch_dir, exist_ok=True)
+            os.replace(path, staged_path)
+            staged.append((path, staged_path))
+        except OSError as e:
+            errors.append((path, str(e)))
+    return staged, errors
+
+
+def restore_files(staged):
+    errors = []
+    for original_path, staged_path in staged:
+        if os.path.exists(original_path):
+            errors.append((original_path, "A file with this name already exists"))
+            continue
+        try:
+            os.replace(staged_path, original_path)
+        except OSError as e:
+            errors.append((original_path, str(e)))
+    remove_empty_batch_dirs(staged)
+    return errors
+
+
+def purge_files(staged):
+    errors = []
+    for original_path, staged_path in staged:
+        try:
+            os.remove(staged_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            errors.append((original_path, str(e)))
+    remove_empty_batch_dirs(staged)
+    return errors
+
+
+def purge_directory(directory):
+    # Leftovers from a session that never got to purge (e.g. a crash). Files
+    # are staged next to where they were, so in recursive mode there is a
+    # trash folder in each subfolder deleted from. Other hidden folders,
+    # including the kept-deleted one, are left alone.
+    for root, subdirs, _ in os.walk(directory):
+        if TRASH_DIR_NAME in subdirs:
+            shutil.rmtree(os.path.join(root, TRASH_DIR_NAME), ignore_errors=True)
+        subdirs[:] = [name for name in subdirs if not name.startswith('.')]
+
+
+def remove_empty_batch_dirs(staged):
+    for batch_dir in {os.path.dirname(staged_path) for _, staged_path in staged}:
+        for path in (batch_dir, os.path.dirname(batch_dir)):
+            try:
+                os.rmdir(path)
+            except OSError:
+                break
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from thumbnail_cache import default_cache_dir
+
+# Remembers what has been sent to Google Photos, keyed by the SHA-256 of the
+# file contents so a renamed or copied file is still recognised. For each
+# content hash it keeps the resumable session URL while bytes are in flight,
+# the upload token once they have all arrived, and the media item id once it
+# exists, so an interrupted batch picks up at whichever step it stopped.
+# Hashes themselves are cached by path, size and mtime.
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Upload tokens expire after a day; resumable sessions last about a week.
+# Stay comfortably inside both.
+TOKEN_LIFETIME = 20 * 60 * 60
+SESSION_LIFETIME = 3 * 24 * 60 * 60
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    # hashlib releases the GIL on large updates, so several of these can run
+    # on a thread pool in parallel with the upload workers.
+    digest = hashlib.sha256()
+    with open(path, 'rb') as hash_input:
+        while True:
+            chunk = hash_input.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadRecord:
+    __slots__ = ('sha256', 'file_size', 'upload_url', 'granularity', 'session_time',
+                 'upload_token', 'token_time', 'media_item_id')
+
+    def __init__(self, row):
+        (self.sha256, self.file_size, self.upload_url, self.granularity, self.session_time,
+         self.upload_token, self.token_time, self.media_item_id) = row
+
+    def has_fresh_token(self, now=None):
+        now = time.time() if now is None else now
+        return bool(self.upload_token) and now - (self.token_time or 0) < TOKEN_LIFETIME
+
+    def has_fresh_session(self, now=None):
+        now = time.time() if now is None else now
+        return bool(self.upload_url) and now - (self.session_time or 0) < SESSION_LIFETIME
+
+
+class UploadLedger:
+    def __init__(self, db_path=None):
+        if db_path is None:
+            cache_dir = default_cache_dir()
+            os.makedirs(cache_dir, exist_ok=True)
+            db_path = os.path.join(cache_dir, "uploads.db")
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_hashes ("
+            " path TEXT PRIMARY KEY,"
+            " file_size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            " sha256 TEXT PRIMARY KEY,"
+            " file_size INTEGER NOT NULL,"
+            " file_name TEXT,"
+            " upload_url TEXT,"
+            " granularity INTEGER,"
+            " session_time REAL,"
+            " upload_token TEXT,"
+            " token_time REAL,"
+            " media_item_id TEXT,"
+            " updated REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT file_size, mtime_ns, sha256 FROM file_hashes WHERE path = ?", (path,)
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        sha256 = hash_file(path)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, file_size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, sha256)
+            )
+            self.conn.commit()
+        return sha256
+
+    def hash_files(self, paths, max_workers=4):
+        # Returns {path: sha256}; unreadable files are left out.
+        def hash_one(path):
+            try:
+                return path, self.file_hash(path)
+            except OSError as e:
+                print(f"Error hashing {path}: {e}")
+                return path, None
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return {path: sha256 for path, sha256 in executor.map(hash_one, paths) if sha256}
+
+    def lookup(self, sha256):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT sha256, file_size, upload_url, granularity, session_time, upload_token, token_time,"
+                " media_item_id FROM uploads WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+        return UploadRecord(row) if row else None
+
+    def update(self, sha256, file_size, file_name, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO uploads (sha256, file_size, file_name, updated) VALUES (?, ?, ?, ?)",
+                (sha256, file_size, file_name, time.time())
+            )
+            self.conn.execute(
+                f"UPDATE uploads SET {columns}, updated = ? WHERE sha256 = ?",
+                list(fields.values()) + [time.time(), sha256]
+            )
+            self.conn.commit()
+
+    def record_session(self, sha256, file_size, file_name, upload_url, granularity):
+        self.update(sha256, file_size, file_name, upload_url=upload_url, granularity=granularity,
+                    session_time=time.time(), upload_token=None, token_time=None)
+
+    def record_token(self, sha256, file_size, file_name, upload_token):
+        self.update(sha256, file_size, file_name, upload_token=upload_token, token_time=time.time(),
+                    upload_url=None, session_time=None)
+
+    def record_media_item(self, sha256, file_size, file_name, media_item_id):
+        self.update(sha256, file_size, file_name, media_item_id=media_item_id, upload_token=None, token_time=None)
+
+    def forget_token(self, sha256):
+        with self.lock:
+            self.conn.execute("UPDATE uploads SET upload_token = NULL, token_time = NULL WHERE sha256 = ?", (sha256,))
+            self.conn.commit()
+
+    def forget_session(self, sha256):
+        with self.lock:
+            self.conn.execute("UPDATE uploads SET upload_url = NULL, session_time = NULL WHERE sha256 = ?", (sha256,))
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()